@@ -0,0 +1,86 @@
+"""
+Startup time of a program shipped as ``.ltns`` files or transpiled to Python
+
+Every scenario imports the same generated module in a fresh interpreter:
+
+* ``.ltns, cold``: through the import hook, without bytecode, so the module
+  is compiled at startup
+* ``.ltns, warm``: through the import hook, with bytecode from a previous run
+* ``transpiled .py``: the output of ``python -m ltns transpile``, with bytecode
+  from a previous run and without ltns on the path
+
+Run from the repository root::
+
+    python -m benchmarks.bench_aot
+"""
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from ltns.cli import main as ltns_main
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULE = ''.join(
+    f'<def>f{i} <fn*>[x] <if>x <do><def>y <mul*>x {i}</mul*></def> [y :k{i}]</do> :none</if></fn*></def>\n'
+    for i in range(300)
+)
+
+TIMER = '''
+import sys
+import time
+start = time.perf_counter()
+{}
+import app
+seconds = time.perf_counter() - start
+assert 'rply' not in sys.modules or {expect_rply}
+print(seconds)
+'''
+
+
+def run(directory, setup, pythonpath, expect_rply, dont_write_bytecode=False):
+    env = dict(os.environ, PYTHONPATH=pythonpath)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    if dont_write_bytecode:
+        env['PYTHONDONTWRITEBYTECODE'] = '1'
+
+    output = subprocess.check_output(
+        [sys.executable, '-c', TIMER.format(setup, expect_rply=expect_rply)],
+        env=env,
+        cwd=directory,
+    )
+    return float(output)
+
+def bench(repeat, *args, **kwargs):
+    # the first run writes the bytecode of warm scenarios
+    run(*args, **kwargs)
+    return statistics.median(run(*args, **kwargs) for _ in range(repeat))
+
+def main(repeat=20):
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, 'source')
+        output = os.path.join(directory, 'output')
+        os.mkdir(source)
+        with open(os.path.join(source, 'app.ltns'), 'w') as f:
+            f.write(MODULE)
+
+        ltns_main(['transpile', '-q', '-o', output, os.path.join(source, 'app.ltns')])
+
+        hook = 'import ltns.importer; ltns.importer.install()'
+        scenarios = [
+            ('.ltns, cold', source, hook, ROOT, True, True),
+            ('.ltns, warm', source, hook, ROOT, True, False),
+            ('transpiled .py', output, '', output, False, False),
+        ]
+
+        for name, *args in scenarios:
+            shutil.rmtree(os.path.join(args[0], '__pycache__'), ignore_errors=True)
+            seconds = bench(repeat, *args)
+            print(f'{name:<15} {seconds * 1000:8.2f} ms')
+
+if __name__ == '__main__':
+    main()
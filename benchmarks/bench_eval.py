@@ -0,0 +1,60 @@
+"""
+Latency of evaluating a parsed expression once, interpreted or compiled
+
+Expressions are balanced sums of ``n`` terms mixing calls, ``if`` and
+arithmetic. ``auto`` is the path :func:`ltns.compiler.ltns_eval` takes by
+default.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_eval
+"""
+import timeit
+
+from ltns.compiler import _count_nodes, ltns_eval, ltns_parse
+from ltns.evaluator import interpretable
+
+
+SIZES = (1, 4, 16, 64, 256, 1024)
+
+TERM = '<if><gt>x {i}</gt> <mul*>x {i}</mul*> <abs><sub*>x {i}</sub*></abs></if>'
+
+
+def expression(first, n):
+    if n == 1:
+        return TERM.format(i=first)
+
+    half = n // 2
+    left = expression(first, half)
+    right = expression(first + half, n - half)
+    return f'<add*>{left} {right}</add*>'
+
+def gt(a, b):
+    return a > b
+
+def main(number=20):
+    print(
+        f'{"terms":>6} {"models":>7} {"interpret":>12} {"compile":>12} '
+        f'{"auto":>10}'
+    )
+
+    for n in SIZES:
+        tree = ltns_parse(expression(0, n))
+        models = _count_nodes(tree) - 1
+        auto = 'interpret' if interpretable(tree) else 'compile'
+
+        times = []
+        for interpret in (True, False):
+            seconds = min(timeit.repeat(
+                lambda: ltns_eval(tree, {'x': 3, 'gt': gt}, interpret=interpret),
+                number=number, repeat=5,
+            ))
+            times.append(seconds / number * 1e6)
+
+        print(
+            f'{n:>6} {models:>7} {times[0]:>9.1f} us {times[1]:>9.1f} us '
+            f'{auto:>10}'
+        )
+
+if __name__ == '__main__':
+    main()
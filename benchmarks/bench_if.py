@@ -0,0 +1,82 @@
+"""
+Runtime of a function made of ``if`` forms whose branches have statements
+
+The function is called in a hot loop, and the number of Python function calls
+made by one call is counted as well. Pass paths of other ltns checkouts to
+compare them against this one, e.g. a worktree of an older commit::
+
+    python benchmarks/bench_if.py ../ltns-old
+"""
+import os
+import subprocess
+import sys
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CODE = '''
+<def>classify <fn*>[x]
+  <if><x.__lt__>0</x.__lt__>
+    <do><def>sign -1</def> <mul*>sign x</mul*></do>
+    <if><x.__eq__>0</x.__eq__>
+      <do><def>sign 0</def> sign</do>
+      <do><def>sign 1</def> <mul*>sign x</mul*></do>
+    </if>
+  </if>
+</fn*></def>
+'''
+
+BENCH = '''
+import sys
+import time
+
+from ltns.compiler import ltns_compile, ltns_parse
+
+namespace = {{}}
+exec(ltns_compile(ltns_parse({code!r})), namespace)
+classify = namespace['classify']
+
+calls = 0
+def profile(frame, event, arg):
+    global calls
+    if event == 'call':
+        calls += 1
+
+def once():
+    for x in (-1, 0, 1):
+        classify(x)
+
+sys.setprofile(profile)
+once()
+sys.setprofile(None)
+calls = (calls - 1) / 3
+
+values = [-2, -1, 0, 1, 2] * {n}
+start = time.perf_counter()
+for x in values:
+    classify(x)
+seconds = time.perf_counter() - start
+
+print(calls, seconds)
+'''
+
+
+def run(checkout, n):
+    env = dict(os.environ, PYTHONPATH=checkout)
+    output = subprocess.check_output(
+        [sys.executable, '-c', BENCH.format(code=CODE, n=n)],
+        env=env,
+        cwd=checkout,
+    )
+    calls, seconds = output.split()
+    return float(calls), float(seconds)
+
+def main(checkouts, n=500000):
+    for checkout in [ROOT] + checkouts:
+        calls, seconds = run(checkout, n)
+        print(checkout)
+        print(f'  {calls:8.1f} Python calls per call')
+        print(f'  {seconds / (5 * n) * 1e9:8.1f} ns per call')
+
+if __name__ == '__main__':
+    main([os.path.abspath(path) for path in sys.argv[1:]])
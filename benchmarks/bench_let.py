@@ -0,0 +1,58 @@
+"""
+Runtime of a module level numeric kernel with and without ``let``
+
+Without ``let`` the loop variables are module globals; with ``let`` they are
+locals of a function. The same loop handwritten in Python is timed for
+reference.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_let
+"""
+import timeit
+
+from ltns.compiler import ltns_compile, ltns_parse
+
+
+N = 100000
+
+KERNEL = '''
+<loop>[i 0 acc 0]
+  <if><i.__lt__>{n}</i.__lt__>
+    <recur><add*>i 1</add*> <add*>acc <mul*>i i</mul*></add*></recur>
+    acc</if>
+</loop>
+'''
+
+PYTHON = '''
+def kernel(n):
+    i = acc = 0
+    while i.__lt__(n):
+        i, acc = i + 1, acc + i * i
+    return acc
+result = kernel(n)
+'''
+
+VERSIONS = {
+    'globals': lambda: ltns_compile(ltns_parse(
+        '<def>result ' + KERNEL.format(n='n') + '</def>'
+    )),
+    'let': lambda: ltns_compile(ltns_parse(
+        '<def>result <let>[m n] ' + KERNEL.format(n='m') + '</let></def>'
+    )),
+    'python': lambda: compile(PYTHON, '<string>', 'exec'),
+}
+
+
+def main(number=20):
+    for name, build in VERSIONS.items():
+        code = build()
+        namespace = {'n': N}
+        exec(code, namespace)
+        assert namespace['result'] == sum(i * i for i in range(N))
+
+        seconds = timeit.timeit(lambda: exec(code, {'n': N}), number=number)
+        print(f'{name:<10} {seconds / number * 1000:8.2f} ms')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Throughput of the rply lexer and the hand-written scanner, and of the
+scanner reading long tokens in small chunks
+
+Run from the repository root::
+
+    python -m benchmarks.bench_lexer
+"""
+import time
+
+from ltns.lexer import get_lexer
+
+
+def document(n):
+    forms = ' '.join(f'<g>x{i} 1.5 "s" :k</g>' for i in range(n))
+    return f'<f a=1>{forms}</f>'
+
+def bench(kind, code):
+    lexer = get_lexer(kind)
+    start = time.perf_counter()
+    count = sum(1 for _ in lexer.lex(code))
+    return count, time.perf_counter() - start
+
+LONG_TOKENS = {
+    'string': lambda n: '"' + 'a' * n + '"',
+    'comment': lambda n: '<!--' + 'a' * n + '-->',
+    'identifier': lambda n: 'x' * n,
+}
+
+CHUNK = 256
+
+def bench_chunks(code):
+    chunks = [code[i:i + CHUNK] for i in range(0, len(code), CHUNK)]
+    start = time.perf_counter()
+    sum(1 for _ in get_lexer('scanner').lex_chunks(chunks))
+    return time.perf_counter() - start
+
+def main():
+    for n in (1000, 10000, 100000):
+        code = document(n)
+        for kind in ('rply', 'scanner'):
+            count, seconds = bench(kind, code)
+            print(
+                f'{kind:<8} {len(code):>9} chars {count:>8} tokens'
+                f' {seconds * 1000:10.1f} ms'
+            )
+
+    for name, token in LONG_TOKENS.items():
+        for n in (100000, 1000000):
+            seconds = bench_chunks(token(n))
+            print(
+                f'{name:<10} of {n:>8} chars in {CHUNK} char chunks'
+                f' {seconds * 1000:10.1f} ms'
+            )
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+Sum of the first n integers with recursion, ``loop``/``recur`` and ``for``
+
+The recursive version is bound by the recursion limit, so every version sums
+the first 500 integers, many times over.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_loops
+"""
+import sys
+import timeit
+
+from ltns.compiler import ltns_compile, ltns_parse
+
+
+N = 500
+
+VERSIONS = {
+    'recursive fn*': '''
+      <def>total <fn*>[n acc]
+        <if>n <total><sub*>n 1</sub*> <add*>acc n</add*></total> acc</if>
+      </fn*></def>
+      <def>run <fn*>[n] <total>n 0</total></fn*></def>
+    ''',
+    'loop/recur': '''
+      <def>run <fn*>[n] <loop>[i n acc 0]
+        <if>i <recur><sub*>i 1</sub*> <add*>acc i</add*></recur> acc</if>
+      </loop></fn*></def>
+    ''',
+    'for': '''
+      <def>run <fn*>[n] <do>
+        <def>acc 0</def>
+        <for>[i <range><add*>n 1</add*></range>] <def>acc <add*>acc i</add*></def></for>
+        acc
+      </do></fn*></def>
+    ''',
+}
+
+
+def main(number=2000):
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 2 * N))
+
+    for name, code in VERSIONS.items():
+        namespace = {}
+        exec(ltns_compile(ltns_parse(code)), namespace)
+        run = namespace['run']
+        assert run(N) == N * (N + 1) // 2
+
+        seconds = timeit.timeit(lambda: run(N), number=number) / number
+        print(f'{name:<15} {seconds * 1e6:8.1f} us per sum of {N}')
+
+if __name__ == '__main__':
+    main()
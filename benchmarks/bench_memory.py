@@ -0,0 +1,54 @@
+"""
+Memory used by the tree of a generated document of about 1M nodes
+
+Run from the repository root::
+
+    python -m benchmarks.bench_memory
+"""
+import gc
+import time
+import tracemalloc
+
+from ltns.compiler import ltns_parse
+
+
+def document(n):
+    # every form is 10 nodes: 2 elements, 3 symbols, 2 integers, a keyword,
+    # a string and a list
+    form = '<print sep=", "><add*>x {i}</add*> :k "s" [y {i}]</print>'
+    return '\n'.join(form.format(i=i) for i in range(n))
+
+def retained(build):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    seconds = time.perf_counter() - start
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size, seconds
+
+def main(n=100000):
+    code = document(n)
+    nodes = n * 10
+
+    tree, size, seconds = retained(lambda: ltns_parse(code))
+    print(
+        f'tree   {nodes} nodes {size / 2**20:8.1f} MiB'
+        f' {size / nodes:6.1f} B/node  built in {seconds:.1f} s'
+    )
+
+    try:
+        from ltns.arena import LtnsArena
+    except ImportError:
+        return
+
+    arena, size, seconds = retained(lambda: LtnsArena.from_tree(tree))
+    print(
+        f'arena  {nodes} nodes {size / 2**20:8.1f} MiB'
+        f' {size / nodes:6.1f} B/node  built in {seconds:.1f} s'
+    )
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+"""
+Parse time of documents with 10k, 100k and 1M siblings
+
+Run from the repository root::
+
+    python -m benchmarks.bench_parse_scaling
+"""
+import time
+
+from ltns.compiler import ltns_parse
+
+
+DOCUMENTS = {
+    'element childs': lambda n: '<f>' + ' '.join(map(str, range(n))) + '</f>',
+    'list literal': lambda n: '[' + ' '.join(map(str, range(n))) + ']',
+    'attributes': lambda n: (
+        '<f ' + ' '.join(f'a{i}={i}' for i in range(n)) + '/>'
+    ),
+}
+
+
+def main():
+    for name, document in DOCUMENTS.items():
+        for n in (10000, 100000, 1000000):
+            code = document(n)
+            start = time.perf_counter()
+            ltns_parse(code)
+            seconds = time.perf_counter() - start
+            print(
+                f'{name:<15} {n:>8} siblings {seconds:8.2f} s'
+                f' {seconds / n * 1e6:6.2f} us/sibling'
+            )
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Compile time against run time, at each optimization level
+
+``compile`` is the time to compile a program of ``n`` forms, ``load`` the
+time to run the module, and ``call`` the time of calls to one of its
+functions, whose ``if`` tests a literal flag and whose ``do`` has dead
+expressions.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_passes
+"""
+import time
+
+from ltns.compiler import ltns_compile, ltns_parse
+from ltns.passes import MAX_LEVEL
+
+
+N = 500
+
+CALLS = 200000
+
+FORM = '''
+<def>f{i} <fn*>[x]
+  <do>
+    "check the flag first"
+    <if>False <print>x</print></if>
+    <if>True <do><def>y <mul*>x {i}</mul*></def> y</do> 0</if>
+  </do>
+</fn*></def>
+<let>[a {i} b <add*>a 1</add*>] <def>g{i} <mul*>a b</mul*></def></let>
+'''
+
+
+def best(f, repeat=5):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        f()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def main():
+    tree = ltns_parse(''.join(FORM.format(i=i) for i in range(N)))
+
+    print(f'{"level":>5} {"compile":>12} {"load":>12} {"call":>12}')
+
+    for level in range(MAX_LEVEL + 1):
+        compile_time = best(lambda: ltns_compile(tree, optimize=level))
+
+        code = ltns_compile(tree, optimize=level)
+        load_time = best(lambda: exec(code, {}))
+
+        namespace = {}
+        exec(code, namespace)
+        f = namespace['f1']
+        def calls():
+            for x in range(CALLS):
+                f(x)
+        call_time = best(calls)
+
+        print(
+            f'{level:>5} {compile_time * 1000:>9.2f} ms '
+            f'{load_time * 1000:>9.2f} ms {call_time * 1000:>9.2f} ms'
+        )
+
+if __name__ == '__main__':
+    main()
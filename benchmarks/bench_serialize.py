@@ -0,0 +1,55 @@
+"""
+Loading a large data document: parsing its source or its serialized tree
+
+* ``parse``: lex and parse the source
+* ``load``: build the whole tree from the serialized file
+* ``load lazy``: map the serialized file and read one record
+
+Run from the repository root::
+
+    python -m benchmarks.bench_serialize
+"""
+import os
+import tempfile
+import time
+
+from ltns import serialize
+from ltns.compiler import ltns_parse
+
+
+RECORDS = 20000
+
+RECORD = (
+    '<record id={i} name="user {i}" active=True>'
+    '[:admin :editor] <score>{i}.5 -{i}</score></record>\n'
+)
+
+
+def best(f, repeat=5):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        f()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def main():
+    source = ''.join(RECORD.format(i=i) for i in range(RECORDS))
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'data.ltnst')
+        serialize.dump(ltns_parse(source), path)
+        size = os.path.getsize(path)
+
+        scenarios = [
+            ('parse', lambda: ltns_parse(source)),
+            ('load', lambda: serialize.load(path)),
+            ('load lazy', lambda: serialize.load(path, lazy=True).childs[-1]),
+        ]
+
+        print(f'source {len(source) / 1e6:.2f} MB, serialized {size / 1e6:.2f} MB')
+        for name, f in scenarios:
+            print(f'{name:<10} {best(f) * 1000:10.2f} ms')
+
+if __name__ == '__main__':
+    main()
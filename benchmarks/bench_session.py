@@ -0,0 +1,45 @@
+"""
+Latency of adding one form to a program of ``n`` forms
+
+``resend`` compiles and runs the whole program again, as hosts without a
+session do to stay consistent, ``session`` only the new form.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_session
+"""
+import time
+
+from ltns.compiler import ltns_compile, ltns_parse
+from ltns.session import Session
+
+
+SIZES = (10, 100, 1000)
+
+FORM = '<def>f{i} <fn*>[x] <if>x <do><def>y <mul*>x {i}</mul*></def> [y :k{i}]</do> :none</if></fn*></def>\n'
+
+
+def main():
+    print(f'{"forms":>6} {"resend":>12} {"session":>12}')
+
+    for n in SIZES:
+        program = ''.join(FORM.format(i=i) for i in range(n))
+        new = FORM.format(i=n)
+
+        start = time.perf_counter()
+        exec(ltns_compile(ltns_parse(program + new)), {})
+        resend = time.perf_counter() - start
+
+        session = Session()
+        session.eval(program)
+        times = []
+        for i in range(n, n + 5):
+            start = time.perf_counter()
+            session.eval(FORM.format(i=i))
+            times.append(time.perf_counter() - start)
+        incremental = min(times)
+
+        print(f'{n:>6} {resend * 1000:>9.2f} ms {incremental * 1000:>9.2f} ms')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+"""
+Latency of compiling a snippet that was already compiled
+
+``compile`` parses and compiles the snippet on every call, ``cached`` goes
+through :func:`ltns.cache.compile_snippet`.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_snippets
+"""
+import timeit
+
+from ltns.cache import compile_snippet
+from ltns.compiler import ltns_compile, ltns_parse
+
+
+SNIPPET = '''
+<if><user.get>"admin"</user.get>
+  :allow
+  <if><in_group>user "editors"</in_group> :review :deny</if></if>
+'''
+
+VERSIONS = {
+    'compile': lambda: ltns_compile(ltns_parse(SNIPPET)),
+    'cached': lambda: compile_snippet(SNIPPET),
+}
+
+
+def main(number=2000):
+    for name, compile_ in VERSIONS.items():
+        compile_()
+        seconds = min(timeit.repeat(compile_, number=number, repeat=5))
+        print(f'{name:<10} {seconds / number * 1e6:10.2f} us')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Startup benchmark of ``import ltns.compiler``
+
+Every scenario runs in a fresh interpreter. Pass paths of other ltns checkouts
+to compare them against this one, e.g. a worktree of an older commit::
+
+    python benchmarks/bench_startup.py ../ltns-old
+"""
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = [
+    ('import', 'import ltns.compiler'),
+    (
+        'import + first parse',
+        'import ltns.compiler; ltns.compiler.ltns_parse("<print>1</print>")',
+    ),
+]
+
+TIMER = '''
+import time
+start = time.perf_counter()
+{}
+print(time.perf_counter() - start)
+'''
+
+
+def run(checkout, statement, cache_home):
+    env = dict(os.environ, PYTHONPATH=checkout, XDG_CACHE_HOME=cache_home)
+    output = subprocess.check_output(
+        [sys.executable, '-c', TIMER.format(statement)],
+        env=env,
+        cwd=checkout,
+    )
+    return float(output)
+
+def bench(checkout, statement, repeat, cold):
+    times = []
+    with tempfile.TemporaryDirectory() as cache_home:
+        for _ in range(repeat):
+            if cold:
+                with tempfile.TemporaryDirectory() as empty_cache_home:
+                    times.append(run(checkout, statement, empty_cache_home))
+            else:
+                times.append(run(checkout, statement, cache_home))
+    return statistics.median(times)
+
+def main(checkouts, repeat=20):
+    for checkout in [ROOT] + checkouts:
+        print(checkout)
+        for name, statement in SCENARIOS:
+            for cold in (True, False):
+                label = f'{name} ({"cold" if cold else "warm"} table cache)'
+                seconds = bench(checkout, statement, repeat, cold)
+                print(f'  {label:<45} {seconds * 1000:8.2f} ms')
+
+if __name__ == '__main__':
+    main([os.path.abspath(path) for path in sys.argv[1:]])
@@ -0,0 +1,6 @@
+__version__ = '0.1.0'
+
+# version of the code generated by the compiler, part of the key of cached
+# code objects: bump it whenever the code compiled from a same source
+# changes, e.g. a new special form lowering or a new default pass
+CODE_VERSION = 6
@@ -0,0 +1,263 @@
+"""
+Array backed representation of model trees
+
+A :class:`LtnsArena` stores a whole tree in a few flat arrays instead of one
+Python object per node, with every symbol, keyword and string interned once.
+Its elements are exposed as :class:`ArenaElement` views, which the compiler
+accepts like :class:`ltns.models.LtnsElement`, so an arena can be compiled
+without building the tree of models again.
+"""
+import struct
+from array import array
+from collections import OrderedDict
+
+from .models import (
+    EMPTY_ATTRIBUTES,
+    LtnsElement,
+    LtnsKeyword,
+    LtnsString,
+    LtnsSymbol,
+    LtnsInteger,
+    LtnsFloat,
+    LtnsComplex,
+    LtnsList,
+)
+
+
+ELEMENT, LIST, SYMBOL, KEYWORD, STRING, INTEGER, FLOAT, COMPLEX = range(8)
+
+_kinds = {
+    LtnsElement: ELEMENT,
+    LtnsList: LIST,
+    LtnsSymbol: SYMBOL,
+    LtnsKeyword: KEYWORD,
+    LtnsString: STRING,
+    LtnsInteger: INTEGER,
+    LtnsFloat: FLOAT,
+    LtnsComplex: COMPLEX,
+}
+
+_models = {kind: model for model, kind in _kinds.items()}
+
+_interned = (SYMBOL, KEYWORD, STRING)
+
+_constant_types = {
+    INTEGER: int,
+    FLOAT: float,
+    COMPLEX: complex,
+}
+
+_doubles = struct.Struct('<dd')
+
+def _constant_key(kind, value):
+    # equal floats are not always the same, e.g. 0.0 and -0.0, so they are
+    # interned by their bits
+    if kind == INTEGER:
+        return value
+    return _doubles.pack(value.real, value.imag)
+
+
+class LtnsArena:
+    """
+    Tree of models stored in flat arrays
+
+    Node ``i`` is of kind ``kinds[i]``. Its value ``values[i]`` indexes
+    ``symbols`` for elements (their name), symbols, keywords and strings, and
+    ``constants`` for numbers. The nodes under node ``i`` are ``counts[i]``
+    consecutive nodes from ``first[i]``: first ``attribute_counts[i]`` pairs of
+    attribute name and value, then the childs. Node 0 is the root.
+    """
+    def __init__(self):
+        self.kinds = array('B')
+        self.values = array('q')
+        self.first = array('q')
+        self.counts = array('q')
+        self.attribute_counts = array('q')
+        self.linenos = array('i')
+        self.colnos = array('i')
+        self.symbols = []
+        self.constants = []
+        self._symbol_index = {}
+        self._constant_index = {}
+
+    def __len__(self):
+        return len(self.kinds)
+
+    @classmethod
+    def from_tree(cls, tree):
+        """
+        Build the arena of the model ``tree``
+        """
+        arena = cls()
+        pending = [tree]
+        arena._add(tree)
+
+        # nodes are laid out breadth first, so that the nodes under each node
+        # are consecutive
+        for i, model in enumerate(pending):
+            arena.first[i] = len(arena.kinds)
+
+            if isinstance(model, LtnsElement):
+                for key, value in model.attributes.items():
+                    arena._add(key)
+                    arena._add(value)
+                    pending += (key, value)
+                arena.attribute_counts[i] = len(model.attributes)
+                nodes = model.childs
+            elif isinstance(model, LtnsList):
+                nodes = model
+            else:
+                continue
+
+            for node in nodes:
+                arena._add(node)
+            pending += nodes
+            arena.counts[i] = len(arena.kinds) - arena.first[i]
+
+        return arena
+
+    def _intern(self, index, table, value, key=None):
+        if key is None:
+            key = value
+        i = index.get(key)
+        if i is None:
+            i = index[key] = len(table)
+            table.append(value)
+        return i
+
+    def _add(self, model):
+        kind = _kinds[type(model)]
+
+        if kind == ELEMENT:
+            value = self._intern(self._symbol_index, self.symbols, str(model.name))
+        elif kind in _interned:
+            value = self._intern(self._symbol_index, self.symbols, str(model))
+        elif kind == LIST:
+            value = 0
+        else:
+            constant = _constant_types[kind](model)
+            value = self._intern(
+                self._constant_index, self.constants, (kind, constant),
+                (kind, _constant_key(kind, constant)),
+            )
+
+        self.kinds.append(kind)
+        self.values.append(value)
+        self.first.append(0)
+        self.counts.append(0)
+        self.attribute_counts.append(0)
+        self.linenos.append(model.lineno or 0)
+        self.colnos.append(model.colno or 0)
+
+    @property
+    def root(self):
+        return self.node(0)
+
+    def _locate(self, model, i):
+        if self.linenos[i]:
+            model.locate(None, None, self.linenos[i], self.colnos[i])
+        return model
+
+    def node(self, i):
+        """
+        Return node ``i``, as a view for elements and as a model otherwise
+        """
+        kind = self.kinds[i]
+
+        if kind == ELEMENT:
+            return ArenaElement(self, i)
+
+        if kind == LIST:
+            first = self.first[i]
+            elements = [self.node(j) for j in range(first, first + self.counts[i])]
+            return self._locate(LtnsList(elements), i)
+
+        if kind in _interned:
+            value = self.symbols[self.values[i]]
+        else:
+            value = self.constants[self.values[i]][1]
+
+        return self._locate(_models[kind](value), i)
+
+    def to_tree(self):
+        """
+        Build the tree of models stored in the arena
+        """
+        models = [None] * len(self.kinds)
+
+        # the nodes under each node come after it
+        for i in reversed(range(len(self.kinds))):
+            kind = self.kinds[i]
+            if kind != ELEMENT:
+                if kind == LIST:
+                    first = self.first[i]
+                    model = self._locate(
+                        LtnsList(models[first:first + self.counts[i]]), i
+                    )
+                else:
+                    model = self.node(i)
+            else:
+                first = self.first[i]
+                pairs = first + 2 * self.attribute_counts[i]
+                attributes = OrderedDict(
+                    (models[j], models[j + 1]) for j in range(first, pairs, 2)
+                )
+                model = self._locate(LtnsElement(
+                    LtnsSymbol(self.symbols[self.values[i]]),
+                    attributes=attributes,
+                    childs=models[pairs:first + self.counts[i]],
+                ), i)
+            models[i] = model
+
+        return models[0]
+
+class ArenaElement:
+    """
+    View of an element node of a :class:`LtnsArena`
+
+    It has the interface of :class:`ltns.models.LtnsElement`; the name,
+    attributes and childs are read from the arena on access.
+    """
+    __slots__ = ('arena', 'index')
+
+    # offsets in the source are not kept in arenas
+    start = end = span = None
+
+    def __init__(self, arena, index):
+        self.arena = arena
+        self.index = index
+
+    @property
+    def name(self):
+        arena = self.arena
+        return LtnsSymbol(arena.symbols[arena.values[self.index]])
+
+    @property
+    def attributes(self):
+        arena, i = self.arena, self.index
+        if not arena.attribute_counts[i]:
+            return EMPTY_ATTRIBUTES
+
+        first = arena.first[i]
+        return OrderedDict(
+            (arena.node(j), arena.node(j + 1))
+            for j in range(first, first + 2 * arena.attribute_counts[i], 2)
+        )
+
+    @property
+    def childs(self):
+        arena, i = self.arena, self.index
+        first = arena.first[i] + 2 * arena.attribute_counts[i]
+        stop = arena.first[i] + arena.counts[i]
+        if first == stop:
+            return ()
+
+        return tuple(arena.node(j) for j in range(first, stop))
+
+    @property
+    def lineno(self):
+        return self.arena.linenos[self.index] or None
+
+    @property
+    def colno(self):
+        return self.arena.colnos[self.index] or None
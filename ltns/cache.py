@@ -0,0 +1,225 @@
+"""
+Persistent cache of compiled ltns code objects
+
+Compiled sources are stored next to the source file in ``__pycache__``, in the
+same spirit as CPython's ``.pyc`` files. Each cache file starts with a header
+made of the Python magic number and a digest of the ltns version, the version
+of the generated code and the source bytes, followed by the marshalled code
+object. A cache hit never touches the lexer, the parser or the compiler.
+
+Code compiled from strings, e.g. snippets embedded in a host program, is
+cached in memory instead by :class:`CodeCache`, see :func:`compile_snippet`.
+"""
+import hashlib
+import importlib.util
+import marshal
+import os
+import sys
+import tempfile
+import threading
+import types
+from collections import OrderedDict, namedtuple
+
+from . import CODE_VERSION, __version__
+from .stats import current as current_stats
+
+
+MAGIC = importlib.util.MAGIC_NUMBER
+
+CACHE_SUFFIX = '.ltnsc'
+
+
+def source_hash(source):
+    """
+    Return the digest identifying ``source`` for the running ltns version and
+    the code it generates
+
+    :param source: source code as bytes
+    """
+    hasher = hashlib.sha256()
+    hasher.update(f'{__version__}\0{CODE_VERSION}\0'.encode())
+    hasher.update(source)
+    return hasher.digest()
+
+def cache_from_source(path):
+    """
+    Return the path of the cache file for the ltns source file at ``path``
+
+    ``foo/bar.ltns`` is cached as ``foo/__pycache__/bar.<tag>.ltnsc``, where
+    ``<tag>`` is the cache tag of the running interpreter.
+    """
+    head, tail = os.path.split(path)
+    base, _ = os.path.splitext(tail)
+    filename = f'{base}.{sys.implementation.cache_tag}{CACHE_SUFFIX}'
+    return os.path.join(head, '__pycache__', filename)
+
+def _header(source):
+    return MAGIC + source_hash(source)
+
+def _read_cache(cache_path, header):
+    try:
+        with open(cache_path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+
+    if data[:len(header)] != header:
+        return None
+
+    try:
+        code = marshal.loads(data[len(header):])
+    except (EOFError, ValueError, TypeError):
+        return None
+
+    if not isinstance(code, types.CodeType):
+        return None
+
+    return code
+
+def _write_cache(cache_path, header, code):
+    directory = os.path.dirname(cache_path)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(header)
+                f.write(marshal.dumps(code))
+            os.replace(temp_path, cache_path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+    except OSError:
+        # The cache is only an optimization, so read-only locations are fine.
+        pass
+
+def compile_source(source, filename, cache_path):
+    """
+    Compile ltns ``source`` bytes, reusing the code object in ``cache_path``
+    if it was compiled from the same source by the same ltns and Python
+    """
+    header = _header(source)
+
+    code = _read_cache(cache_path, header)
+    if code is not None:
+        return code
+
+    from .compiler import ltns_compile, ltns_parse
+
+    code = ltns_compile(ltns_parse(source.decode('utf-8')), filename)
+    _write_cache(cache_path, header, code)
+
+    return code
+
+def load(path):
+    """
+    Return the code object of the ltns source file at ``path``
+
+    The compiled code is cached on disk, so that later loads of an unchanged
+    file skip lexing, parsing and compiling entirely.
+    """
+    with open(path, 'rb') as f:
+        source = f.read()
+
+    return compile_source(source, path, cache_from_source(path))
+
+CacheInfo = namedtuple(
+    'CacheInfo', ('hits', 'misses', 'evictions', 'maxsize', 'currsize'),
+)
+
+# number of code objects kept by the default cache
+SNIPPET_CACHE_SIZE = 512
+
+class CodeCache:
+    """
+    Thread-safe LRU cache of code objects compiled from source strings
+
+    Code objects are keyed by source text and filename. Once ``maxsize`` of
+    them are cached, the least recently used one is evicted. Compilation
+    happens outside the lock, so a snippet compiled by two threads at once
+    is compiled twice, and the result of the first one to finish is kept.
+    """
+    def __init__(self, maxsize=SNIPPET_CACHE_SIZE):
+        if maxsize < 1:
+            raise ValueError('maxsize must be at least 1')
+
+        self.maxsize = maxsize
+        self._codes = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def compile(self, source, filename='<string>'):
+        """
+        Return the code object of the ltns ``source`` string
+        """
+        key = (source, filename)
+
+        with self._lock:
+            code = self._codes.get(key)
+            if code is not None:
+                self._codes.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        stats = current_stats()
+        if code is not None:
+            if stats is not None:
+                stats.count('snippet cache hits')
+            return code
+
+        if stats is not None:
+            stats.count('snippet cache misses')
+
+        from .compiler import ltns_compile, ltns_parse
+
+        code = ltns_compile(ltns_parse(source), filename)
+
+        with self._lock:
+            code = self._codes.setdefault(key, code)
+            while len(self._codes) > self.maxsize:
+                self._codes.popitem(last=False)
+                self.evictions += 1
+
+        return code
+
+    def invalidate(self, source=None, filename=None):
+        """
+        Remove the code objects of ``source`` and/or ``filename``, or all of
+        them if neither is given
+
+        :returns: the number of code objects removed
+        """
+        with self._lock:
+            if source is None and filename is None:
+                removed = len(self._codes)
+                self._codes.clear()
+                return removed
+
+            keys = [
+                key for key in self._codes
+                if source in (None, key[0]) and filename in (None, key[1])
+            ]
+            for key in keys:
+                del self._codes[key]
+            return len(keys)
+
+    def info(self):
+        with self._lock:
+            return CacheInfo(
+                self.hits, self.misses, self.evictions,
+                self.maxsize, len(self._codes),
+            )
+
+# process-wide cache used by compile_snippet
+snippet_cache = CodeCache()
+
+def compile_snippet(source, filename='<string>'):
+    """
+    Compile the ltns ``source`` string, or return the code object it was
+    compiled to by a previous call
+
+    Equivalent to ``ltns_compile(ltns_parse(source), filename)`` for sources
+    compiled repeatedly, e.g. templates or rules. See :data:`snippet_cache`.
+    """
+    return snippet_cache.compile(source, filename)
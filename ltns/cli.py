@@ -0,0 +1,431 @@
+"""
+Command line interface of ltns
+
+``python -m ltns compile [paths]`` compiles ``.ltns`` files, and the
+``.ltns`` files found under directories, to the ``.pyc`` files that the import
+hook of :mod:`ltns.importer` loads. Files are compiled in a pool of processes,
+and files whose ``.pyc`` is up to date are skipped.
+
+``python -m ltns transpile -o out [paths]`` writes the same files as Python
+source to ``out``, with the runtime module they need, so that they can be
+deployed without ltns.
+
+``python -m ltns profile script.ltns [args]`` runs an ltns program and
+reports the lines it spent the most time on, see :mod:`ltns.profiler`.
+
+The commands compiling code take ``-O LEVEL`` to pick the optimization
+passes run, see :mod:`ltns.passes`, and ``--enable-pass`` and
+``--disable-pass`` to switch single passes.
+
+With ``python -m ltns --stats ...``, the time spent in each phase of the
+compilation and counters are reported on stderr, see :mod:`ltns.stats`.
+"""
+import argparse
+import importlib.util
+import marshal
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from py_compile import PycInvalidationMode
+
+from .importer import SOURCE_SUFFIX, cache_from_source
+from .passes import DEFAULT_LEVEL, MAX_LEVEL, Pipeline, passes
+from .stats import Stats, current as current_stats
+
+
+COMPILED, UP_TO_DATE, FAILED = 'compiled', 'up to date', 'failed'
+
+_invalidation_modes = {
+    mode.name.lower().replace('_', '-'): mode for mode in PycInvalidationMode
+}
+
+
+def find_sources(paths):
+    """
+    Return the ``.ltns`` files given in ``paths`` or found under them
+    """
+    sources = []
+
+    for path in paths:
+        if not os.path.isdir(path):
+            sources.append(path)
+            continue
+
+        for root, dirs, files in os.walk(path):
+            dirs[:] = sorted(d for d in dirs if d != '__pycache__')
+            sources.extend(
+                os.path.join(root, name)
+                for name in sorted(files) if name.endswith(SOURCE_SUFFIX)
+            )
+
+    return sources
+
+def pyc_header(path, mode, source=None):
+    """
+    Return the header of the ``.pyc`` file of the source file at ``path``
+
+    The header is validated by the import system like the one of ``.py``
+    files: by mtime and size of the source, or by a hash of its bytes.
+
+    :param mode: a :class:`py_compile.PycInvalidationMode`
+    :param source: bytes of the source, only needed by hash based modes
+    """
+    if mode == PycInvalidationMode.TIMESTAMP:
+        st = os.stat(path)
+        return b''.join((
+            importlib.util.MAGIC_NUMBER,
+            (0).to_bytes(4, 'little'),
+            (int(st.st_mtime) & 0xFFFFFFFF).to_bytes(4, 'little'),
+            (st.st_size & 0xFFFFFFFF).to_bytes(4, 'little'),
+        ))
+
+    flags = 0b01
+    if mode == PycInvalidationMode.CHECKED_HASH:
+        flags |= 0b10
+
+    return b''.join((
+        importlib.util.MAGIC_NUMBER,
+        flags.to_bytes(4, 'little'),
+        importlib.util.source_hash(source),
+    ))
+
+def _is_up_to_date(pyc_path, header):
+    try:
+        with open(pyc_path, 'rb') as f:
+            return f.read(len(header)) == header
+    except OSError:
+        return False
+
+def _source_mode(path):
+    # like importlib, files written from a source are readable by the same
+    # users, and writable by their owner
+    return (os.stat(path).st_mode & 0o666) | 0o200
+
+def _write_atomic(path, data, mode=0o666):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+
+    # created by os.open rather than tempfile, whose files are private, so
+    # that the umask applies to mode
+    temp_path = f'{path}.{os.getpid()}.{id(data)}'
+    fd = os.open(temp_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, mode & 0o666)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+def compile_file(path, mode=PycInvalidationMode.TIMESTAMP, force=False,
+                 optimize=None):
+    """
+    Compile the ltns source file at ``path`` to its ``.pyc`` file
+
+    Errors are returned instead of raised, so that one broken file does not
+    stop a batch. ``optimize`` is given to :func:`ltns.compiler.ltns_compile`,
+    and code compiled by other passes than the default ones is written to its
+    own ``.pyc`` file, see :func:`ltns.importer.cache_from_source`.
+
+    :returns: ``(path, status, seconds, error)``, where ``status`` is one of
+              ``COMPILED``, ``UP_TO_DATE`` and ``FAILED``
+    """
+    start = time.perf_counter()
+
+    try:
+        pyc_path = cache_from_source(path, optimize)
+
+        source = None
+        if mode != PycInvalidationMode.TIMESTAMP:
+            with open(path, 'rb') as f:
+                source = f.read()
+
+        header = pyc_header(path, mode, source)
+        if not force and _is_up_to_date(pyc_path, header):
+            return path, UP_TO_DATE, time.perf_counter() - start, None
+
+        if source is None:
+            with open(path, 'rb') as f:
+                source = f.read()
+
+        from .compiler import ltns_compile, ltns_parse
+
+        code = ltns_compile(
+            ltns_parse(importlib.util.decode_source(source)), path, optimize
+        )
+        _write_atomic(
+            pyc_path, header + marshal.dumps(code), _source_mode(path)
+        )
+    except Exception as e:
+        error = ''.join(traceback.format_exception_only(type(e), e)).strip()
+        return path, FAILED, time.perf_counter() - start, error
+
+    return path, COMPILED, time.perf_counter() - start, None
+
+def _compile_file_with_stats(path, mode, force, optimize):
+    with Stats() as stats:
+        result = compile_file(path, mode, force, optimize)
+    return result, stats
+
+def compile_files(paths, jobs=1, mode=PycInvalidationMode.TIMESTAMP, force=False,
+                  optimize=None):
+    """
+    Compile the source files ``paths``, in ``jobs`` processes
+
+    Yields the results of :func:`compile_file` in the order of ``paths``.
+    The statistics recorded by the processes are added to the current
+    :class:`~ltns.stats.Stats`, if any.
+
+    :param jobs: number of processes, all the CPUs if ``0``
+    """
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+
+    modes = [mode] * len(paths)
+    forces = [force] * len(paths)
+    optimizes = [optimize] * len(paths)
+
+    if jobs == 1 or len(paths) < 2:
+        yield from map(compile_file, paths, modes, forces, optimizes)
+        return
+
+    # send files in chunks, as most of them are small
+    chunksize = max(1, len(paths) // (jobs * 8))
+
+    stats = current_stats()
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        if stats is None:
+            yield from executor.map(
+                compile_file, paths, modes, forces, optimizes,
+                chunksize=chunksize,
+            )
+            return
+
+        for result, worker_stats in executor.map(
+            _compile_file_with_stats, paths, modes, forces, optimizes,
+            chunksize=chunksize,
+        ):
+            stats.merge(worker_stats)
+            yield result
+
+def _pipeline(args):
+    return Pipeline(args.optimize, args.enable_pass, args.disable_pass)
+
+def compile_command(args):
+    sources = find_sources(args.paths)
+    mode = _invalidation_modes[args.invalidation_mode]
+    pipeline = _pipeline(args)
+
+    start = time.perf_counter()
+    counts = {COMPILED: 0, UP_TO_DATE: 0, FAILED: 0}
+
+    for path, status, seconds, error in compile_files(
+        sources, args.jobs, mode, args.force, pipeline
+    ):
+        counts[status] += 1
+
+        if status == FAILED:
+            print(f'{path}: {status} ({seconds * 1000:.1f} ms)', file=sys.stderr)
+            print(f'  {error}', file=sys.stderr)
+        elif not args.quiet and (status == COMPILED or args.verbose):
+            print(f'{path}: {status} ({seconds * 1000:.1f} ms)')
+
+    if not args.quiet:
+        print(
+            f'{counts[COMPILED]} compiled, {counts[UP_TO_DATE]} up to date, '
+            f'{counts[FAILED]} failed in {time.perf_counter() - start:.2f} s'
+        )
+
+    return 1 if counts[FAILED] else 0
+
+def transpile_file(path, output, optimize=None):
+    """
+    Write the Python source of the ltns source file at ``path`` to ``output``
+
+    :returns: ``(path, status, seconds, error)`` like :func:`compile_file`
+    """
+    start = time.perf_counter()
+
+    try:
+        with open(path, 'rb') as f:
+            source = importlib.util.decode_source(f.read())
+
+        from .compiler import ltns_parse, ltns_transpile
+
+        code = ltns_transpile(ltns_parse(source), optimize=optimize)
+        _write_atomic(output, code.encode('utf-8'), _source_mode(path))
+    except Exception as e:
+        error = ''.join(traceback.format_exception_only(type(e), e)).strip()
+        return path, FAILED, time.perf_counter() - start, error
+
+    return path, COMPILED, time.perf_counter() - start, None
+
+def transpile_command(args):
+    from .compiler import write_runtime
+
+    os.makedirs(args.output, exist_ok=True)
+    pipeline = _pipeline(args)
+    failed = 0
+
+    for path in args.paths:
+        # directories are written under their own name, so that packages keep
+        # their name
+        base = os.path.dirname(os.path.normpath(path))
+
+        for source in find_sources([path]):
+            relative = os.path.relpath(source, base)
+            output = os.path.join(
+                args.output, os.path.splitext(relative)[0] + '.py'
+            )
+
+            path, status, seconds, error = transpile_file(
+                source, output, pipeline
+            )
+            if status == FAILED:
+                failed += 1
+                print(f'{path}: {status} ({seconds * 1000:.1f} ms)', file=sys.stderr)
+                print(f'  {error}', file=sys.stderr)
+            elif not args.quiet:
+                print(f'{path} -> {output} ({seconds * 1000:.1f} ms)')
+
+    write_runtime(args.output)
+
+    return 1 if failed else 0
+
+def profile_command(args):
+    from . import importer
+    from .compiler import ltns_compile, ltns_parse
+    from .profiler import LineProfiler
+
+    path = args.path
+    with open(path, 'rb') as f:
+        source = importlib.util.decode_source(f.read())
+    code = ltns_compile(ltns_parse(source), path, _pipeline(args))
+
+    # run the program like python runs scripts
+    argv, sys.argv = sys.argv, [path, *args.args]
+    directory = os.path.dirname(os.path.abspath(path))
+    sys.path.insert(0, directory)
+    namespace = {'__name__': '__main__', '__file__': path}
+    importer.install(_pipeline(args))
+
+    profiler = LineProfiler()
+    status = 0
+    try:
+        profiler.runcode(code, namespace)
+    except SystemExit as e:
+        status = e.code
+    except Exception:
+        traceback.print_exc()
+        status = 1
+    finally:
+        importer.uninstall()
+        sys.path.remove(directory)
+        sys.argv = argv
+
+    print(profiler.report(args.lines))
+
+    return status
+
+def _add_optimize_arguments(parser):
+    names = [p.name for p in passes()]
+
+    parser.add_argument(
+        '-O', '--optimize', type=int, choices=range(MAX_LEVEL + 1),
+        default=DEFAULT_LEVEL, metavar='LEVEL',
+        help=f'optimization level, from 0 to {MAX_LEVEL}, {DEFAULT_LEVEL} by '
+             'default',
+    )
+    parser.add_argument(
+        '--enable-pass', action='append', default=[], choices=names,
+        metavar='PASS', help='run the pass PASS whatever the level',
+    )
+    parser.add_argument(
+        '--disable-pass', action='append', default=[], choices=names,
+        metavar='PASS', help='do not run the pass PASS',
+    )
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='ltns')
+    parser.add_argument(
+        '--stats', action='store_true',
+        help='report the time spent in each phase and counters on stderr',
+    )
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    compile_parser = commands.add_parser(
+        'compile', help='compile .ltns files to .pyc files',
+    )
+    compile_parser.add_argument(
+        'paths', nargs='+', metavar='path',
+        help='.ltns file, or directory searched recursively',
+    )
+    compile_parser.add_argument(
+        '-j', '--jobs', type=int, default=0,
+        help='number of processes, all the CPUs by default',
+    )
+    compile_parser.add_argument(
+        '-f', '--force', action='store_true',
+        help='compile files even if their .pyc is up to date',
+    )
+    compile_parser.add_argument(
+        '--invalidation-mode', choices=sorted(_invalidation_modes),
+        default='timestamp',
+        help='how the import system checks that a .pyc is up to date',
+    )
+    compile_parser.add_argument(
+        '-q', '--quiet', action='store_true', help='only report failures',
+    )
+    compile_parser.add_argument(
+        '-v', '--verbose', action='store_true',
+        help='also report files that are up to date',
+    )
+    _add_optimize_arguments(compile_parser)
+    compile_parser.set_defaults(func=compile_command)
+
+    transpile_parser = commands.add_parser(
+        'transpile', help='transpile .ltns files to standalone .py files',
+    )
+    transpile_parser.add_argument(
+        'paths', nargs='+', metavar='path',
+        help='.ltns file, or directory searched recursively',
+    )
+    transpile_parser.add_argument(
+        '-o', '--output', required=True,
+        help='directory receiving the .py files and the runtime module',
+    )
+    transpile_parser.add_argument(
+        '-q', '--quiet', action='store_true', help='only report failures',
+    )
+    _add_optimize_arguments(transpile_parser)
+    transpile_parser.set_defaults(func=transpile_command)
+
+    profile_parser = commands.add_parser(
+        'profile', help='run an .ltns program and report its hot lines',
+    )
+    profile_parser.add_argument('path', help='.ltns program to run')
+    profile_parser.add_argument(
+        'args', nargs=argparse.REMAINDER, help='arguments of the program',
+    )
+    profile_parser.add_argument(
+        '-n', '--lines', type=int, default=20,
+        help='number of lines reported, 20 by default',
+    )
+    _add_optimize_arguments(profile_parser)
+    profile_parser.set_defaults(func=profile_command)
+
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if not args.stats:
+        return args.func(args)
+
+    with Stats() as stats:
+        status = args.func(args)
+
+    print(stats.report(), file=sys.stderr)
+    return status
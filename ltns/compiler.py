@@ -1,8 +1,18 @@
 import ast
-from functools import partial
-
-from .lexer import lexer
-from .parser import parser
+import hashlib
+import keyword
+import os
+import re
+from contextlib import contextmanager
+from functools import lru_cache, partial
+from types import GeneratorType
+
+from .arena import ArenaElement
+from .folding import fold_bin_op
+from .lexer import get_lexer
+from .parser import get_parser, parse_forms
+from .passes import AST, TREE, get_pipeline, is_pure
+from .stats import current as current_stats, phase
 from .models import (
     LtnsElement,
     LtnsKeyword,
@@ -32,22 +42,227 @@ class Result:
     def expr_statement(self):
         return ast.Expr(value=self.expr)
 
+# module providing LtnsKeyword to transpiled code
+RUNTIME_MODULE = 'ltns_runtime'
+
 def ltns_parse(code):
-    res = parser.parse(lexer.lex(code))
-    return LtnsElement('do', childs=res)
+    tokens = get_lexer().lex(code)
+
+    stats = current_stats()
+    if stats is not None:
+        # lex ahead of the parser, to time both phases
+        with stats.phase('lex'):
+            tokens = list(tokens)
+        stats.count('tokens lexed', len(tokens))
+        tokens = iter(tokens)
+
+    with phase('parse'):
+        res = get_parser().parse(tokens)
+    tree = LtnsElement('do', childs=res)
+
+    if stats is not None:
+        stats.count('nodes parsed', _count_nodes(tree) - 1)
+
+    return tree
+
+def _count_nodes(tree):
+    count = 0
+    stack = [tree]
+
+    while stack:
+        node = stack.pop()
+        count += 1
+        if isinstance(node, (LtnsElement, ArenaElement)):
+            stack.extend(node.childs)
+            stack.extend(node.attributes.values())
+        elif isinstance(node, LtnsList):
+            stack.extend(node)
+
+    return count
+
+CHUNK_SIZE = 64 * 1024
+
+def ltns_parse_iter(source):
+    """
+    Parse ``source`` lazily, yielding each top-level form once it is complete
+
+    :param source: a string, a text file object or an iterable of strings
+    """
+    if isinstance(source, str):
+        chunks = (source,)
+    elif hasattr(source, 'read'):
+        chunks = iter(partial(source.read, CHUNK_SIZE), '')
+    else:
+        chunks = source
+
+    return parse_forms(get_lexer('scanner').lex_chunks(chunks))
+
+def ltns_compile(tree, filename='<string>', optimize=None):
+    """
+    Compile the model ``tree`` to a code object
+
+    :param optimize: optimization level or :class:`ltns.passes.Pipeline`,
+                     the default level if ``None``
+    """
+    return _compile_module(LtnsCompiler(optimize), tree, filename)
+
+def ltns_compile_iter(forms, filename='<string>', optimize=None):
+    """
+    Compile each of ``forms`` to its own code object, as they are consumed
+
+    The forms share one compiler, so names of temporary functions are unique
+    across the code objects, and constants are only defined by the first code
+    object using them, when they are executed in the same namespace.
+    """
+    compiler = LtnsCompiler(optimize)
+
+    for form in forms:
+        yield _compile_module(compiler, form, filename)
+
+def ltns_eval(tree, namespace=None, filename='<string>', interpret=None,
+              optimize=None):
+    """
+    Return the value of the model ``tree``, with globals ``namespace``
+
+    Trees that :mod:`ltns.evaluator` supports are interpreted directly,
+    which is several times faster than compiling them for a single
+    evaluation, whatever their size; the others are compiled. Code evaluated
+    repeatedly is better compiled once, and trees evaluated one after the
+    other in the same namespace are better evaluated by a
+    :class:`ltns.session.Session`, which reuses their pooled constants.
+
+    :param interpret: ``None`` to interpret supported trees, ``True`` to
+                      always interpret, raising :exc:`ValueError` for trees
+                      that are not supported, and ``False`` to always compile
+    :param optimize: optimization level of the compiled trees, see
+                     :func:`ltns_compile`
+    """
+    if namespace is None:
+        namespace = {}
+
+    return _eval(LtnsCompiler(optimize), tree, namespace, filename, interpret)
+
+def _eval(compiler, tree, namespace, filename, interpret):
+    from . import evaluator
+
+    if interpret is None:
+        interpret = evaluator.interpretable(tree)
+    elif interpret and not evaluator.interpretable(tree):
+        raise ValueError('tree cannot be interpreted')
 
-def ltns_compile(tree, filename='<string>'):
-    compiler = LtnsCompiler()
-    res = compiler.compile(tree)
+    if interpret:
+        with phase('interpret'):
+            return evaluator.evaluate(tree, namespace)
 
-    res.stmts.append(res.expr_statement)
-    body = res.stmts
+    code = _compile_module(compiler, tree, filename, result=_EVAL_RESULT)
+    exec(code, namespace)
+    return namespace.pop(_EVAL_RESULT)
 
-    tree = ast.Module(body=body)
+# variable receiving the value of code compiled by ltns_eval
+_EVAL_RESULT = '_ltns_eval_result'
 
-    ast.fix_missing_locations(tree) # TODO: add location to ast objects
+def ltns_transpile(tree, runtime=RUNTIME_MODULE, optimize=None):
+    """
+    Return Python source code equivalent to the model ``tree``
+
+    The code only depends on the module ``runtime``, which must provide
+    ``LtnsKeyword``, like the one written by :func:`write_runtime`.
+    ``optimize`` is the optimization level, see :func:`ltns_compile`.
+    """
+    compiler = LtnsCompiler(optimize)
+    compiler.keyword_module = runtime
+    return ast.unparse(_build_module(compiler, tree)) + '\n'
+
+def write_runtime(directory):
+    """
+    Write the runtime module needed by transpiled code in ``directory``
+    """
+    from . import runtime
+
+    with open(runtime.__file__, 'rb') as f:
+        source = f.read()
+
+    path = os.path.join(directory, RUNTIME_MODULE + '.py')
+    with open(path, 'wb') as f:
+        f.write(source)
 
-    return compile(tree, filename, 'exec')
+    return path
+
+def _build_module(compiler, tree, result=None):
+    """
+    Return the module of ``tree``, storing its value in the variable
+    ``result`` if given
+    """
+    compiler._stats = current_stats()
+    pipeline = compiler.pipeline
+
+    tree = pipeline.run(TREE, tree, compiler)
+
+    with phase('compile'):
+        res = compiler.compile(tree)
+
+    if result is None:
+        stmt = res.expr_statement
+    else:
+        stmt = ast.Assign(
+            targets=[ast.Name(id=result, ctx=ast.Store())], value=res.expr,
+        )
+    res.stmts.append(ast.copy_location(stmt, res.expr))
+    body = compiler.prelude() + res.stmts
+
+    tree = pipeline.run(
+        AST, ast.Module(body=body, type_ignores=[]), compiler,
+    )
+
+    with phase('fix_missing_locations'):
+        fix_missing_locations(tree)
+
+    return tree
+
+def _compile_module(compiler, tree, filename, result=None):
+    tree = _build_module(compiler, tree, result)
+
+    with phase('bytecode'):
+        return compile(tree, filename, 'exec')
+
+def fix_missing_locations(tree):
+    """
+    Like :func:`ast.fix_missing_locations`, without recursion
+    """
+    stack = [(tree, 1, 0, 1, 0)]
+
+    while stack:
+        node, lineno, col_offset, end_lineno, end_col_offset = stack.pop()
+
+        if 'lineno' in node._attributes:
+            if getattr(node, 'lineno', None) is None:
+                # statements like return and assignments point at their value
+                value = getattr(node, 'value', None)
+                if getattr(value, 'lineno', None) is not None:
+                    ast.copy_location(node, value)
+            if getattr(node, 'lineno', None) is None:
+                node.lineno = lineno
+            else:
+                lineno = node.lineno
+            if getattr(node, 'end_lineno', None) is None:
+                node.end_lineno = end_lineno
+            else:
+                end_lineno = node.end_lineno
+            if getattr(node, 'col_offset', None) is None:
+                node.col_offset = col_offset
+            else:
+                col_offset = node.col_offset
+            if getattr(node, 'end_col_offset', None) is None:
+                node.end_col_offset = end_col_offset
+            else:
+                end_col_offset = node.end_col_offset
+
+        for child in ast.iter_child_nodes(node):
+            stack.append((child, lineno, col_offset, end_lineno, end_col_offset))
+
+    return tree
+
+_elements = (LtnsElement, ArenaElement)
 
 _model_compiler = {}
 
@@ -65,132 +280,566 @@ def special(name, args=['name', 'childs', 'attrs']):
         return f
     return decorator
 
+CALLEE_CACHE_SIZE = 4096
+
+# parts of dotted callee names that are symbols, like my-func, rather than
+# Python expressions
+_symbol_part = re.compile(r'[^\W\d][\w?!*-]*')
+
+@lru_cache(maxsize=CALLEE_CACHE_SIZE)
+def _resolve_callee(name):
+    parts = name.split('.')
+    if name.isascii() and all(_symbol_part.fullmatch(part) for part in parts):
+        return tuple(parts), None
+
+    return None, ast.parse(name, mode='eval').body # TODO: handle exception of parsing
+
+@lru_cache(maxsize=CALLEE_CACHE_SIZE)
+def mangle(name):
+    """
+    Return the Python name of the variable named ``name`` in ltns
+
+    Each dotted part that is not a Python identifier, like ``my-var``, or is
+    a keyword, is prefixed with ``_ltns_`` and its characters that cannot be
+    in identifiers are written as ``_x<hex code>_``, so that compiled and
+    transpiled code use the same valid names.
+    """
+    return '.'.join(_mangle_part(part) for part in name.split('.'))
+
+def _mangle_part(part):
+    if part.isidentifier() and not keyword.iskeyword(part):
+        return part
+
+    return '_ltns_' + ''.join(
+        c if ('_' + c).isidentifier() else f'_x{ord(c):x}_' for c in part
+    )
+
+def _copy_expr(node):
+    # copies fields only, so that the copy has no location yet
+    new = type(node).__new__(type(node))
+
+    for field in node._fields:
+        value = getattr(node, field, None)
+        if isinstance(value, list):
+            value = [
+                _copy_expr(x) if isinstance(x, ast.AST) else x for x in value
+            ]
+        elif isinstance(value, ast.AST) and not isinstance(value, ast.expr_context):
+            value = _copy_expr(value)
+        setattr(new, field, value)
+
+    return new
+
+def callee(name):
+    """
+    Return a new expression of the function called by elements named ``name``
+
+    Symbols and dotted symbols are built directly, their parts mangled like
+    variables, anything else is parsed by Python once and copied afterwards.
+    """
+    parts, expr = _resolve_callee(str(name))
+
+    if parts is None:
+        return _copy_expr(expr)
+
+    expr = ast.Name(id=mangle(parts[0]), ctx=ast.Load())
+    for part in parts[1:]:
+        expr = ast.Attribute(value=expr, attr=mangle(part), ctx=ast.Load())
+
+    return expr
+
+def _pooled_name(prefix, key):
+    # names are only spelled out for keys that cannot be mistaken for a
+    # digest, which starts with an underscore
+    if key.isidentifier() and key.isascii() and not key.startswith('_'):
+        return f'{prefix}_{key}'
+
+    digest = hashlib.blake2b(
+        key.encode('utf-8', 'surrogatepass'), digest_size=8,
+    ).hexdigest()
+    return f'{prefix}__{digest}'
+
+class _Frame:
+    """
+    Python function being compiled
+
+    ``kind`` is ``'fn'`` for functions of ``fn*``, ``'async-fn'`` for
+    coroutine functions of ``async-fn*`` and ``'let'`` for the functions
+    holding the bindings of a ``let`` at module level.
+    """
+    __slots__ = ('kind', 'globals', 'nonlocals')
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.globals = set()
+        self.nonlocals = set()
+
+    def declarations(self):
+        stmts = []
+        if self.globals:
+            stmts.append(ast.Global(names=sorted(self.globals)))
+        if self.nonlocals:
+            stmts.append(ast.Nonlocal(names=sorted(self.nonlocals)))
+        return stmts
+
+_no_arguments = dict(
+    posonlyargs=[],
+    args=[],
+    vararg=None,
+    kwonlyargs=[],
+    kw_defaults=[],
+    kwarg=None,
+    defaults=[],
+)
+
 class LtnsCompiler:
-    def _temp_func_name(self):
-        if not hasattr(self, '_temp'):
-            self._temp = 0
-        self._temp += 1
-        return f'_temp_func_{self._temp}'
+    """
+    Compiler of models into Python AST
 
-    def _temp_var_name(self):
+    Model compilers and special forms are generators: they yield the nodes
+    they need compiled, receive their expressions back, and return their own
+    expression. Statements are not returned but emitted with :meth:`emit`
+    into the block being compiled, in evaluation order. :meth:`compile` runs
+    them from an explicit stack, so nesting is limited by memory only.
+    """
+    # module the prelude imports LtnsKeyword from
+    keyword_module = LtnsKeyword.__module__
+
+    # whether the node being dispatched is in tail position of a loop, and
+    # whether the next node dispatched will be
+    _tail = False
+    _next_tail = False
+
+    # statistics recording the module being compiled, see :mod:`ltns.stats`
+    _stats = None
+
+    # model being compiled, whose position is given to the emitted code
+    _model = None
+
+    def __init__(self, optimize=None):
+        # passes run on the trees compiled, see :mod:`ltns.passes`
+        self.pipeline = get_pipeline(optimize)
+
+        # names of the variables made by the compiler: the temporaries and
+        # pooled constants, never rebound before being read, and the
+        # bindings of let
+        self.temporaries = set()
+        self.bindings = set()
+
+    def _temp_name(self, prefix):
         if not hasattr(self, '_temp'):
             self._temp = 0
         self._temp += 1
-        return f'_temp_var_{self._temp}'
-
-    def _compile_branch(self, branch):
-        result = Result()
+        name = f'{prefix}_{self._temp}'
+        self.temporaries.add(name)
+        return name
 
-        for x in branch[:-1]:
-            res = self.compile(x)
-            result.stmts += res.stmts
-            result.stmts += [res.expr_statement]
+    def _temp_func_name(self):
+        if self._stats is not None:
+            self._stats.count('temp functions')
+        return self._temp_name('_temp_func')
 
-        res = self.compile(branch[-1])
-        result.stmts += res.stmts
-        result.expr = res.expr
+    def _temp_var_name(self):
+        return self._temp_name('_temp_var')
+
+    def _pool(self, prefix, value, key):
+        """
+        Return the name of a module level variable set to the expression
+        ``value`` before anything else runs
+
+        The name is made from ``key``, a text identifying the value, so that
+        modules compiled separately and run in the same namespace give
+        different names to different values.
+        """
+        if not hasattr(self, '_constants'):
+            self._constants = []
+            self._constants_defined = 0
+            self._pooled = set()
+
+        name = _pooled_name(prefix, key)
+        if name not in self._pooled:
+            self._pooled.add(name)
+            self.temporaries.add(name)
+            self._constants.append(ast.Assign(
+                targets=[ast.Name(id=name, ctx=ast.Store())],
+                value=value,
+            ))
+        return ast.Name(id=name, ctx=ast.Load())
+
+    def _is_constant(self, expr):
+        return isinstance(expr, ast.Constant) or (
+            isinstance(expr, ast.Name) and expr.id in getattr(self, '_pooled', ())
+        )
 
-        return result
+    def prelude(self):
+        """
+        Return the statements defining the constants used by the code
+        compiled since the last call
+        """
+        constants = getattr(self, '_constants', [])
+        stmts = constants[getattr(self, '_constants_defined', 0):]
+        self._constants_defined = len(constants)
+
+        if stmts and any(
+            stmt.targets[0].id.startswith('_keyword_') for stmt in stmts
+        ):
+            stmts.insert(0, ast.ImportFrom(
+                module=self.keyword_module,
+                names=[ast.alias(name='LtnsKeyword', asname='_LtnsKeyword')],
+                level=0,
+            ))
+
+        return stmts
+
+    def _frame(self):
+        frames = getattr(self, '_frames', None)
+        return frames[-1] if frames else None
+
+    @contextmanager
+    def _function(self, frame):
+        """
+        Compile the body of the Python function ``frame``
+        """
+        if not hasattr(self, '_frames'):
+            self._frames = []
+
+        self._frames.append(frame)
+        try:
+            yield frame
+        finally:
+            self._frames.pop()
+
+    @contextmanager
+    def _bind(self, names=(), let=False):
+        """
+        Bind ``names`` in a new scope, which can be extended until the block
+        ends
+
+        Scopes map names to their name in Python, the frame owning them and
+        whether they are bound by ``let``. Only ``let`` bindings are renamed.
+        """
+        if not hasattr(self, '_scopes'):
+            self._scopes = []
+
+        frame = self._frame()
+        scope = {name: (mangle(name), frame, let) for name in names}
+        self._scopes.append(scope)
+        try:
+            yield scope
+        finally:
+            self._scopes.pop()
+
+    def _lookup(self, name):
+        for scope in reversed(getattr(self, '_scopes', ())):
+            if name in scope:
+                return scope[name]
+        return None
+
+    def _load_name(self, name):
+        binding = self._lookup(name)
+        return mangle(name) if binding is None else binding[0]
+
+    def _store_name(self, name):
+        """
+        Return the Python name assigned by ``def name``, declaring it in the
+        current function when it belongs to another scope
+        """
+        frame = self._frame()
+        binding = self._lookup(name)
+        if binding is None:
+            binding = (mangle(name), None, False)
+
+        pyname, owner, let = binding
+        if owner is not frame:
+            if owner is None:
+                # functions of let at module level stand for module level code
+                if let or frame.kind == 'let':
+                    frame.globals.add(pyname)
+            elif let:
+                frame.nonlocals.add(pyname)
+
+        return pyname
+
+    def emit(self, stmt):
+        self._locate(stmt)
+        self._stmts.append(stmt)
+
+    @contextmanager
+    def _block(self):
+        """
+        Emit statements into a new list for the duration of the block
+        """
+        outer = getattr(self, '_stmts', None)
+        self._stmts = stmts = []
+        try:
+            yield stmts
+        finally:
+            self._stmts = outer
+
+    def _compile_branch(self, branch, tail=False):
+        for x in branch[:-1]:
+            expr = yield x
+            self.emit(ast.Expr(value=expr))
+
+        self._next_tail = tail
+        return (yield branch[-1])
+
+    def _compile_operands(self, nodes, exprs=()):
+        """
+        Compile ``nodes`` in order, following the compiled ``exprs``
+
+        Statements emitted by an operand run before the expression using the
+        operands is evaluated, so the operands before it are first saved into
+        temporary variables, unless evaluating them has no effect.
+        """
+        exprs = list(exprs)
+
+        for node in nodes:
+            mark = len(self._stmts)
+            expr = yield node
+
+            if len(self._stmts) > mark:
+                spills = []
+                for i, operand in enumerate(exprs):
+                    if not is_pure(operand, self.temporaries):
+                        temp_var_name = self._temp_var_name()
+                        spills.append(ast.Assign(
+                            targets=[ast.Name(id=temp_var_name, ctx=ast.Store())],
+                            value=operand,
+                        ))
+                        exprs[i] = ast.Name(id=temp_var_name, ctx=ast.Load())
+                        self._locate(spills[-1])
+                self._stmts[mark:mark] = spills
+
+            exprs.append(expr)
+
+        return exprs
 
     def _compile_args(self, args, kwargs):
+        vararg = None
+        posarg = args
         for i, arg in enumerate(args):
             if arg == '&':
-                vararg = ast.arg(str(args[i+1], None), None)
+                vararg = ast.arg(mangle(str(args[i+1])), None)
                 posarg = args[:i]
-        else:
-            vararg = None
-            posarg = args
+                break
+
+        for name in kwargs:
+            # callers pass keyword arguments by their own names
+            if not name.isidentifier() or keyword.iskeyword(name):
+                raise ValueError(f"cannot name a keyword parameter {name!r}")
+
+        kw_defaults = yield from self._compile_operands(kwargs.values())
 
         return ast.arguments(
-            args=[ast.arg(str(x), None) for x in posarg],
+            posonlyargs=[],
+            args=[ast.arg(mangle(str(x)), None) for x in posarg],
             vararg=vararg,
             kwonlyargs=[ast.arg(str(x), None) for x in kwargs],
             kwarg=None,
             defaults=[],
-            kw_defaults=list(kwargs.values()),
+            kw_defaults=kw_defaults,
         )
 
     def compile(self, node):
-        return _model_compiler[type(node)](self, node)
+        with self._block() as stmts:
+            expr = self._drive(node)
+
+        return Result(stmts=stmts, expr=expr)
+
+    def _dispatch(self, node):
+        self._tail, self._next_tail = self._next_tail, False
+        if self._stats is not None:
+            self._stats.count('compiled ' + type(node).__name__)
+
+        self._model = node
+        result = _model_compiler[type(node)](self, node)
+        if type(result) is not GeneratorType:
+            self._locate(result, node)
+        return result
+
+    def _locate(self, node, model=None):
+        """
+        Give the position of ``model`` to ``node``, unless it has one
+
+        ``model`` defaults to the model being compiled. Only the root node is
+        located: :func:`fix_missing_locations` gives its position to the nodes
+        below it that were not compiled from a model of their own.
+        """
+        # looked up in __dict__, as missing attributes of nodes are slow to
+        # look up
+        if node is None or 'lineno' in node.__dict__:
+            return
+
+        # statements like return and assignments point at their value
+        value = node.__dict__.get('value')
+        if isinstance(value, ast.AST) and 'lineno' in value.__dict__:
+            node.lineno = value.lineno
+            node.col_offset = value.col_offset
+            node.end_lineno = value.end_lineno
+            node.end_col_offset = value.end_col_offset
+            return
+
+        if model is None:
+            model = self._model
+        lineno = getattr(model, 'lineno', None)
+        if lineno is None:
+            return
+
+        # elements and lists can span lines, so only their opening is pointed
+        # at
+        if type(model) in _elements:
+            width = len(model.name) + 1
+        elif model.start is None or type(model) is LtnsList:
+            width = 1
+        else:
+            width = model.end - model.start
+
+        node.lineno = node.end_lineno = lineno
+        node.col_offset = col_offset = model.colno - 1
+        node.end_col_offset = col_offset + width
+
+    def _drive(self, node):
+        stack = []
+        result = self._dispatch(node)
+        error = None
+
+        while True:
+            if error is None:
+                if type(result) is GeneratorType:
+                    stack.append((result, node))
+                    result = None
+                elif not stack:
+                    return result
+
+            # resume the innermost compiler with the expression it asked for
+            generator, self._model = stack[-1]
+            try:
+                if error is not None:
+                    error, thrown = None, error
+                    node = generator.throw(thrown)
+                else:
+                    node = generator.send(result)
+            except StopIteration as e:
+                stack.pop()
+                result = e.value
+                self._locate(result)
+                continue
+            except BaseException as e:
+                # let the outer compilers clean up, e.g. close their blocks
+                stack.pop()
+                if not stack:
+                    raise
+                error = e
+                continue
+
+            try:
+                result = self._dispatch(node)
+            except BaseException as e:
+                error = e
 
     @model(LtnsElement)
+    @model(ArenaElement)
     def compile_element(self, element):
         if element.name in _special_form_compiler:
+            if self._stats is not None:
+                self._stats.count('special form ' + element.name)
             return _special_form_compiler[element.name](
                 self, *element.childs, **element.attributes
             )
 
-        func = ast.parse(element.name, mode='eval').body # TODO: handle exception of parsing
-
-        result = Result()
+        return self._compile_call(element)
+
+    def _compile_call(self, element):
+        childs = element.childs
+        attributes = element.attributes
+
+        func = callee(element.name)
+        if getattr(self, '_scopes', None):
+            parts, _ = _resolve_callee(str(element.name))
+            if parts is None:
+                for node in ast.walk(func):
+                    if isinstance(node, ast.Name):
+                        node.id = self._load_name(node.id)
+            else:
+                # symbols are looked up by their name before mangling
+                node = func
+                while isinstance(node, ast.Attribute):
+                    node = node.value
+                node.id = self._load_name(parts[0])
+
+        func, *exprs = yield from self._compile_operands(
+            [*childs, *attributes.values()], [func]
+        )
 
-        args = []
+        args = exprs[:len(childs)]
         keywords = []
-
-        for child in element.childs:
-            res = self.compile(child)
-            args.append(res.expr)
-            result.stmts += res.stmts
-
-        for key, value in element.attributes.items():
-            res = self.compile(value)
-            keywords.append(ast.keyword(arg=str(key), value=res.expr))
-            result.stmts += res.stmts
-
-        expr = ast.Call(func=func, args=args, keywords=keywords)
-        result.expr = expr
-
-        return result
+        for key, value in zip(attributes, exprs[len(childs):]):
+            key = str(key)
+            if key.isidentifier() and not keyword.iskeyword(key):
+                keywords.append(ast.keyword(arg=key, value=value))
+            else:
+                # names that Python cannot spell, like class or data-id
+                keywords.append(ast.keyword(arg=None, value=ast.Dict(
+                    keys=[ast.Constant(key)], values=[value],
+                )))
+
+        return ast.Call(func=func, args=args, keywords=keywords)
+
+    _name_constants = {
+        'True': True,
+        'False': False,
+        'None': None,
+    }
 
     @model(LtnsSymbol)
     def compile_symbol(self, symbol):
-        expr = ast.Name(id=str(symbol), ctx=ast.Load())
+        if symbol in self._name_constants:
+            return ast.NameConstant(self._name_constants[symbol])
 
-        return Result(expr=expr)
+        return ast.Name(id=self._load_name(str(symbol)), ctx=ast.Load())
 
     @model(LtnsString)
     def compile_string(self, string):
-        return Result(expr=ast.Str(str(string)))
+        return ast.Str(str(string))
 
     @model(LtnsKeyword)
     def compile_keyword(self, keyword):
-        return Result(
-            expr=ast.Call(
-                func=ast.Name(id='LtnsKeyword', ctx=ast.Load()),
+        # keywords are built once per module, when it starts
+        if not hasattr(self, '_keywords'):
+            self._keywords = {}
+
+        name = self._keywords.get(keyword)
+        if name is None:
+            name = self._keywords[keyword] = self._pool('_keyword', ast.Call(
+                func=ast.Name(id='_LtnsKeyword', ctx=ast.Load()),
                 args=[ast.Str(str(keyword))],
-            )
-        )
+                keywords=[],
+            ), str(keyword)).id
+
+        return ast.Name(id=name, ctx=ast.Load())
 
     @model(LtnsInteger)
     def compile_integer(self, integer):
-        return Result(expr=ast.Num(int(integer)))
+        return ast.Num(int(integer))
 
     @model(LtnsFloat)
     def compile_float_number(self, float_number):
-        return Result(expr=ast.Num(float(float_number)))
+        return ast.Num(float(float_number))
 
     @model(LtnsComplex)
     def compile_complex_number(self, complex_number):
-        return Result(expr=ast.Num(complex(complex_number)))
+        return ast.Num(complex(complex_number))
 
     @model(LtnsList)
     def compile_list(self, ltns_list):
-        result = Result()
-
-        elts = []
-        for e in ltns_list:
-            res = self.compile(e)
-            elts.append(res.expr)
-            result.stmts += res.stmts
-
-        expr = ast.List(elts=elts, ctx=ast.Load())
-        result.expr = expr
+        elts = yield from self._compile_operands(ltns_list)
 
-        return result
+        return ast.List(elts=elts, ctx=ast.Load())
 
     @special('do')
     def compile_do(self, *body):
-        return self._compile_branch(body)
+        return self._compile_branch(body, self._tail)
 
     name_op = {
         'add*': ast.Add(),
@@ -207,135 +856,357 @@ class LtnsCompiler:
     }
 
     def compile_bin_op(self, a, b, name):
-        result = Result()
-
-        left = self.compile(a)
-        result.stmts += left.stmts
-        left = left.expr
+        left, right = yield from self._compile_operands((a, b))
 
-        right = self.compile(b)
-        result.stmts += right.stmts
-        right = right.expr
+        op = self.name_op[name]
+        folded = fold_bin_op(op, left, right)
+        if folded is not None:
+            return folded
 
-        expr = ast.BinOp(op=self.name_op[name], left=left, right=right)
-        result.expr = expr
-
-        return result
+        return ast.BinOp(op=op, left=left, right=right)
 
     for name in name_op:
         _special_form_compiler[name] = partial(compile_bin_op, name=name)
 
     @special('if')
     def compile_if(self, test, then, orelse=None):
-        result = Result()
-
-        pred = self.compile(test)
-        result.stmts += pred.stmts
-
-        then_body = self.compile(then)
-
-        else_body = None
-        if orelse is not None:
-            else_body = self.compile(orelse)
-
-        if then_body.stmts or else_body.stmts:
-            temp_func_name = self._temp_func_name()
+        tail = self._tail
+        pred = yield test
+
+        with self._block() as then_stmts:
+            self._next_tail = tail
+            then_expr = yield then
+
+        with self._block() as else_stmts:
+            if orelse is None:
+                else_expr = ast.NameConstant(None)
+            else:
+                self._next_tail = tail
+                else_expr = yield orelse
+
+        if then_stmts or else_stmts:
+            # run as a statement of the enclosing block, which leaves the
+            # value in a temporary variable
             temp_var_name = self._temp_var_name()
 
-            body = then_body.stmts
-            body.append(
+            then_stmts.append(
                 ast.Assign(
                     targets=[ast.Name(id=temp_var_name, ctx=ast.Store())],
-                    value=then_body.expr,
+                    value=then_expr,
                 )
             )
 
-            orelse = else_body.stmts
-            orelse.append(
+            else_stmts.append(
                 ast.Assign(
                     targets=[ast.Name(id=temp_var_name, ctx=ast.Store())],
-                    value=else_body.expr,
-                )
-            )
-
-            result.stmts.append(
-                ast.FunctionDef(
-                    name=temp_func_name,
-                    args=ast.arguments(
-                        args=[],
-                        vararg=None,
-                        kwonlyargs=[],
-                        kw_defaults=[],
-                        kwarg=None,
-                        defaults=[],
-                    ),
-                    body=[
-                        ast.If(test=pred.expr, body=body, orelse=orelse),
-                        ast.Return(value=ast.Name(id=temp_var_name, ctx=ast.Load())),
-                    ],
-                    decorator_list=[],
-                    returns=None,
+                    value=else_expr,
                 )
             )
 
-            result.expr = ast.Call(
-                func=ast.Name(id=temp_func_name, ctx=ast.Load()),
-                args=[],
-                keywords=[],
-            )
+            self.emit(ast.If(test=pred, body=then_stmts, orelse=else_stmts))
 
-            return result
+            return ast.Name(id=temp_var_name, ctx=ast.Load())
         else:
-            result.expr = ast.IfExp(
-                test=pred.expr,
-                body=then_body.expr,
-                orelse=else_body.expr,
+            return ast.IfExp(
+                test=pred,
+                body=then_expr,
+                orelse=else_expr,
             )
 
-            return result
-
     @special('fn*')
     def compile_fn(self, args, *body, **kwargs):
-        result = Result()
+        return self._compile_function(args, body, kwargs)
+
+    @special('async-fn*')
+    def compile_async_fn(self, args, *body, **kwargs):
+        return self._compile_function(args, body, kwargs, is_async=True)
 
-        body = self._compile_branch(body)
-        args = self._compile_args(args, kwargs)
+    def _compile_function(self, args, body, kwargs, is_async=False):
+        params = [str(x) for x in args if x != '&'] + [str(x) for x in kwargs]
+        args = yield from self._compile_args(args, kwargs)
 
-        if body.stmts:
-            fdef = ast.FunctionDef()
+        frame = _Frame('async-fn' if is_async else 'fn')
+        with self._function(frame), self._bind(params), self._block() as stmts:
+            expr = yield from self._compile_branch(body)
+
+        # there are no async lambdas
+        if stmts or is_async:
+            fdef = ast.AsyncFunctionDef() if is_async else ast.FunctionDef()
             fdef.name = self._temp_func_name()
             fdef.args = args
-            fdef.body = body.stmts + [ast.Return(body.expr)]
+            fdef.body = frame.declarations() + stmts + [ast.Return(expr)]
             fdef.decorator_list = []
             fdef.returns = None
 
-            result.stmts += [fdef]
-            result.expr = ast.Name(id=fdef.name, ctx=ast.Load())
+            self.emit(fdef)
+            return ast.Name(id=fdef.name, ctx=ast.Load())
         else:
-            result.expr = ast.Lambda(args=args, body=body.expr)
-
-        return result
+            return ast.Lambda(args=args, body=expr)
 
     @special('def')
     def compile_def(self, *name_value, **def_dict):
         if len(name_value) % 2 != 0:
             raise ValueError("length of argument list should be even")
 
-        result = Result()
-
         for name, value in def_dict.items():
             name = LtnsSymbol(name)
             name_value = name_value + (name, value)
 
         for i, name in enumerate(name_value[::2]):
-            name = ast.Name(id=str(name), ctx=ast.Store())
-            value = self.compile(name_value[i*2+1])
+            value = yield name_value[i*2+1]
+            name = ast.Name(id=self._store_name(str(name)), ctx=ast.Store())
 
-            result.stmts += [ast.Assign(
+            self.emit(ast.Assign(
                 targets=[name],
-                value=value.expr,
-            )]
+                value=value,
+            ))
 
-        result.expr = ast.Name(id='None', ctx=ast.Load())
+        return ast.NameConstant(None)
 
-        return result
+    def _compile_target(self, target):
+        if isinstance(target, LtnsList):
+            return ast.Tuple(
+                elts=[self._compile_target(x) for x in target],
+                ctx=ast.Store(),
+            )
+
+        return ast.Name(id=mangle(str(target)), ctx=ast.Store())
+
+    def _target_names(self, target):
+        if isinstance(target, LtnsList):
+            return [name for x in target for name in self._target_names(x)]
+
+        return [str(target)]
+
+    def _check_async(self, form):
+        frame = self._frame()
+        if frame is None or frame.kind != 'async-fn':
+            raise ValueError(f"{form} is only allowed in async-fn*")
+
+    @special('await')
+    def compile_await(self, value):
+        self._check_async('await')
+        return ast.Await(value=(yield value))
+
+    @special('for')
+    def compile_for(self, binding, *body):
+        return self._compile_for(binding, body)
+
+    @special('async-for')
+    def compile_async_for(self, binding, *body):
+        self._check_async('async-for')
+        return self._compile_for(binding, body, is_async=True)
+
+    def _compile_for(self, binding, body, is_async=False):
+        target, iterable = binding
+        iterable = yield iterable
+
+        # the list is only iterated, so when made of constants it is built
+        # once as a tuple
+        if not is_async and isinstance(iterable, ast.List) and all(
+            self._is_constant(elt) for elt in iterable.elts
+        ):
+            iterable = ast.Tuple(elts=iterable.elts, ctx=ast.Load())
+            iterable = self._pool('_constant', iterable, ast.dump(iterable))
+
+        with self._bind(self._target_names(target)), self._block() as stmts:
+            expr = yield from self._compile_branch(body)
+        stmts.append(ast.Expr(value=expr))
+
+        self.emit((ast.AsyncFor if is_async else ast.For)(
+            target=self._compile_target(target),
+            iter=iterable,
+            body=stmts,
+            orelse=[],
+        ))
+
+        return ast.NameConstant(None)
+
+    @special('with')
+    def compile_with(self, bindings, *body):
+        return self._compile_with(bindings, body)
+
+    @special('async-with')
+    def compile_async_with(self, bindings, *body):
+        self._check_async('async-with')
+        return self._compile_with(bindings, body, is_async=True)
+
+    def _compile_with(self, bindings, body, is_async=False, temp_var_name=None):
+        if len(bindings) % 2 != 0:
+            raise ValueError("length of binding list should be even")
+
+        if temp_var_name is None:
+            # the value stays None when a context manager suppresses an
+            # exception
+            temp_var_name = self._temp_var_name()
+            self.emit(ast.Assign(
+                targets=[ast.Name(id=temp_var_name, ctx=ast.Store())],
+                value=ast.NameConstant(None),
+            ))
+
+        # one statement per binding, so that each context manager is built
+        # once the previous ones are entered, and can use their targets
+        target, manager = bindings[:2]
+        context = yield manager
+
+        with self._bind(self._target_names(target)), self._block() as stmts:
+            if len(bindings) > 2:
+                yield from self._compile_with(
+                    bindings[2:], body, is_async, temp_var_name,
+                )
+            else:
+                expr = yield from self._compile_branch(body)
+                stmts.append(ast.Assign(
+                    targets=[ast.Name(id=temp_var_name, ctx=ast.Store())],
+                    value=expr,
+                ))
+
+        self.emit((ast.AsyncWith if is_async else ast.With)(
+            items=[ast.withitem(
+                context_expr=context,
+                optional_vars=self._compile_target(target),
+            )],
+            body=stmts,
+        ))
+
+        return ast.Name(id=temp_var_name, ctx=ast.Load())
+
+    @special('while')
+    def compile_while(self, test, *body):
+        with self._block() as test_stmts:
+            pred = yield test
+
+        with self._block() as stmts:
+            expr = yield from self._compile_branch(body)
+        stmts.append(ast.Expr(value=expr))
+
+        if test_stmts:
+            # the statements of the test run before every iteration
+            test_stmts.append(ast.If(
+                test=ast.UnaryOp(op=ast.Not(), operand=pred),
+                body=[ast.Break()],
+                orelse=[],
+            ))
+            self.emit(ast.While(
+                test=ast.NameConstant(True),
+                body=test_stmts + stmts,
+                orelse=[],
+            ))
+        else:
+            self.emit(ast.While(test=pred, body=stmts, orelse=[]))
+
+        return ast.NameConstant(None)
+
+    @special('loop')
+    def compile_loop(self, bindings, *body):
+        if len(bindings) % 2 != 0:
+            raise ValueError("length of binding list should be even")
+
+        names = [str(name) for name in bindings[::2]]
+
+        if not hasattr(self, '_loops'):
+            self._loops = []
+
+        with self._bind(names) as scope:
+            names = [scope[name][0] for name in names]
+            for name, value in zip(names, bindings[1::2]):
+                self.emit(ast.Assign(
+                    targets=[ast.Name(id=name, ctx=ast.Store())],
+                    value=(yield value),
+                ))
+
+            self._loops.append(names)
+            try:
+                with self._block() as stmts:
+                    expr = yield from self._compile_branch(body, tail=True)
+            finally:
+                self._loops.pop()
+
+        # reaching the end of the body without recur leaves the loop
+        temp_var_name = self._temp_var_name()
+        stmts.append(ast.Assign(
+            targets=[ast.Name(id=temp_var_name, ctx=ast.Store())],
+            value=expr,
+        ))
+        stmts.append(ast.Break())
+
+        self.emit(ast.While(test=ast.NameConstant(True), body=stmts, orelse=[]))
+
+        return ast.Name(id=temp_var_name, ctx=ast.Load())
+
+    @special('recur')
+    def compile_recur(self, *values):
+        if not self._tail or not getattr(self, '_loops', None):
+            raise ValueError("recur is only allowed in tail position of a loop")
+
+        names = self._loops[-1]
+        if len(values) != len(names):
+            raise ValueError(
+                f"recur expects {len(names)} values, got {len(values)}"
+            )
+
+        exprs = yield from self._compile_operands(values)
+
+        if names:
+            self.emit(ast.Assign(
+                targets=[ast.Tuple(
+                    elts=[ast.Name(id=name, ctx=ast.Store()) for name in names],
+                    ctx=ast.Store(),
+                )],
+                value=ast.Tuple(elts=exprs, ctx=ast.Load()),
+            ))
+        self.emit(ast.Continue())
+
+        return ast.NameConstant(None)
+
+    @special('let')
+    def compile_let(self, bindings, *body):
+        if len(bindings) % 2 != 0:
+            raise ValueError("length of binding list should be even")
+
+        tail = self._tail
+
+        # let needs a function for its bindings to be locals, except in tail
+        # position of a loop, where recur has to stay in the loop
+        if self._frame() is not None or (tail and getattr(self, '_loops', None)):
+            return (yield from self._compile_let(bindings, body, tail))
+
+        frame = _Frame('let')
+        with self._function(frame), self._block() as stmts:
+            expr = yield from self._compile_let(bindings, body, False)
+
+        temp_func_name = self._temp_func_name()
+        self.emit(ast.FunctionDef(
+            name=temp_func_name,
+            args=ast.arguments(**_no_arguments),
+            body=frame.declarations() + stmts + [ast.Return(value=expr)],
+            decorator_list=[],
+            returns=None,
+        ))
+
+        return ast.Call(
+            func=ast.Name(id=temp_func_name, ctx=ast.Load()),
+            args=[],
+            keywords=[],
+        )
+
+    def _compile_let(self, bindings, body, tail):
+        with self._bind(let=True) as scope:
+            # each binding is visible from the values of the next ones
+            for name, value in zip(bindings[::2], bindings[1::2]):
+                if not isinstance(name, LtnsSymbol):
+                    raise ValueError(f"cannot bind {name!r}")
+
+                value = yield value
+
+                self._temp = getattr(self, '_temp', 0) + 1
+                pyname = f'_let_{mangle(str(name))}_{self._temp}'
+                self.bindings.add(pyname)
+                scope[str(name)] = (pyname, self._frame(), True)
+
+                self.emit(ast.Assign(
+                    targets=[ast.Name(id=pyname, ctx=ast.Store())],
+                    value=value,
+                ))
+
+            return (yield from self._compile_branch(body, tail))
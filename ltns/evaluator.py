@@ -0,0 +1,161 @@
+"""
+Direct evaluation of small expressions
+
+An expression evaluated once costs far more to compile than to run: its
+module is built, located and compiled by CPython, to be executed a single
+time. :func:`evaluate` walks the models of a safe subset of the language
+instead: literals, symbols, lists, calls, ``if``, ``do`` and the binary
+operators, with the same semantics as the compiled code.
+:func:`ltns.compiler.ltns_eval` picks between both.
+"""
+import builtins
+
+from .arena import ArenaElement
+from .compiler import (
+    LtnsCompiler,
+    _resolve_callee,
+    _special_form_compiler,
+    mangle,
+)
+from .folding import OPERATORS
+from .models import (
+    LtnsElement,
+    LtnsKeyword,
+    LtnsString,
+    LtnsSymbol,
+    LtnsInteger,
+    LtnsFloat,
+    LtnsComplex,
+    LtnsList,
+)
+
+
+# deepest tree interpreted, as evaluate recurses on the models
+MAX_INTERPRETED_DEPTH = 64
+
+_literals = {
+    LtnsInteger: int,
+    LtnsFloat: float,
+    LtnsComplex: complex,
+    LtnsString: str,
+}
+
+_binary_operators = {
+    name: OPERATORS[type(op)] for name, op in LtnsCompiler.name_op.items()
+}
+
+_name_constants = LtnsCompiler._name_constants
+
+_elements = (LtnsElement, ArenaElement)
+
+
+def _supported_element(element):
+    name = element.name
+    if name not in _special_form_compiler:
+        parts, _ = _resolve_callee(str(name))
+        return parts is not None
+
+    if element.attributes:
+        return False
+
+    count = len(element.childs)
+    if name == 'if':
+        return count in (2, 3)
+    if name == 'do':
+        return count > 0
+    return name in _binary_operators and count == 2
+
+def interpretable(tree):
+    """
+    Return whether :func:`evaluate` supports ``tree``
+    """
+    stack = [(tree, 1)]
+
+    while stack:
+        node, depth = stack.pop()
+        if depth > MAX_INTERPRETED_DEPTH:
+            return False
+
+        kind = type(node)
+        if kind in _literals or kind is LtnsSymbol or kind is LtnsKeyword:
+            continue
+
+        if kind is LtnsList:
+            stack.extend((x, depth + 1) for x in node)
+        elif kind in _elements and _supported_element(node):
+            stack.extend((x, depth + 1) for x in node.childs)
+            stack.extend((x, depth + 1) for x in node.attributes.values())
+        else:
+            return False
+
+    return True
+
+def _load(name, namespace):
+    try:
+        return namespace[name]
+    except KeyError:
+        pass
+
+    # like module level code, fall back to the builtins of the namespace
+    scope = namespace.get('__builtins__', builtins)
+    try:
+        if isinstance(scope, dict):
+            return scope[name]
+        return getattr(scope, name)
+    except (KeyError, AttributeError):
+        raise NameError(f'name {name!r} is not defined', name=name) from None
+
+def evaluate(node, namespace):
+    """
+    Return the value of the model ``node``, with globals ``namespace``
+
+    ``node`` must be :func:`interpretable`.
+    """
+    kind = type(node)
+
+    convert = _literals.get(kind)
+    if convert is not None:
+        return convert(node)
+
+    if kind is LtnsSymbol:
+        if node in _name_constants:
+            return _name_constants[node]
+        return _load(mangle(str(node)), namespace)
+
+    if kind is LtnsKeyword:
+        return LtnsKeyword(str(node))
+
+    if kind is LtnsList:
+        return [evaluate(x, namespace) for x in node]
+
+    name = node.name
+    childs = node.childs
+
+    if name == 'if':
+        if evaluate(childs[0], namespace):
+            return evaluate(childs[1], namespace)
+        if len(childs) > 2:
+            return evaluate(childs[2], namespace)
+        return None
+
+    if name == 'do':
+        for child in childs:
+            value = evaluate(child, namespace)
+        return value
+
+    op = _binary_operators.get(name)
+    if op is not None:
+        return op(evaluate(childs[0], namespace), evaluate(childs[1], namespace))
+
+    parts, _ = _resolve_callee(str(name))
+    func = _load(mangle(parts[0]), namespace)
+    for part in parts[1:]:
+        func = getattr(func, mangle(part))
+
+    args = [evaluate(child, namespace) for child in childs]
+    kwargs = {
+        str(key): evaluate(value, namespace)
+        for key, value in node.attributes.items()
+    }
+
+    return func(*args, **kwargs)
@@ -0,0 +1,93 @@
+"""
+Compile time evaluation of arithmetic on literals
+
+:func:`fold_bin_op` computes the value of a binary operation whose operands
+are both number constants, so that ``<mul*>60 60 24</mul*>`` style constants
+are not recomputed every time a module is loaded. Operations are only folded
+when they succeed and their result stays small; anything else, including
+division by zero, is left to be raised at runtime.
+"""
+import ast
+import operator
+
+
+# largest integer, in bits, produced by folding
+MAX_INT_BITS = 128
+
+# largest str() of a folded float or complex
+MAX_REPR_LENGTH = 64
+
+# Python function of each binary operator
+OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+    ast.LShift: operator.lshift,
+    ast.RShift: operator.rshift,
+    ast.BitOr: operator.or_,
+    ast.BitXor: operator.xor,
+    ast.BitAnd: operator.and_,
+}
+
+_number_types = (int, float, complex)
+
+def _number(node):
+    if isinstance(node, ast.Constant) and type(node.value) in _number_types:
+        return node.value
+    return None
+
+def _bits(n):
+    if isinstance(n, int):
+        return n.bit_length()
+    return 0
+
+def _too_large(op, left, right):
+    """
+    Tell if computing ``left op right`` could build a huge integer
+    """
+    if not isinstance(right, int):
+        return False
+
+    if isinstance(op, ast.Pow):
+        if isinstance(left, int):
+            return right > 0 and _bits(left) * right > MAX_INT_BITS
+        # floats overflow on their own, but complex powers are computed by
+        # repeated multiplication
+        return isinstance(left, complex) and abs(right) > MAX_INT_BITS
+
+    if isinstance(op, ast.LShift):
+        return isinstance(left, int) and _bits(left) + right > MAX_INT_BITS
+
+    if isinstance(op, ast.Mult) and isinstance(left, int):
+        return _bits(left) + _bits(right) > MAX_INT_BITS
+
+    return False
+
+def fold_bin_op(op, left, right):
+    """
+    Return the constant computed by ``left op right``, or ``None``
+
+    :param op: a ast.operator instance
+    :param left: compiled left operand
+    :param right: compiled right operand
+    """
+    a = _number(left)
+    b = _number(right)
+    if a is None or b is None or _too_large(op, a, b):
+        return None
+
+    try:
+        value = OPERATORS[type(op)](a, b)
+    except (ArithmeticError, ValueError, TypeError):
+        return None
+
+    if isinstance(value, int):
+        if _bits(value) > MAX_INT_BITS:
+            return None
+    elif len(str(value)) > MAX_REPR_LENGTH:
+        return None
+
+    return ast.Num(value)
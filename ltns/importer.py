@@ -0,0 +1,201 @@
+"""
+Import hook that loads ``.ltns`` files as Python modules
+
+After :func:`install` is called, ``import foo`` finds ``foo.ltns`` (or the
+package ``foo/__init__.ltns``) on ``sys.path``. The compiled module is
+written to ``__pycache__`` and validated by mtime and size, or by hash, like
+any ``.py`` module, and later imports never reach the ltns compiler. Its
+``.pyc`` file is named after the ltns version and the version of the code
+it generates, and the optimization passes run, see :func:`cache_from_source`,
+so that a new ltns does not run code compiled by an older one, nor reads the
+``.pyc`` of a ``foo.py``.
+"""
+import _imp
+import importlib
+import importlib.machinery
+import importlib.util
+import os
+import sys
+from importlib import _bootstrap_external
+
+from . import CODE_VERSION, __version__
+from .models import LtnsKeyword
+from .passes import get_pipeline
+
+
+SOURCE_SUFFIX = '.ltns'
+
+# optimization of the modules imported, see install
+_optimization = None
+
+
+def cache_from_source(path, optimize=None):
+    """
+    Return the path of the ``.pyc`` file of the ltns source file at ``path``,
+    compiled at the optimization ``optimize``
+
+    ``foo/bar.ltns`` is cached as
+    ``foo/__pycache__/bar.<tag>.ltns-<version>-<code version>.pyc``, where
+    ``<tag>`` is the cache tag of the running interpreter. Code compiled by
+    other passes than those of the default level is cached apart, with
+    ``.opt-<passes>`` before the suffix, like ``.opt-prune_if``.
+
+    :param optimize: optimization level or :class:`ltns.passes.Pipeline`,
+                     the default level if ``None``
+    :raises NotImplementedError: if the interpreter has no cache tag
+    """
+    tag = sys.implementation.cache_tag
+    if tag is None:
+        raise NotImplementedError('sys.implementation.cache_tag is None')
+
+    head, tail = os.path.split(path)
+    base, _ = os.path.splitext(tail)
+    filename = f'{base}.{tag}.ltns-{__version__}-{CODE_VERSION}'
+
+    passes = get_pipeline(optimize).passes
+    if passes != get_pipeline().passes:
+        filename += '.opt-' + ('-'.join(p.name for p in passes) or 'none')
+
+    return os.path.join(head, '__pycache__', filename + '.pyc')
+
+
+class LtnsLoader(importlib.machinery.SourceFileLoader):
+    """
+    Loader of a single ``.ltns`` source file
+    """
+    def source_to_code(self, data, path, *, _optimize=-1):
+        from .compiler import ltns_compile, ltns_parse
+
+        source = importlib.util.decode_source(data)
+        return ltns_compile(ltns_parse(source), path, _optimization)
+
+    def get_code(self, fullname):
+        """
+        Return the code of the module, from its ``.pyc`` file if it is up to
+        date
+
+        Like :meth:`importlib.abc.SourceLoader.get_code`, which can only read
+        the ``.pyc`` file of a ``.py`` module.
+        """
+        source_path = self.get_filename(fullname)
+        source = None
+        source_hash = None
+        hash_based = False
+        check_source = True
+        mtime = None
+
+        try:
+            bytecode_path = cache_from_source(source_path, _optimization)
+            st = self.path_stats(source_path)
+        except (NotImplementedError, OSError):
+            bytecode_path = None
+        else:
+            mtime = int(st['mtime'])
+            details = {'name': fullname, 'path': bytecode_path}
+            try:
+                data = self.get_data(bytecode_path)
+                flags = _bootstrap_external._classify_pyc(data, fullname, details)
+                hash_based = flags & 0b1 != 0
+                if hash_based:
+                    check_source = flags & 0b10 != 0
+                    if _imp.check_hash_based_pycs != 'never' and (
+                        check_source or _imp.check_hash_based_pycs == 'always'
+                    ):
+                        source = self.get_data(source_path)
+                        source_hash = importlib.util.source_hash(source)
+                        _bootstrap_external._validate_hash_pyc(
+                            data, source_hash, fullname, details,
+                        )
+                else:
+                    _bootstrap_external._validate_timestamp_pyc(
+                        data, mtime, st['size'], fullname, details,
+                    )
+            except (ImportError, EOFError, OSError):
+                pass
+            else:
+                return _bootstrap_external._compile_bytecode(
+                    memoryview(data)[16:], fullname, bytecode_path, source_path,
+                )
+
+        if source is None:
+            source = self.get_data(source_path)
+        code = self.source_to_code(source, source_path)
+
+        if not sys.dont_write_bytecode and bytecode_path is not None:
+            if hash_based:
+                data = _bootstrap_external._code_to_hash_pyc(
+                    code,
+                    source_hash or importlib.util.source_hash(source),
+                    check_source,
+                )
+            else:
+                data = _bootstrap_external._code_to_timestamp_pyc(
+                    code, mtime, len(source),
+                )
+            self._cache_bytecode(source_path, bytecode_path, data)
+
+        return code
+
+    def exec_module(self, module):
+        module.__dict__.setdefault('LtnsKeyword', LtnsKeyword)
+        super().exec_module(module)
+
+class LtnsFileFinder(importlib.machinery.FileFinder):
+    """
+    Finder of the modules of one path entry, as ``.ltns`` files or any kind
+    of file Python imports
+    """
+
+def _loaders():
+    machinery = importlib.machinery
+    return [
+        (LtnsLoader, [SOURCE_SUFFIX]),
+        (machinery.ExtensionFileLoader, machinery.EXTENSION_SUFFIXES),
+        (machinery.SourceFileLoader, machinery.SOURCE_SUFFIXES),
+        (machinery.SourcelessFileLoader, machinery.BYTECODE_SUFFIXES),
+    ]
+
+def path_hook(entry):
+    """
+    Return the finder of the directory ``entry`` of ``sys.path``
+    """
+    if not os.path.isdir(entry or '.'):
+        raise ImportError('only directories are supported', path=entry)
+    return LtnsFileFinder(entry, *_loaders())
+
+def _forget_finders(kind):
+    # finders of path entries are created once, and kept by PathFinder
+    for entry, finder in list(sys.path_importer_cache.items()):
+        if isinstance(finder, kind):
+            del sys.path_importer_cache[entry]
+
+def install(optimize=None):
+    """
+    Make ``.ltns`` files importable
+
+    The finder of directories on ``sys.path`` is replaced by one that also
+    finds ``.ltns`` files, so that the default path based finder keeps one
+    finder and one cached listing per directory, as without ltns. Modules
+    and packages made of ``.ltns`` files come first.
+
+    :param optimize: optimization level or :class:`ltns.passes.Pipeline` of
+                     the modules compiled, which load the ``.pyc`` files that
+                     ``ltns compile`` writes with the same passes
+    """
+    global _optimization
+    _optimization = optimize
+
+    if path_hook not in sys.path_hooks:
+        sys.path_hooks.insert(0, path_hook)
+        _forget_finders(importlib.machinery.FileFinder)
+    importlib.invalidate_caches()
+
+def uninstall():
+    """
+    Undo :func:`install`
+    """
+    global _optimization
+    _optimization = None
+
+    sys.path_hooks[:] = [hook for hook in sys.path_hooks if hook is not path_hook]
+    _forget_finders(LtnsFileFinder)
@@ -0,0 +1,120 @@
+"""
+Incremental reparsing of edited source
+
+Editors and REPLs that reparse a buffer on every keystroke can hand the
+previous tree and the edit to :func:`reparse`. Top-level forms before the edit
+are kept as they are, and lexing restarts after the last of them. Parsing
+stops as soon as a new form ends where an old form ended after the edit,
+because everything after that point lexes and parses exactly as before. The
+remaining old forms are reused with their positions shifted.
+"""
+from .lexer import get_lexer
+from .models import LtnsElement
+from .parser import parse_forms
+
+
+def apply_edit(code, offset, removed, inserted):
+    """
+    Return ``code`` with ``removed`` characters at ``offset`` replaced by
+    ``inserted``
+    """
+    return code[:offset] + inserted + code[offset + removed:]
+
+def _count_ends_before(forms, pos):
+    # number of forms ending before pos, forms being sorted by position
+    lo, hi = 0, len(forms)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if forms[mid].end < pos:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+def _line_at(code, model, pos):
+    return model.lineno + code.count('\n', model.start, pos)
+
+def _column_at(code, pos):
+    return pos - code.rfind('\n', 0, pos)
+
+def _shift(models, delta, line_delta, col_delta, line_end):
+    stack = list(models)
+
+    while stack:
+        model = stack.pop()
+
+        start = getattr(model, 'start', None)
+        if start is not None:
+            model.start = start + delta
+            model.end += delta
+            model.lineno += line_delta
+            if start < line_end:
+                model.colno += col_delta
+
+        if isinstance(model, LtnsElement):
+            stack.append(model.name)
+            stack.extend(model.childs)
+            stack.extend(model.attributes)
+            stack.extend(model.attributes.values())
+        elif isinstance(model, list):
+            stack.extend(model)
+
+def reparse(tree, code, offset, removed, inserted):
+    """
+    Return the tree of ``code`` after an edit, reusing the untouched forms of
+    ``tree``
+
+    :param tree: tree of ``code``, as returned by :func:`ltns.compiler.ltns_parse`
+                 or by a previous call
+    :param code: source code before the edit
+    :param offset: offset of the edit in ``code``
+    :param removed: number of characters removed at ``offset``
+    :param inserted: text inserted at ``offset``
+
+    The reused forms are shifted in place, so ``tree`` describes the edited
+    code afterwards and should not be used anymore.
+    """
+    forms = tree.childs
+    new_code = apply_edit(code, offset, removed, inserted)
+    delta = len(inserted) - removed
+    edit_end = offset + len(inserted)
+
+    kept = _count_ends_before(forms, offset)
+    if kept:
+        last = forms[kept - 1]
+        resume = last.end
+        lineno = _line_at(code, last, resume)
+    else:
+        resume = 0
+        lineno = 1
+
+    tokens = get_lexer('scanner').lex_from(new_code, resume, lineno)
+    parsed = []
+    reused = []
+
+    for form in parse_forms(tokens):
+        parsed.append(form)
+
+        end = form.end
+        if end < edit_end:
+            continue
+
+        old_end = end - delta
+        index = _count_ends_before(forms, old_end)
+        if index == len(forms) or forms[index].end != old_end:
+            continue
+
+        reused = forms[index + 1:]
+        if reused:
+            old = forms[index]
+            line_delta = _line_at(new_code, form, end) - _line_at(code, old, old_end)
+            col_delta = _column_at(new_code, end) - _column_at(code, old_end)
+            line_end = code.find('\n', old_end)
+            if line_end < 0:
+                line_end = len(code)
+            if delta or line_delta or col_delta:
+                _shift(reused, delta, line_delta, col_delta, line_end)
+        break
+
+    # the forms of an empty tree are a tuple
+    return LtnsElement('do', childs=[*forms[:kept], *parsed, *reused])
@@ -1,25 +1,335 @@
-from rply import LexerGenerator
+import re
 
-lg = LexerGenerator()
+from .models import (
+    LtnsKeyword,
+    LtnsSymbol,
+    LtnsInteger,
+    LtnsFloat,
+    LtnsComplex,
+)
 
 
-lg.add('LSLASHANGLE', r'</')
-lg.add('RSLASHANGLE', r'/>')
-lg.add('LANGLE', r'<')
-lg.add('RANGLE', r'>')
-lg.add('LSQUARE', r'\[')
-lg.add('RSQUARE', r'\]')
-lg.add('EQUAL', r'=')
+rules = [
+    ('LSLASHANGLE', r'</'),
+    ('RSLASHANGLE', r'/>'),
+    ('LANGLE', r'<'),
+    ('RANGLE', r'>'),
+    ('LSQUARE', r'\['),
+    ('RSQUARE', r'\]'),
+    ('EQUAL', r'='),
 
-lg.add('STRING', r'''(?x)
+    ('STRING', r'''(?x)
 (r)?
 "
 [^"]*
 "
-''')
-lg.add('IDENTIFIER', r'[^<>\[\]{}=/\s"]+')
+'''),
+    ('IDENTIFIER', r'[^<>\[\]{}=/\s"]+'),
+]
 
-lg.ignore(r'<!--(.|\s)*-->')
-lg.ignore(r'\s+')
+ignores = [
+    r'<!--[\s\S]*?-->',
+    r'\s+',
+]
 
-lexer = lg.build()
+tokens = [name for name, _ in rules]
+
+# get base of integer
+_prefix_base = {
+    '0b': 2,
+    '0o': 8,
+    '0x': 16,
+}
+
+def classify(s):
+    """
+    Return the model of the literal spelled by the identifier ``s``
+
+    Only identifiers whose first character can start a number are tried as
+    ``int``, ``float`` and ``complex``; everything else is a keyword or a
+    symbol straight away.
+    """
+    c = s[0]
+    lower = s.lower()
+    if (c.isnumeric() or c in '+-.('
+            or lower.startswith(('inf', 'nan')) or lower == 'j'):
+        base = 10
+        for prefix, _base in _prefix_base.items():
+            if s.startswith(prefix):
+                base = _base
+        try:
+            return LtnsInteger(s, base=base)
+        except ValueError:
+            pass
+
+        try:
+            return LtnsFloat(s)
+        except ValueError:
+            pass
+
+        try:
+            return LtnsComplex(s)
+        except ValueError:
+            pass
+
+    if c == ':':
+        return LtnsKeyword(s[1:])
+
+    return LtnsSymbol(s)
+
+class Token:
+    """
+    Token produced by :class:`Scanner`
+
+    It has the interface of ``rply.Token`` and is its own source position.
+    Identifiers also carry the model of their literal in ``model``.
+    """
+    __slots__ = ('name', 'value', 'idx', 'lineno', 'colno', 'model')
+
+    def __init__(self, name, value, idx, lineno, colno, model=None):
+        self.name = name
+        self.value = value
+        self.idx = idx
+        self.lineno = lineno
+        self.colno = colno
+        self.model = model
+
+    def __repr__(self):
+        return 'Token(%r, %r)' % (self.name, self.value)
+
+    @property
+    def source_pos(self):
+        return self
+
+    def gettokentype(self):
+        return self.name
+
+    def getsourcepos(self):
+        return self
+
+    def getstr(self):
+        return self.value
+
+_punctuation = {
+    '>': 'RANGLE',
+    '[': 'LSQUARE',
+    ']': 'RSQUARE',
+    '=': 'EQUAL',
+}
+
+_whitespace = re.compile(r'\s+')
+_identifier = re.compile(rules[-1][1])
+
+class Scanner:
+    """
+    Single pass lexer producing the same tokens as the rply lexer
+
+    The rule to apply is chosen from the character at the current position
+    instead of trying every regular expression in turn, and line numbers are
+    tracked incrementally.
+    """
+    def lex(self, s):
+        return self._scan(s, _ScanState(), True)
+
+    def lex_from(self, s, pos, lineno):
+        """
+        Lex ``s`` from offset ``pos``, which is on line ``lineno``
+        """
+        state = _ScanState()
+        state.pos = pos
+        state.lineno = lineno
+        state.line_start = s.rfind('\n', 0, pos)
+        return self._scan(s, state, True)
+
+    def lex_chunks(self, chunks):
+        """
+        Lex text arriving as an iterable of chunks
+
+        A token is only produced once the text following it is known, so
+        tokens may span chunk boundaries. Positions are relative to the start
+        of the whole stream, and only the text of unfinished tokens is kept.
+        The end of an unfinished token is searched from where the previous
+        chunk stopped, so that a long token costs linear time.
+        """
+        state = _ScanState()
+        buf = ''
+
+        for chunk in chunks:
+            if not chunk:
+                continue
+            buf += chunk
+            yield from self._scan(buf, state, False)
+            buf = buf[state.pos:]
+            state.rebase()
+
+        yield from self._scan(buf, state, True)
+
+    def _scan(self, s, state, final):
+        end = len(s)
+        base = state.base
+        pos = state.pos
+        lineno = state.lineno
+        line_start = state.line_start - base
+        colno = state.colno
+        # end of the text already searched for the end of the token at pos
+        scanned = state.scanned - base
+
+        while pos < end:
+            c = s[pos]
+
+            if c.isspace():
+                stop = _whitespace.match(s, pos).end()
+                newlines = s.count('\n', pos, stop)
+                if newlines:
+                    lineno += newlines
+                    line_start = s.rfind('\n', pos, stop)
+                pos = stop
+                continue
+
+            if c == '<':
+                if pos + 4 > end and not final:
+                    break
+                if s.startswith('!--', pos + 1):
+                    close = s.find('-->', max(pos + 4, scanned - 2))
+                    if close < 0 and not final:
+                        scanned = end
+                        break
+                    if close >= 0:
+                        stop = close + 3
+                        newlines = s.count('\n', pos, stop)
+                        if newlines:
+                            lineno += newlines
+                            line_start = s.rfind('\n', pos, stop)
+                        pos = stop
+                        continue
+                    # the text of an unclosed comment is lexed as tokens
+                    scanned = pos
+
+            col = pos - line_start
+
+            if c == '<':
+                if s.startswith('/', pos + 1):
+                    name, stop = 'LSLASHANGLE', pos + 2
+                else:
+                    name, stop = 'LANGLE', pos + 1
+            elif c == '/':
+                if pos + 1 == end and not final:
+                    break
+                if not s.startswith('>', pos + 1):
+                    self._error(base + pos, lineno, colno)
+                name, stop = 'RSLASHANGLE', pos + 2
+            elif c in _punctuation:
+                name, stop = _punctuation[c], pos + 1
+            elif c == '"' or (c == 'r' and s.startswith('"', pos + 1)):
+                quote = pos if c == '"' else pos + 1
+                close = s.find('"', max(quote + 1, scanned))
+                if close < 0 and not final:
+                    scanned = end
+                    break
+                if close >= 0:
+                    name, stop = 'STRING', close + 1
+                elif c == 'r':
+                    name, stop = 'IDENTIFIER', pos + 1
+                else:
+                    self._error(base + pos, lineno, colno)
+            elif c in '{}':
+                self._error(base + pos, lineno, colno)
+            else:
+                start = max(pos, scanned)
+                match = _identifier.match(s, start)
+                name, stop = 'IDENTIFIER', match.end() if match else start
+                if stop == end and not final:
+                    scanned = end
+                    break
+
+            value = s[pos:stop]
+            colno = col
+
+            if name == 'IDENTIFIER':
+                yield Token(
+                    name, value, base + pos, lineno, colno, classify(value)
+                )
+            else:
+                yield Token(name, value, base + pos, lineno, colno)
+
+                if name == 'STRING':
+                    newlines = value.count('\n')
+                    if newlines:
+                        lineno += newlines
+                        line_start = s.rfind('\n', pos, stop)
+
+            pos = stop
+
+        state.pos = pos
+        state.lineno = lineno
+        state.line_start = base + line_start
+        state.colno = colno
+        state.scanned = base + scanned
+
+    def _error(self, idx, lineno, colno):
+        from rply.errors import LexingError
+        from rply.token import SourcePosition
+
+        # like rply, report the column of the last token
+        raise LexingError(None, SourcePosition(idx, lineno, colno))
+
+class _ScanState:
+    """
+    Position of a :class:`Scanner` between two chunks
+
+    ``pos`` is relative to the current buffer, which starts at ``base`` in the
+    stream; ``line_start`` is the stream offset of the last newline, and
+    ``scanned`` the stream offset up to which the unfinished token at ``pos``
+    was read.
+    """
+    __slots__ = ('base', 'pos', 'lineno', 'line_start', 'colno', 'scanned')
+
+    def __init__(self):
+        self.base = 0
+        self.pos = 0
+        self.lineno = 1
+        self.line_start = -1
+        self.colno = 1
+        self.scanned = 0
+
+    def rebase(self):
+        self.base += self.pos
+        self.pos = 0
+
+_lexers = {}
+
+def get_lexer(kind='scanner'):
+    """
+    Return the lexer, building it on first use
+
+    :param kind: ``'scanner'`` for the hand-written :class:`Scanner` or
+                 ``'rply'`` for the lexer generated from ``rules``
+    """
+    lexer = _lexers.get(kind)
+
+    if lexer is None:
+        if kind == 'scanner':
+            lexer = Scanner()
+        elif kind == 'rply':
+            from rply import LexerGenerator
+
+            lg = LexerGenerator()
+
+            for name, pattern in rules:
+                lg.add(name, pattern)
+
+            for pattern in ignores:
+                lg.ignore(pattern)
+
+            lexer = lg.build()
+        else:
+            raise ValueError(f'unknown lexer {kind!r}')
+
+        _lexers[kind] = lexer
+
+    return lexer
+
+def __getattr__(name):
+    if name == 'lexer':
+        return get_lexer()
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
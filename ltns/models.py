@@ -1,36 +1,113 @@
-from functools import reduce
+from types import MappingProxyType
 
 
-class LtnsElement:
+class LtnsModel:
+    """
+    Base class of the models
+
+    Parsed models know where they come from: ``start`` and ``end`` are their
+    offsets in the source, and ``lineno`` and ``colno`` the position of their
+    first character. All of them are ``None`` for models built in code.
+    """
+    __slots__ = ()
+
+    @property
+    def span(self):
+        if self.start is None:
+            return None
+        return (self.start, self.end)
+
+    def locate(self, start, end, lineno, colno):
+        self.start = start
+        self.end = end
+        self.lineno = lineno
+        self.colno = colno
+        return self
+
+_position = ('start', 'end', 'lineno', 'colno')
+
+# shared by every element without childs or attributes
+EMPTY_CHILDS = ()
+EMPTY_ATTRIBUTES = MappingProxyType({})
+
+def _element(name, attributes, childs, start, end, lineno, colno):
+    return LtnsElement(
+        name, attributes=attributes, childs=childs,
+    ).locate(start, end, lineno, colno)
+
+class LtnsElement(LtnsModel):
+    __slots__ = ('name', 'attributes', 'childs') + _position
+
     def __init__(self, name, **kwargs):
         self.name = name
-        self.attributes = kwargs.pop('attributes', {})
-        self.childs = kwargs.pop('childs', [])
+        self.attributes = kwargs.pop('attributes', None) or EMPTY_ATTRIBUTES
+        self.childs = kwargs.pop('childs', None) or EMPTY_CHILDS
+        self.start = self.end = self.lineno = self.colno = None
+
+    def __reduce__(self):
+        # the shared empty attributes are a read-only mapping, which cannot
+        # be pickled or copied
+        return _element, (
+            self.name, dict(self.attributes), self.childs,
+            self.start, self.end, self.lineno, self.colno,
+        )
+
+class LtnsInteger(LtnsModel, int):
+    # int subclasses can't have slots, so positions live in the __dict__ of
+    # located integers only
+    start = end = lineno = colno = None
 
-class LtnsInteger(int):
     def __new__(cls, n, **kwargs):
         return super().__new__(cls, n, **kwargs)
 
-class LtnsFloat(float):
+class LtnsFloat(LtnsModel, float):
+    __slots__ = _position
+
     def __new__(cls, n, **kwargs):
-        return super().__new__(cls, n, **kwargs)
+        self = super().__new__(cls, n, **kwargs)
+        self.start = self.end = self.lineno = self.colno = None
+        return self
+
+class LtnsComplex(LtnsModel, complex):
+    __slots__ = _position
 
-class LtnsComplex(complex):
     def __new__(cls, n, **kwargs):
-        return super().__new__(cls, n, **kwargs)
+        self = super().__new__(cls, n, **kwargs)
+        self.start = self.end = self.lineno = self.colno = None
+        return self
+
+    def __getnewargs__(self):
+        return (complex(self),)
+
+class LtnsKeyword(LtnsModel, str):
+    __slots__ = _position
 
-class LtnsKeyword(str):
     def __new__(cls, value, **kwargs):
-        return super().__new__(cls, value, **kwargs)
+        self = super().__new__(cls, value, **kwargs)
+        self.start = self.end = self.lineno = self.colno = None
+        return self
+
+class LtnsString(LtnsModel, str):
+    __slots__ = _position
 
-class LtnsString(str):
     def __new__(cls, s, **kwargs):
-        return super().__new__(cls, s, **kwargs)
+        self = super().__new__(cls, s, **kwargs)
+        self.start = self.end = self.lineno = self.colno = None
+        return self
+
+class LtnsSymbol(LtnsModel, str):
+    __slots__ = _position
 
-class LtnsSymbol(str):
     def __new__(cls, name, **kwargs):
-        return super().__new__(cls, name, **kwargs)
+        self = super().__new__(cls, name, **kwargs)
+        self.start = self.end = self.lineno = self.colno = None
+        return self
+
+class LtnsList(LtnsModel, list):
+    __slots__ = _position
 
-class LtnsList(list):
-    def __new__(cls, elements, **kwargs):
-        return super().__new__(cls, elements, **kwargs)
+    # elements are given to __init__, and added after __new__ when unpickled
+    def __new__(cls, elements=(), **kwargs):
+        self = super().__new__(cls, elements, **kwargs)
+        self.start = self.end = self.lineno = self.colno = None
+        return self
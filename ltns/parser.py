@@ -1,133 +1,197 @@
 from collections import namedtuple, OrderedDict
 
-from rply import ParserGenerator
-
-from .lexer import lexer
+from .lexer import classify, tokens
 from .models import (
+    EMPTY_ATTRIBUTES,
     LtnsElement,
-    LtnsKeyword,
-    LtnsSymbol,
     LtnsString,
-    LtnsInteger,
-    LtnsFloat,
-    LtnsComplex,
     LtnsList,
 )
 
 
-pg = ParserGenerator([rule.name for rule in lexer.rules] + ['end$'])
+_productions = []
+
+def production(rule):
+    """
+    Register ``rule`` to be reduced by the decorated function
+
+    Productions are only handed to rply when the parser is first built.
+    """
+    def decorator(f):
+        _productions.append((rule, f))
+        return f
+    return decorator
+
+tag = namedtuple('tag', ('name', 'attributes', 'lineno', 'colno', 'start', 'end'))
 
-tag = namedtuple('tag', ('name', 'attributes', 'lineno', 'colno'))
+def tag_start(token, name, attributes, end):
+    pos = token.source_pos
+    return tag(name, attributes, pos.lineno, pos.colno, pos.idx, end)
 
-@pg.production("main : list_contents")
+def token_end(token):
+    return token.source_pos.idx + len(token.value)
+
+@production("main : list_contents")
 def main(p):
     return p[0]
 
-@pg.production("main : end$")
+@production("main : end$")
 def main_empty(_):
     return []
 
-@pg.production("list_contents : term list_contents")
+@production("list_contents : list_contents term")
 def list_contents(p):
-    return [p[0]] + p[1]
+    p[0].append(p[1])
+    return p[0]
 
-@pg.production("list_contents : term")
+@production("list_contents : term")
 def list_contents_term(p):
     return [p[0]]
 
-@pg.production("term : element")
-@pg.production("term : identifier")
-@pg.production("term : string")
-@pg.production("term : list")
+@production("term : element")
+@production("term : identifier")
+@production("term : string")
+@production("term : list")
 def term(p):
     return p[0]
 
-@pg.production("element : start_tag list_contents end_tag")
+@production("element : start_tag list_contents end_tag")
 def element(p):
-    return LtnsElement(p[0].name, attributes=p[0].attributes, childs=p[1])
+    start, end = p[0], p[2]
+    return LtnsElement(start.name, attributes=start.attributes, childs=p[1]).locate(
+        start.start, end.end, start.lineno, start.colno,
+    )
 
-@pg.production("element : start_tag end_tag")
-@pg.production("element : empty_tag")
+@production("element : start_tag end_tag")
+@production("element : empty_tag")
 def empty_element(p):
-    return LtnsElement(p[0].name, attributes=p[0].attributes)
+    start, end = p[0], p[-1]
+    return LtnsElement(start.name, attributes=start.attributes).locate(
+        start.start, end.end, start.lineno, start.colno,
+    )
 
-@pg.production("start_tag : LANGLE identifier attributes RANGLE")
+@production("start_tag : LANGLE identifier attributes RANGLE")
 def start_tag(p):
-    return tag(p[1], p[2], p[0].source_pos.lineno, p[0].source_pos.colno)
+    return tag_start(p[0], p[1], p[2], token_end(p[3]))
 
-@pg.production("start_tag : LANGLE identifier RANGLE")
+@production("start_tag : LANGLE identifier RANGLE")
 def start_tag_without_attributes(p):
-    return tag(p[1], {}, p[0].source_pos.lineno, p[0].source_pos.colno)
+    return tag_start(p[0], p[1], EMPTY_ATTRIBUTES, token_end(p[2]))
 
-@pg.production("attributes : identifier EQUAL term attributes")
+@production("attributes : attributes identifier EQUAL term")
 def attributes(p):
-    d = OrderedDict([(p[0], p[2])])
-    d.update(p[3])
-
-    return d
+    p[0][p[1]] = p[3]
+    return p[0]
 
-@pg.production("attributes : identifier EQUAL term")
+@production("attributes : identifier EQUAL term")
 def attributes_one(p):
-    return {p[0]: p[2]}
+    return OrderedDict([(p[0], p[2])])
 
-@pg.production("end_tag : LSLASHANGLE identifier RANGLE")
+@production("end_tag : LSLASHANGLE identifier RANGLE")
 def end_tag(p):
-    return tag(p[1], None, None, None)
+    return tag_start(p[0], p[1], None, token_end(p[2]))
 
-@pg.production("empty_tag : LANGLE identifier attributes RSLASHANGLE")
+@production("empty_tag : LANGLE identifier attributes RSLASHANGLE")
 def empty_tag(p):
-    return tag(p[1], p[2], p[0].source_pos.lineno, p[0].source_pos.colno)
+    return tag_start(p[0], p[1], p[2], token_end(p[3]))
 
-@pg.production("identifier : IDENTIFIER")
+@production("identifier : IDENTIFIER")
 def identifier(p):
-    s = p[0].value
-
-    # get base of integer
-    prefix_base = {
-        '0b': 2,
-        '0o': 8,
-        '0x': 16,
-    }
-
-    base = 10
-    for prefix, _base in prefix_base.items():
-        if s.startswith(prefix):
-            base = _base
-    try:
-        return LtnsInteger(s, base=base)
-    except ValueError:
-        pass
-
-    try:
-        return LtnsFloat(s)
-    except ValueError:
-        pass
-
-    try:
-        return LtnsComplex(s)
-    except ValueError:
-        pass
-
-    try:
-        if not s.startswith(':'):
-            raise ValueError
-        s = s[1:]
-        return LtnsKeyword(s)
-    except ValueError:
-        pass
-
-    return LtnsSymbol(s)
-
-@pg.production("string : STRING")
+    token = p[0]
+
+    model = getattr(token, 'model', None)
+    if model is None:
+        model = classify(token.value)
+
+    return locate_token(model, token)
+
+def locate_token(model, token):
+    pos = token.source_pos
+    return model.locate(pos.idx, token_end(token), pos.lineno, pos.colno)
+
+@production("string : STRING")
 def string(p):
-    return LtnsString(p[0].value[1:-1])
+    return locate_token(LtnsString(p[0].value[1:-1]), p[0])
 
-@pg.production("list : LSQUARE list_contents RSQUARE")
+@production("list : LSQUARE list_contents RSQUARE")
 def list(p):
-    return LtnsList(p[1])
+    pos = p[0].source_pos
+    return LtnsList(p[1]).locate(pos.idx, token_end(p[2]), pos.lineno, pos.colno)
 
-@pg.error
 def error_handler(token):
     raise ValueError("Ran into a %s where it wasn't expected" % token.gettokentype())
 
-parser = pg.build()
+_parser = None
+
+def get_parser():
+    """
+    Return the parser, building it on first use
+
+    rply keeps the generated LALR tables in its cache directory, keyed by a
+    hash of the grammar, so only the first build after a grammar change pays
+    for table generation.
+    """
+    global _parser
+
+    if _parser is None:
+        from rply import ParserGenerator
+
+        pg = ParserGenerator(tokens + ['end$'], cache_id='ltns')
+
+        for rule, f in _productions:
+            pg.production(rule)(f)
+
+        pg.error(error_handler)
+
+        _parser = pg.build()
+
+    return _parser
+
+def _split_forms(tokens):
+    # a form is complete when every tag, element and list opened by its
+    # tokens is closed again
+    stack = []
+    form = []
+
+    for token in tokens:
+        form.append(token)
+        name = token.gettokentype()
+
+        if name in ('LANGLE', 'LSLASHANGLE', 'LSQUARE'):
+            stack.append(name)
+        elif stack:
+            top = stack[-1]
+            if name == 'RSQUARE' and top == 'LSQUARE':
+                stack.pop()
+            elif name == 'RSLASHANGLE' and top == 'LANGLE':
+                stack.pop()
+            elif name == 'RANGLE' and top == 'LANGLE':
+                stack[-1] = 'element'
+            elif name == 'RANGLE' and top == 'LSLASHANGLE':
+                stack.pop()
+                if stack and stack[-1] == 'element':
+                    stack.pop()
+
+        if not stack:
+            yield form
+            form = []
+
+    if form:
+        yield form
+
+def parse_forms(tokens):
+    """
+    Parse a token stream one top-level form at a time
+
+    Each form is yielded as soon as its last token has been read, so only the
+    tokens of a single form are held in memory.
+    """
+    parser = get_parser()
+
+    for form in _split_forms(tokens):
+        yield from parser.parse(iter(form))
+
+def __getattr__(name):
+    if name == 'parser':
+        return get_parser()
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
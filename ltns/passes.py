@@ -0,0 +1,462 @@
+"""
+Optimization passes
+
+Passes transform the code between the phases of the compiler: tree passes
+rewrite the model tree before it is compiled, AST passes rewrite the Python
+module compiled from it before CPython compiles it to bytecode. Each pass
+has a level, the lowest optimization level running it:
+
+* 0 runs no pass, for the fastest compilation
+* 1, the default, prunes ``if`` with literal tests and drops the
+  expressions whose value is unused and that cannot have side effects
+* 2 also inlines functions called right where they are defined
+
+A :class:`Pipeline` runs the passes of a level, in the order they are
+registered, each one timed as the phase ``pass <name>`` of :mod:`ltns.stats`.
+Passes can be enabled or disabled one by one, whatever their level. Passes
+are given the code and the :class:`ltns.compiler.LtnsCompiler` that made it,
+whose ``temporaries`` and ``bindings`` are the variables it named.
+"""
+import ast
+from collections import namedtuple
+
+from .arena import ArenaElement
+from .stats import phase
+from .models import (
+    LtnsElement,
+    LtnsKeyword,
+    LtnsString,
+    LtnsSymbol,
+    LtnsInteger,
+    LtnsFloat,
+    LtnsComplex,
+    LtnsList,
+)
+
+
+DEFAULT_LEVEL = 1
+
+MAX_LEVEL = 2
+
+# kinds of passes: on the model tree, or on the ast.Module compiled from it
+TREE, AST = 'tree', 'ast'
+
+Pass = namedtuple('Pass', 'name kind level function')
+
+_passes = {}
+
+def tree_pass(name, level):
+    def decorator(f):
+        _passes[name] = Pass(name, TREE, level, f)
+        return f
+    return decorator
+
+def ast_pass(name, level):
+    def decorator(f):
+        _passes[name] = Pass(name, AST, level, f)
+        return f
+    return decorator
+
+def passes():
+    """
+    Return the registered passes, in the order they run
+    """
+    return tuple(_passes.values())
+
+class Pipeline:
+    """
+    Passes run on the code compiled at optimization ``level``
+
+    :param enable: names of passes to run whatever their level
+    :param disable: names of passes not to run whatever their level
+    """
+    def __init__(self, level=DEFAULT_LEVEL, enable=(), disable=()):
+        if not 0 <= level <= MAX_LEVEL:
+            raise ValueError(f'optimization level should be 0 to {MAX_LEVEL}')
+
+        unknown = (set(enable) | set(disable)) - _passes.keys()
+        if unknown:
+            raise ValueError(f"unknown passes: {', '.join(sorted(unknown))}")
+
+        self.level = level
+        self.passes = tuple(
+            p for p in _passes.values()
+            if (p.level <= level or p.name in enable) and p.name not in disable
+        )
+
+    def __repr__(self):
+        names = ', '.join(p.name for p in self.passes)
+        return f'<Pipeline level={self.level} passes=[{names}]>'
+
+    def run(self, kind, node, compiler):
+        """
+        Return ``node``, compiled by ``compiler``, transformed by the passes
+        of ``kind``
+        """
+        for p in self.passes:
+            if p.kind == kind:
+                with phase('pass ' + p.name):
+                    node = p.function(node, compiler)
+        return node
+
+_pipelines = {}
+
+def get_pipeline(optimize=None):
+    """
+    Return the pipeline of ``optimize``: a :class:`Pipeline`, a level, or
+    ``None`` for the default level
+    """
+    if isinstance(optimize, Pipeline):
+        return optimize
+    if optimize is None:
+        optimize = DEFAULT_LEVEL
+
+    pipeline = _pipelines.get(optimize)
+    if pipeline is None:
+        pipeline = _pipelines[optimize] = Pipeline(optimize)
+    return pipeline
+
+_elements = (LtnsElement, ArenaElement)
+
+def _rewrite_elements(tree, rewrite):
+    """
+    Return ``tree`` with ``rewrite`` applied to its elements, childs first
+
+    ``rewrite`` returns the element or its replacement. Elements and lists
+    whose childs are replaced are copied, the others are kept, so that the
+    tree given is never modified.
+    """
+    # (node, visited), and the rewritten nodes, childs before their parent
+    stack = [(tree, False)]
+    done = []
+
+    while stack:
+        node, visited = stack.pop()
+        kind = type(node)
+
+        if kind is LtnsList:
+            childs = node
+        elif kind in _elements:
+            childs = (*node.childs, *node.attributes.values())
+        else:
+            done.append(node)
+            continue
+
+        if not visited:
+            stack.append((node, True))
+            stack.extend((child, False) for child in reversed(childs))
+            continue
+
+        new = done[len(done) - len(childs):]
+        del done[len(done) - len(childs):]
+
+        if any(a is not b for a, b in zip(new, childs)):
+            position = (node.start, node.end, node.lineno, node.colno)
+            if kind is LtnsList:
+                node = LtnsList(new).locate(*position)
+            else:
+                count = len(node.childs)
+                node = LtnsElement(
+                    node.name,
+                    childs=new[:count],
+                    attributes=dict(zip(node.attributes, new[count:])),
+                ).locate(*position)
+
+        if kind is not LtnsList:
+            node = rewrite(node)
+        done.append(node)
+
+    return done[0]
+
+_literals = (LtnsInteger, LtnsFloat, LtnsComplex, LtnsString, LtnsKeyword)
+
+_name_constants = {'True': True, 'False': False, 'None': None}
+
+def _prune_if(element):
+    if element.name != 'if' or element.attributes:
+        return element
+
+    childs = element.childs
+    if len(childs) not in (2, 3):
+        return element
+
+    test = childs[0]
+    if isinstance(test, _literals):
+        value = bool(test)
+    elif type(test) is LtnsSymbol and test in _name_constants:
+        value = bool(_name_constants[test])
+    else:
+        return element
+
+    if value:
+        return childs[1]
+    if len(childs) == 3:
+        return childs[2]
+    return LtnsSymbol('None').locate(
+        element.start, element.end, element.lineno, element.colno,
+    )
+
+@tree_pass('prune_if', level=1)
+def prune_if(tree, compiler):
+    """
+    Replace the ``if`` whose test is a literal by the branch it takes
+    """
+    # most trees have none, and are only scanned
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        kind = type(node)
+        if kind is LtnsList:
+            stack.extend(node)
+        elif kind in _elements:
+            if node.name == 'if' and _prune_if(node) is not node:
+                return _rewrite_elements(tree, _prune_if)
+            stack.extend(node.childs)
+            stack.extend(node.attributes.values())
+
+    return tree
+
+def is_pure(expr, temporaries):
+    """
+    Return whether evaluating ``expr`` cannot have side effects
+
+    ``temporaries`` are the names of variables never rebound before being
+    read, like the temporary variables and functions and the pooled
+    constants of the compiler. Lambdas evaluate their default values when
+    they are created.
+    """
+    if isinstance(expr, ast.Name):
+        return expr.id in temporaries
+    if isinstance(expr, ast.Lambda):
+        args = expr.args
+        return all(
+            is_pure(default, temporaries)
+            for default in args.defaults + args.kw_defaults
+            if default is not None
+        )
+    return isinstance(expr, ast.Constant)
+
+_scopes = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+
+def _blocks(module, functions=True):
+    """
+    Yield the ``(node, field)`` of each list of statements under ``module``
+
+    The list can be replaced before the next one is yielded. With
+    ``functions`` false, the bodies of functions and classes are skipped.
+    """
+    stack = [module]
+
+    while stack:
+        node = stack.pop()
+        for field in ('body', 'orelse', 'finalbody'):
+            if isinstance(getattr(node, field, None), list):
+                yield node, field
+                stmts = getattr(node, field)
+                if not functions:
+                    stmts = [x for x in stmts if not isinstance(x, _scopes)]
+                stack.extend(stmts)
+        stack.extend(getattr(node, 'handlers', ()))
+
+# nodes that stop the body of a function from being run in its caller: its
+# loops would run on globals instead of locals, its closures would see
+# globals instead of the variables of the call
+_not_inlined = (
+    ast.For, ast.AsyncFor, ast.While, ast.FunctionDef, ast.AsyncFunctionDef,
+    ast.ClassDef, ast.Lambda, ast.ListComp, ast.SetComp, ast.DictComp,
+    ast.GeneratorExp, ast.Return, ast.Yield, ast.YieldFrom, ast.Await,
+    ast.Nonlocal,
+)
+
+def _inlined_helper(fdef, stmt, names):
+    """
+    Return the statements running the function ``fdef`` in place of
+    ``stmt``, which calls it, or ``None`` if they cannot
+
+    The function can only bind its global variables and the local variables
+    in ``names``, that nothing else uses: any other local variable would
+    become a global one, like the target of a ``with``.
+    """
+    args = fdef.args
+    value = getattr(stmt, 'value', None)
+    if not (
+        not (args.posonlyargs or args.args or args.vararg or args.kwonlyargs
+             or args.kwarg)
+        and not fdef.decorator_list
+        and isinstance(stmt, (ast.Expr, ast.Assign))
+        and isinstance(value, ast.Call)
+        and isinstance(value.func, ast.Name)
+        and value.func.id == fdef.name
+        and not value.args and not value.keywords
+    ):
+        return None
+
+    *body, ret = fdef.body
+    if not isinstance(ret, ast.Return) or ret.value is None:
+        return None
+
+    stored = set()
+    declared = set()
+    for node in ast.walk(ast.Module(body=[*body, ast.Expr(ret.value)])):
+        if isinstance(node, _not_inlined):
+            return None
+        if isinstance(node, ast.Global):
+            declared.update(node.names)
+        elif isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Load):
+            stored.add(node.id)
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            stored.add(node.name)
+        elif isinstance(node, ast.alias):
+            stored.add((node.asname or node.name).partition('.')[0])
+
+    if not stored <= names | declared:
+        return None
+
+    stmts = [x for x in body if not isinstance(x, ast.Global)]
+    stmts.append(ast.copy_location(
+        type(stmt)(**{**vars(stmt), 'value': ret.value}), stmt,
+    ))
+
+    # the locals of the function are released when it returns
+    names = sorted(stored - declared)
+    if names:
+        stmts.append(ast.copy_location(ast.Assign(
+            targets=[ast.Name(id=name, ctx=ast.Store()) for name in names],
+            value=ast.Constant(None),
+        ), stmt))
+
+    return stmts
+
+def _is_inlined_lambda(call):
+    func = call.func
+    if not isinstance(func, ast.Lambda) or call.keywords:
+        return False
+
+    args = func.args
+    params = args.posonlyargs + args.args
+    return (
+        not (args.vararg or args.kwonlyargs or args.kwarg or args.defaults)
+        and len(params) == len(call.args)
+        and all(isinstance(arg, ast.Constant) for arg in call.args)
+        and not any(
+            isinstance(node, (ast.Lambda, ast.NamedExpr, ast.ListComp,
+                              ast.SetComp, ast.DictComp, ast.GeneratorExp))
+            for node in ast.walk(func.body)
+        )
+    )
+
+def _inline_lambda(call):
+    """
+    Return the body of the lambda called by ``call``, its parameters
+    replaced by the constants given
+    """
+    func = call.func
+    values = {
+        param.arg: arg.value
+        for param, arg in zip(func.args.posonlyargs + func.args.args, call.args)
+    }
+    body = func.body
+
+    if isinstance(body, ast.Name) and body.id in values:
+        return ast.copy_location(ast.Constant(values[body.id]), body)
+
+    for node in ast.walk(body):
+        for field, value in ast.iter_fields(node):
+            if isinstance(value, ast.Name) and value.id in values:
+                setattr(node, field, ast.copy_location(
+                    ast.Constant(values[value.id]), value,
+                ))
+            elif isinstance(value, list):
+                value[:] = [
+                    ast.copy_location(ast.Constant(values[x.id]), x)
+                    if isinstance(x, ast.Name) and x.id in values else x
+                    for x in value
+                ]
+
+    return body
+
+def _inline_lambdas(call):
+    while isinstance(call, ast.Call) and _is_inlined_lambda(call):
+        call = _inline_lambda(call)
+    return call
+
+# values of fields without calls under them
+_leaves = (
+    ast.Name, ast.Constant, ast.expr_context, ast.operator, str, int,
+    type(None),
+)
+
+@ast_pass('inline_calls', level=2)
+def inline_calls(module, compiler):
+    """
+    Inline the functions called right where they are defined
+
+    These are the functions holding the bindings of a module level ``let``,
+    when they run straight code, and lambdas called with constants.
+    """
+    names = compiler.temporaries | compiler.bindings
+    for node, field in _blocks(module, functions=False):
+        stmts = getattr(node, field)
+        new = []
+        i = 0
+        while i < len(stmts):
+            stmt = stmts[i]
+            if (
+                isinstance(stmt, ast.FunctionDef)
+                and stmt.name in compiler.temporaries
+                and i + 1 < len(stmts)
+            ):
+                inlined = _inlined_helper(stmt, stmts[i + 1], names)
+                if inlined is not None:
+                    new.extend(inlined)
+                    i += 2
+                    continue
+            new.append(stmt)
+            i += 1
+        if len(new) != len(stmts) or any(a is not b for a, b in zip(new, stmts)):
+            setattr(node, field, new)
+
+    # without recursion, replacing the calls found under each node
+    stack = [module]
+    while stack:
+        node = stack.pop()
+        for field in node._fields:
+            value = getattr(node, field, None)
+            if type(value) is list:
+                for j, x in enumerate(value):
+                    if type(x) is ast.Call and type(x.func) is ast.Lambda:
+                        x = value[j] = _inline_lambdas(x)
+                    if not isinstance(x, _leaves):
+                        stack.append(x)
+            elif not isinstance(value, _leaves):
+                if type(value) is ast.Call and type(value.func) is ast.Lambda:
+                    value = _inline_lambdas(value)
+                    setattr(node, field, value)
+                stack.append(value)
+
+    return module
+
+@ast_pass('dead_expressions', level=1)
+def eliminate_dead_expressions(module, compiler):
+    """
+    Remove the expression statements that cannot have side effects
+
+    Like the values of the non final forms of ``do`` that are constants,
+    functions or the temporary variable of an ``if``.
+    """
+    temporaries = compiler.temporaries
+    for node, field in _blocks(module):
+        stmts = getattr(node, field)
+        kept = [
+            x for x in stmts
+            if not (type(x) is ast.Expr and is_pure(x.value, temporaries))
+        ]
+        if len(kept) == len(stmts):
+            continue
+
+        # the bodies of compound statements cannot be empty
+        if not kept and field == 'body' and node is not module:
+            kept = [ast.copy_location(ast.Pass(), stmts[-1])]
+        setattr(node, field, kept)
+
+    return module
@@ -0,0 +1,81 @@
+"""
+Line profiler of ltns programs
+
+Compiled ltns code carries the lines of its source, so the lines of a program
+can be measured while it runs under :func:`sys.settrace`. The time of a line
+includes the functions it calls, and tracing slows the program down, so
+times are only meaningful relative to each other.
+"""
+import linecache
+import sys
+import time
+from collections import Counter
+
+from .importer import SOURCE_SUFFIX
+
+
+class LineProfiler:
+    """
+    Count the runs of the lines of ``.ltns`` files, and the time spent on them
+    """
+    def __init__(self):
+        self.hits = Counter()
+        self.times = Counter()
+
+    def _trace_call(self, frame, event, arg):
+        if not frame.f_code.co_filename.endswith(SOURCE_SUFFIX):
+            return None
+        return self._frame_tracer()
+
+    def _frame_tracer(self):
+        hits = self.hits
+        times = self.times
+        timer = time.perf_counter
+        line = None
+        start = 0
+
+        def trace(frame, event, arg):
+            nonlocal line, start
+            if line is not None:
+                times[line] += timer() - start
+
+            if event == 'line':
+                line = (frame.f_code.co_filename, frame.f_lineno)
+                hits[line] += 1
+            elif event == 'return':
+                line = None
+
+            start = timer()
+            return trace
+
+        return trace
+
+    def runcode(self, code, namespace):
+        """
+        Execute ``code`` in ``namespace`` while profiling
+        """
+        sys.settrace(self._trace_call)
+        try:
+            exec(code, namespace)
+        finally:
+            sys.settrace(None)
+
+    def report(self, limit=20):
+        """
+        Return the ``limit`` lines that took the most time, as text
+        """
+        total = sum(self.times.values()) or 1
+        lines = [
+            f'{"hits":>9} {"total ms":>10} {"per hit us":>11} {"%":>6}  line'
+        ]
+
+        for (filename, lineno), seconds in self.times.most_common(limit):
+            hits = self.hits[filename, lineno]
+            source = linecache.getline(filename, lineno).strip()
+            lines.append(
+                f'{hits:>9} {seconds * 1000:>10.3f} '
+                f'{seconds / hits * 1e6:>11.3f} {seconds / total * 100:>6.1f}'
+                f'  {filename}:{lineno}: {source}'
+            )
+
+        return '\n'.join(lines)
@@ -0,0 +1,14 @@
+"""
+Runtime support of Python code transpiled from ltns
+
+This module has no dependencies: it is copied as ``ltns_runtime.py`` next to
+transpiled code, which imports ``LtnsKeyword`` from it instead of from
+:mod:`ltns.models`.
+"""
+
+
+class LtnsKeyword(str):
+    """
+    Keyword, equal to the string of its name like :class:`ltns.models.LtnsKeyword`
+    """
+    __slots__ = ()
@@ -0,0 +1,196 @@
+"""
+Binary serialization of model trees
+
+A tree is written as its :class:`ltns.arena.LtnsArena`, so that a reader
+maps the node arrays instead of decoding one object per node:
+
+* the magic ``LTNSTREE`` and the format version
+* the number of nodes, as a varint
+* the interned symbols, keywords and strings: their number, then each one as
+  its UTF-8 length and bytes, lengths being varints
+* the number constants: their number, then each one as its kind byte and its
+  value, a zigzag varint for integers and little endian doubles for floats
+  and complex numbers
+* the width in bytes of each node array, then the arrays themselves, in
+  little endian, each starting on a multiple of 8 bytes
+
+Each array only takes the bytes its largest value needs, e.g. one byte per
+node for the kinds. :func:`load` maps the file in memory, so that the node
+arrays are read from the page cache shared by every process loading it.
+"""
+import mmap
+import struct
+import sys
+from array import array
+
+from .arena import COMPLEX, FLOAT, INTEGER, LtnsArena
+
+
+MAGIC = b'LTNSTREE'
+
+VERSION = 1
+
+# node arrays of LtnsArena, in the order they are written
+COLUMNS = (
+    'kinds', 'values', 'first', 'counts', 'attribute_counts', 'linenos',
+    'colnos',
+)
+
+_typecodes = {1: 'B', 2: 'H', 4: 'I', 8: 'Q'}
+
+_double = struct.Struct('<d')
+_complex = struct.Struct('<dd')
+
+_little_endian = sys.byteorder == 'little'
+
+
+def _write_varint(out, n):
+    while n > 0x7F:
+        out.append(n & 0x7F | 0x80)
+        n >>= 7
+    out.append(n)
+
+def _read_varint(data, pos):
+    n = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        n |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return n, pos
+        shift += 7
+
+def _width(column):
+    largest = max(column, default=0)
+    for width in (1, 2, 4):
+        if largest < 1 << (8 * width):
+            return width
+    return 8
+
+def _align(out):
+    out.extend(bytes(-len(out) % 8))
+
+def dumps(tree):
+    """
+    Return the bytes of the model ``tree``, or of a :class:`LtnsArena`
+    """
+    arena = tree if isinstance(tree, LtnsArena) else LtnsArena.from_tree(tree)
+    out = bytearray(MAGIC)
+    out.append(VERSION)
+    _write_varint(out, len(arena))
+
+    _write_varint(out, len(arena.symbols))
+    for symbol in arena.symbols:
+        data = symbol.encode('utf-8', 'surrogatepass')
+        _write_varint(out, len(data))
+        out += data
+
+    _write_varint(out, len(arena.constants))
+    for kind, value in arena.constants:
+        out.append(kind)
+        if kind == INTEGER:
+            # zigzag, so that small negative integers stay small
+            _write_varint(out, value << 1 if value >= 0 else (~value << 1) | 1)
+        elif kind == FLOAT:
+            out += _double.pack(value)
+        else:
+            out += _complex.pack(value.real, value.imag)
+
+    columns = [getattr(arena, name) for name in COLUMNS]
+    widths = [_width(column) for column in columns]
+    out += bytes(widths)
+
+    for column, width in zip(columns, widths):
+        _align(out)
+        data = array(_typecodes[width], column)
+        if not _little_endian:
+            data.byteswap()
+        out += data.tobytes()
+
+    return bytes(out)
+
+def dump(tree, path):
+    """
+    Write the bytes of the model ``tree`` to the file at ``path``
+    """
+    with open(path, 'wb') as f:
+        f.write(dumps(tree))
+
+def _read_column(data, pos, width, count):
+    typecode = _typecodes[width]
+    end = pos + width * count
+
+    if _little_endian:
+        # a view, not a copy, of the mapped file
+        return data[pos:end].cast(typecode), end
+
+    column = array(typecode, data[pos:end])
+    column.byteswap()
+    return column, end
+
+def loads(data, lazy=False):
+    """
+    Return the tree serialized in ``data``, bytes or any buffer
+
+    :param lazy: if true, return the root element as an
+                 :class:`ltns.arena.ArenaElement` view, whose childs and
+                 attributes are only built when accessed; with a buffer
+                 like a memory map, the nodes are read from it
+    """
+    data = memoryview(data)
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError('not a serialized ltns tree')
+    if data[len(MAGIC)] != VERSION:
+        raise ValueError(f'unsupported version {data[len(MAGIC)]}')
+
+    arena = LtnsArena()
+    count, pos = _read_varint(data, len(MAGIC) + 1)
+
+    n, pos = _read_varint(data, pos)
+    for _ in range(n):
+        length, pos = _read_varint(data, pos)
+        arena.symbols.append(
+            str(data[pos:pos + length], 'utf-8', 'surrogatepass')
+        )
+        pos += length
+
+    n, pos = _read_varint(data, pos)
+    for _ in range(n):
+        kind = data[pos]
+        pos += 1
+        if kind == INTEGER:
+            value, pos = _read_varint(data, pos)
+            value = value >> 1 if not value & 1 else ~(value >> 1)
+        elif kind == FLOAT:
+            value, = _double.unpack_from(data, pos)
+            pos += _double.size
+        elif kind == COMPLEX:
+            value = complex(*_complex.unpack_from(data, pos))
+            pos += _complex.size
+        else:
+            raise ValueError(f'unknown constant kind {kind}')
+        arena.constants.append((kind, value))
+
+    widths = data[pos:pos + len(COLUMNS)]
+    pos += len(COLUMNS)
+
+    for name, width in zip(COLUMNS, widths):
+        pos += -pos % 8
+        column, pos = _read_column(data, pos, width, count)
+        setattr(arena, name, column)
+
+    if not count:
+        raise ValueError('empty tree')
+
+    return arena.root if lazy else arena.to_tree()
+
+def load(path, lazy=False):
+    """
+    Return the tree serialized in the file at ``path``, mapped in memory
+
+    See :func:`loads` for ``lazy``.
+    """
+    with open(path, 'rb') as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    return loads(data, lazy)
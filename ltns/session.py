@@ -0,0 +1,65 @@
+"""
+Compilation sessions for REPLs and long-running hosts
+
+A :class:`Session` compiles forms one at a time, with one compiler and
+against one namespace, so that each form only costs its own compilation:
+temporary names stay unique across forms, and the keywords and constants
+pooled by previous forms are reused instead of defined again.
+"""
+import linecache
+
+from .compiler import LtnsCompiler, _compile_module, _eval, ltns_parse
+
+
+class Session:
+    """
+    Compiler state and namespace kept across forms
+
+    :param namespace: globals of the session, a new dict by default
+    :param name: prefix of the filenames given to the sources of the session
+    :param optimize: optimization level of the forms compiled, see
+                     :func:`ltns.compiler.ltns_compile`
+    """
+    def __init__(self, namespace=None, name='session', optimize=None):
+        self.namespace = {} if namespace is None else namespace
+        self.name = name
+        self.compiler = LtnsCompiler(optimize)
+        self._inputs = 0
+
+    def _prepare(self, source, filename):
+        self._inputs += 1
+
+        if not isinstance(source, str):
+            return source, filename or f'<{self.name}-{self._inputs}>'
+
+        if filename is None:
+            filename = f'<{self.name}-{self._inputs}>'
+            # keep the source of tracebacks, like the interactive interpreter
+            linecache.cache[filename] = (
+                len(source), None, source.splitlines(True), filename,
+            )
+
+        return ltns_parse(source), filename
+
+    def compile(self, source, filename=None):
+        """
+        Return the code object of ``source``, to be executed in
+        :attr:`namespace` after the code compiled before it
+
+        :param source: ltns source code, or a model tree
+        :param filename: filename of the code, ``<name-N>`` by default for
+                         the ``N``-th source of the session
+        """
+        tree, filename = self._prepare(source, filename)
+        return _compile_module(self.compiler, tree, filename)
+
+    def eval(self, source, filename=None, interpret=None):
+        """
+        Run ``source`` in :attr:`namespace` and return the value of its last
+        form
+
+        Like :func:`ltns.compiler.ltns_eval`, forms that can be interpreted
+        are not compiled, unless ``interpret`` is ``False``.
+        """
+        tree, filename = self._prepare(source, filename)
+        return _eval(self.compiler, tree, self.namespace, filename, interpret)
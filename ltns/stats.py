@@ -0,0 +1,114 @@
+"""
+Opt-in timings and counters of the phases of loading ltns code
+
+Statistics are only recorded inside a :class:`Stats` context::
+
+    with Stats() as stats:
+        ltns_compile(ltns_parse(code))
+    print(stats.report())
+
+Outside of one, instrumented code only pays for a context variable lookup per
+phase, plus an attribute check per compiled node.
+"""
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+
+
+_current = ContextVar('ltns_stats', default=None)
+
+PHASES = (
+    'lex', 'parse', 'compile', 'fix_missing_locations', 'bytecode', 'interpret',
+)
+
+
+def current():
+    """
+    Return the :class:`Stats` recording in this context, or ``None``
+    """
+    return _current.get()
+
+def phase(name):
+    """
+    Time the block as the phase ``name`` of the current :class:`Stats`, if any
+    """
+    stats = _current.get()
+    if stats is None:
+        return nullcontext()
+    return stats.phase(name)
+
+class Stats:
+    """
+    Wall time spent in each phase, and counters
+
+    ``times`` and ``calls`` map phases to their total seconds and number of
+    runs; ``counters`` holds the counts of tokens lexed, nodes parsed, nodes
+    compiled by type, special forms and temporary functions.
+    """
+    def __init__(self):
+        self.times = Counter()
+        self.calls = Counter()
+        self.counters = Counter()
+        self._tokens = []
+
+    def __enter__(self):
+        self._tokens.append(_current.set(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        _current.reset(self._tokens.pop())
+
+    def __getstate__(self):
+        return {
+            'times': self.times,
+            'calls': self.calls,
+            'counters': self.counters,
+        }
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._tokens = []
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Add the time spent in the block to the phase ``name``
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.times[name] += time.perf_counter() - start
+            self.calls[name] += 1
+
+    def count(self, name, n=1):
+        self.counters[name] += n
+
+    def merge(self, other):
+        """
+        Add the statistics of ``other``, e.g. recorded in another process
+        """
+        self.times.update(other.times)
+        self.calls.update(other.calls)
+        self.counters.update(other.counters)
+
+    def report(self):
+        """
+        Return the statistics as text
+        """
+        lines = [f'{"phase":<25} {"calls":>9} {"total":>12}']
+        phases = [p for p in PHASES if p in self.calls]
+        phases += sorted(set(self.calls) - set(PHASES))
+        for name in phases:
+            lines.append(
+                f'{name:<25} {self.calls[name]:>9} {self.times[name] * 1000:>9.2f} ms'
+            )
+
+        if self.counters:
+            lines.append('')
+            lines.append(f'{"counter":<35} {"count":>11}')
+            for name, n in sorted(self.counters.items()):
+                lines.append(f'{name:<35} {n:>11}')
+
+        return '\n'.join(lines)
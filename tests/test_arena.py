@@ -0,0 +1,97 @@
+import ast
+import pickle
+from copy import deepcopy
+
+import pytest
+
+from ltns import serialize
+from ltns.arena import ArenaElement, LtnsArena
+from ltns.compiler import LtnsCompiler, ltns_parse
+from ltns.models import (
+    EMPTY_ATTRIBUTES,
+    EMPTY_CHILDS,
+    LtnsElement,
+    LtnsSymbol,
+)
+
+
+code = '''<def>x <add*>1 2.5</add*> y 3+4j</def>
+<print sep=", " end=:k>x "s" [1 [x "s"]] <f></f></print>'''
+
+def dump(model):
+    position = (type(model).__name__, model.lineno, model.colno)
+    if isinstance(model, (LtnsElement, ArenaElement)):
+        return ('LtnsElement',) + position[1:] + (
+            str(model.name),
+            [(dump(k), dump(v)) for k, v in model.attributes.items()],
+            [dump(child) for child in model.childs],
+        )
+    if isinstance(model, list):
+        return position + ([dump(e) for e in model],)
+    return position + (model,)
+
+def compile(tree):
+    result = LtnsCompiler().compile(tree)
+    return [ast.dump(stmt) for stmt in result.stmts] + [ast.dump(result.expr)]
+
+class TestModels:
+    def test_slots(self):
+        assert not hasattr(LtnsSymbol('x'), '__dict__')
+        assert not hasattr(LtnsElement('f'), '__dict__')
+
+    def test_shared_empty_containers(self):
+        a = LtnsElement('f')
+        b = ltns_parse('<g></g>').childs[0]
+
+        assert a.attributes is b.attributes is EMPTY_ATTRIBUTES
+        assert a.childs is b.childs is EMPTY_CHILDS
+        assert pickle.loads(pickle.dumps(b)).childs is EMPTY_CHILDS
+
+    @pytest.mark.parametrize('copy', [
+        lambda tree: pickle.loads(pickle.dumps(tree)),
+        deepcopy,
+    ])
+    def test_copy(self, copy):
+        tree = ltns_parse(code)
+
+        assert dump(copy(tree)) == dump(tree)
+
+class TestArena:
+    @pytest.mark.parametrize('source', ['[0.0 -0.0]', '[0j -0j 0.0]'])
+    def test_signed_zeros(self, source):
+        tree = ltns_parse(source)
+        for copy in (LtnsArena.from_tree(tree).to_tree(),
+                     serialize.loads(serialize.dumps(tree))):
+            values = copy.childs[0]
+            assert [repr(x) for x in values] == [repr(x) for x in tree.childs[0]]
+
+    def test_round_trip(self):
+        tree = ltns_parse(code)
+        arena = LtnsArena.from_tree(tree)
+
+        assert len(arena) == 21
+        assert dump(arena.to_tree()) == dump(tree)
+        assert dump(arena.root) == dump(tree)
+
+    def test_symbols_are_interned(self):
+        arena = LtnsArena.from_tree(ltns_parse(code))
+
+        assert arena.symbols.count('x') == 1
+        assert arena.symbols.count('s') == 1
+        assert len(arena.symbols) == len(set(arena.symbols))
+
+    def test_compile_arena(self):
+        tree = ltns_parse(code)
+        arena = LtnsArena.from_tree(tree)
+
+        assert compile(arena.root) == compile(tree)
+
+    def test_deep_tree(self):
+        depth = 10000
+        tree = ltns_parse('<f>' * depth + '1' + '</f>' * depth)
+        arena = LtnsArena.from_tree(tree)
+
+        node = arena.to_tree()
+        for _ in range(depth + 1):
+            node = node.childs[0]
+        assert node == 1
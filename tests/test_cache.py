@@ -0,0 +1,145 @@
+import os
+
+import pytest
+
+import ltns.cache
+import ltns.compiler
+from ltns.cache import cache_from_source, load
+
+
+def write_source(tmp_path, code):
+    path = tmp_path / 'script.ltns'
+    path.write_text(code)
+    return str(path)
+
+def run(code):
+    namespace = {}
+    exec(code, namespace)
+    return namespace
+
+def fail_parse(code):
+    raise AssertionError('source should not be parsed again')
+
+class TestCache:
+    def test_cache_path(self):
+        path = cache_from_source(os.path.join('foo', 'bar.ltns'))
+
+        assert os.path.dirname(path) == os.path.join('foo', '__pycache__')
+        assert os.path.basename(path).startswith('bar.')
+        assert path.endswith('.ltnsc')
+
+    def test_cache_hit_skips_compilation(self, tmp_path, monkeypatch):
+        path = write_source(tmp_path, '<def>x <add*>1 2</add*></def>')
+
+        assert run(load(path))['x'] == 3
+        assert os.path.exists(cache_from_source(path))
+
+        monkeypatch.setattr(ltns.compiler, 'ltns_parse', fail_parse)
+        assert run(load(path))['x'] == 3
+
+    def test_changed_source_is_recompiled(self, tmp_path):
+        path = write_source(tmp_path, '<def>x 1</def>')
+        assert run(load(path))['x'] == 1
+
+        write_source(tmp_path, '<def>x 2</def>')
+        assert run(load(path))['x'] == 2
+
+    @pytest.mark.parametrize('name, value', [
+        ('__version__', 'other'),
+        ('CODE_VERSION', ltns.CODE_VERSION + 1),
+    ])
+    def test_version_change_invalidates_cache(self, tmp_path, monkeypatch,
+                                              name, value):
+        path = write_source(tmp_path, '<def>x 1</def>')
+        load(path)
+
+        monkeypatch.setattr(ltns.cache, name, value)
+        calls = []
+        parse = ltns.compiler.ltns_parse
+        monkeypatch.setattr(
+            ltns.compiler,
+            'ltns_parse',
+            lambda code: calls.append(code) or parse(code),
+        )
+
+        assert run(load(path))['x'] == 1
+        assert len(calls) == 1
+
+    def test_corrupted_cache_is_ignored(self, tmp_path):
+        path = write_source(tmp_path, '<def>x 1</def>')
+        load(path)
+
+        with open(cache_from_source(path), 'r+b') as f:
+            f.seek(-4, os.SEEK_END)
+            f.write(b'\xff\xff\xff\xff')
+
+        assert run(load(path))['x'] == 1
+
+class TestCodeCache:
+    def test_hit_skips_compilation(self, monkeypatch):
+        cache = ltns.cache.CodeCache()
+        code = cache.compile('<def>x <add*>1 2</add*></def>')
+
+        monkeypatch.setattr(ltns.compiler, 'ltns_parse', fail_parse)
+
+        assert cache.compile('<def>x <add*>1 2</add*></def>') is code
+        assert run(code)['x'] == 3
+        assert cache.info() == ltns.cache.CacheInfo(1, 1, 0, cache.maxsize, 1)
+
+    def test_keyed_by_filename(self):
+        cache = ltns.cache.CodeCache()
+
+        first = cache.compile('<def>x 1</def>', 'a.ltns')
+        second = cache.compile('<def>x 1</def>', 'b.ltns')
+
+        assert first is not second
+        assert second.co_filename == 'b.ltns'
+
+    def test_least_recently_used_is_evicted(self):
+        cache = ltns.cache.CodeCache(maxsize=2)
+
+        a = cache.compile('<def>x 1</def>')
+        cache.compile('<def>x 2</def>')
+        assert cache.compile('<def>x 1</def>') is a
+        cache.compile('<def>x 3</def>')
+
+        assert cache.compile('<def>x 1</def>') is a
+        info = cache.info()
+        assert (info.evictions, info.currsize) == (1, 2)
+        assert info.misses == 3
+
+        cache.compile('<def>x 2</def>')
+        assert cache.info().misses == 4
+
+    def test_invalidate(self):
+        cache = ltns.cache.CodeCache()
+        cache.compile('<def>x 1</def>', 'a.ltns')
+        cache.compile('<def>x 2</def>', 'a.ltns')
+        cache.compile('<def>x 1</def>', 'b.ltns')
+
+        assert cache.invalidate(source='<def>x 1</def>', filename='b.ltns') == 1
+        assert cache.invalidate(filename='a.ltns') == 2
+        assert cache.info().currsize == 0
+
+        cache.compile('<def>x 1</def>')
+        assert cache.invalidate() == 1
+
+    def test_threads(self):
+        from concurrent.futures import ThreadPoolExecutor
+
+        cache = ltns.cache.CodeCache(maxsize=8)
+        sources = [f'<def>x {i % 16}</def>' for i in range(400)]
+
+        with ThreadPoolExecutor(4) as executor:
+            codes = list(executor.map(cache.compile, sources))
+
+        assert [run(code)['x'] for code in codes] == [i % 16 for i in range(400)]
+        info = cache.info()
+        assert info.hits + info.misses == 400
+        assert info.currsize == 8
+
+    def test_compile_snippet(self):
+        code = ltns.cache.compile_snippet('<def>x 42</def>')
+
+        assert ltns.cache.compile_snippet('<def>x 42</def>') is code
+        assert ltns.cache.snippet_cache.invalidate('<def>x 42</def>') == 1
@@ -0,0 +1,225 @@
+import importlib
+import importlib.util
+import os
+import re
+import subprocess
+import sys
+
+import pytest
+
+import ltns.compiler
+from ltns import cli, importer
+
+
+@pytest.fixture
+def sources(tmp_path):
+    package = tmp_path / 'ltns_example_cli'
+    (package / 'sub').mkdir(parents=True)
+    (package / '__init__.ltns').write_text('<def>name "package"</def>')
+    (package / 'sub' / '__init__.ltns').write_text('<def>name "sub"</def>')
+    (package / 'sub' / 'mod.ltns').write_text('<def>x <mul*>6 7</mul*></def>')
+    (package / 'notes.txt').write_text('not ltns')
+    return tmp_path
+
+@pytest.fixture
+def import_path(sources, monkeypatch):
+    monkeypatch.syspath_prepend(str(sources))
+    importer.install()
+    yield sources
+    importer.uninstall()
+
+    for name in list(sys.modules):
+        if name.startswith('ltns_example'):
+            del sys.modules[name]
+
+def fail_parse(code):
+    raise AssertionError('module should be loaded from bytecode')
+
+def pyc(path):
+    return importer.cache_from_source(str(path))
+
+class TestCompileCommand:
+    def test_find_sources(self, sources):
+        package = sources / 'ltns_example_cli'
+
+        assert cli.find_sources([str(sources)]) == [
+            str(package / '__init__.ltns'),
+            str(package / 'sub' / '__init__.ltns'),
+            str(package / 'sub' / 'mod.ltns'),
+        ]
+
+    def test_compile(self, sources, capsys):
+        assert cli.main(['compile', '-j', '1', str(sources)]) == 0
+
+        for path in cli.find_sources([str(sources)]):
+            assert os.path.exists(pyc(path))
+
+        out = capsys.readouterr().out
+        assert '3 compiled, 0 up to date, 0 failed' in out
+
+    def test_up_to_date(self, sources, capsys):
+        cli.main(['compile', '-j', '1', str(sources)])
+        capsys.readouterr()
+
+        assert cli.main(['compile', '-j', '1', str(sources)]) == 0
+        assert '0 compiled, 3 up to date' in capsys.readouterr().out
+
+        assert cli.main(['compile', '-j', '1', '-f', str(sources)]) == 0
+        assert '3 compiled, 0 up to date' in capsys.readouterr().out
+
+    @pytest.mark.parametrize('mode', ['timestamp', 'checked-hash'])
+    def test_import_compiled(self, import_path, monkeypatch, mode):
+        cli.main(['compile', '-q', '--invalidation-mode', mode, str(import_path)])
+        monkeypatch.setattr(ltns.compiler, 'ltns_parse', fail_parse)
+
+        module = importlib.import_module('ltns_example_cli.sub.mod')
+
+        assert module.x == 42
+
+    def test_optimization_levels(self, import_path, monkeypatch, capsys):
+        path = str(import_path)
+        cli.main(['compile', '-j', '1', '-O', '0', path])
+        capsys.readouterr()
+
+        assert cli.main(['compile', '-j', '1', '-O', '2', path]) == 0
+        assert '3 compiled, 0 up to date' in capsys.readouterr().out
+        assert cli.main(['compile', '-j', '1', '-O', '0', path]) == 0
+        assert '0 compiled, 3 up to date' in capsys.readouterr().out
+
+        importer.install(optimize=0)
+        monkeypatch.setattr(ltns.compiler, 'ltns_parse', fail_parse)
+        module = importlib.import_module('ltns_example_cli.sub.mod')
+
+        assert module.x == 42
+
+    def test_changed_source(self, sources):
+        path = sources / 'ltns_example_cli' / 'sub' / 'mod.ltns'
+        cli.main(['compile', '-q', '--invalidation-mode', 'checked-hash', str(path)])
+
+        path.write_text('<def>x 1</def>')
+        result = cli.compile_file(
+            str(path), cli.PycInvalidationMode.CHECKED_HASH,
+        )
+
+        assert result[1] == cli.COMPILED
+
+    def test_failures_do_not_stop_the_batch(self, sources, capsys):
+        bad = sources / 'ltns_example_cli' / 'bad.ltns'
+        bad.write_text('<def>x')
+
+        assert cli.main(['compile', '-j', '1', str(sources)]) == 1
+
+        captured = capsys.readouterr()
+        assert f'{bad}: failed' in captured.err
+        assert '3 compiled, 0 up to date, 1 failed' in captured.out
+        assert not os.path.exists(pyc(bad))
+
+    def test_process_pool(self, sources):
+        paths = cli.find_sources([str(sources)])
+        results = list(cli.compile_files(paths, jobs=2))
+
+        assert [path for path, *_ in results] == paths
+        assert all(status == cli.COMPILED for _, status, _, _ in results)
+
+    @pytest.mark.skipif(os.name != 'posix', reason='POSIX file modes')
+    def test_file_modes(self, sources, tmp_path):
+        path = sources / 'ltns_example_cli' / 'sub' / 'mod.ltns'
+        path.chmod(0o644)
+        output = tmp_path / 'output'
+
+        umask = os.umask(0o022)
+        try:
+            cli.main(['compile', '-q', str(path)])
+            cli.main(['transpile', '-q', '-o', str(output), str(path)])
+        finally:
+            os.umask(umask)
+
+        assert os.stat(pyc(path)).st_mode & 0o777 == 0o644
+        assert os.stat(output / 'mod.py').st_mode & 0o777 == 0o644
+
+    @pytest.mark.parametrize('jobs', ['1', '2'])
+    def test_stats(self, sources, capsys, jobs):
+        assert cli.main(['--stats', 'compile', '-q', '-j', jobs, str(sources)]) == 0
+
+        err = capsys.readouterr().err
+        assert re.search(r'^bytecode +3 ', err, re.M)
+        assert re.search(r'^special form def +3$', err, re.M)
+
+class TestTranspileCommand:
+    def test_transpile(self, sources, tmp_path, capsys):
+        output = tmp_path / 'output'
+
+        assert cli.main([
+            'transpile', '-o', str(output), str(sources / 'ltns_example_cli'),
+        ]) == 0
+
+        package = output / 'ltns_example_cli'
+        assert (package / '__init__.py').exists()
+        assert (package / 'sub' / 'mod.py').exists()
+        assert (output / 'ltns_runtime.py').exists()
+
+        code = (
+            'import sys, ltns_example_cli.sub.mod as m; '
+            'print(m.x, "ltns" in sys.modules, "rply" in sys.modules)'
+        )
+        env = dict(os.environ, PYTHONPATH=str(output))
+        out = subprocess.check_output(
+            [sys.executable, '-c', code], cwd=str(output), env=env,
+        )
+        assert out.split() == [b'42', b'False', b'False']
+
+    @pytest.mark.parametrize('options, source', [
+        ([], 'x = 42\n'),
+        (['-O', '0'], 'x = 42\nNone\n'),
+        (['--disable-pass', 'dead_expressions'], 'x = 42\nNone\n'),
+    ])
+    def test_optimize(self, sources, tmp_path, options, source):
+        output = tmp_path / 'output'
+        path = sources / 'ltns_example_cli' / 'sub' / 'mod.ltns'
+
+        assert cli.main(['transpile', '-q', *options, '-o', str(output), str(path)]) == 0
+        assert (output / 'mod.py').read_text() == source
+
+    def test_failures(self, sources, tmp_path, capsys):
+        bad = sources / 'ltns_example_cli' / 'bad.ltns'
+        bad.write_text('<def>x')
+
+        assert cli.main(['transpile', '-o', str(tmp_path / 'output'), str(sources)]) == 1
+        assert f'{bad}: failed' in capsys.readouterr().err
+
+class TestProfileCommand:
+    def test_profile(self, tmp_path, capsys):
+        script = tmp_path / 'script.ltns'
+        script.write_text(
+            '<def>total 0</def>\n'
+            '<for>[k <range>100</range>]\n'
+            '  <def>total <add*>total k</add*></def></for>\n'
+            '<print>total</print>\n'
+        )
+
+        assert cli.main(['profile', '-n', '2', str(script)]) == 0
+
+        out = capsys.readouterr().out.splitlines()
+        assert out[0] == '4950'
+        assert len(out) == 4
+        hits = {line.split(':')[-2]: int(line.split()[0]) for line in out[2:]}
+        assert hits == {'2': 101, '3': 100}
+
+    def test_arguments_and_imports(self, tmp_path, capsys):
+        script = tmp_path / 'script.ltns'
+        script.write_text(
+            '<def>sys <__import__>"sys"</__import__></def>\n'
+            '<def>helper <__import__>"ltns_example_helper"</__import__></def>\n'
+            '<sys.exit><helper.count><getattr>sys "argv"</getattr></helper.count></sys.exit>\n'
+        )
+        helper = tmp_path / 'ltns_example_helper.ltns'
+        helper.write_text('<def>count <fn*>[x] <len>x</len></fn*></def>')
+
+        try:
+            assert cli.main(['profile', str(script), 'a', 'b']) == 3
+        finally:
+            sys.modules.pop('ltns_example_helper', None)
+
+        out = capsys.readouterr().out
+        assert f'{script}:3' in out
+        assert f'{helper}:1' in out
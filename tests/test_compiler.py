@@ -1,7 +1,11 @@
 import ast
 
-from ltns.compiler import LtnsCompiler
-from ltns.compiler import ltns_parse
+import pytest
+
+from ltns.compiler import LtnsCompiler, callee, mangle, _resolve_callee
+from ltns.compiler import ltns_compile, ltns_parse, ltns_parse_iter, ltns_compile_iter
+from ltns.compiler import ltns_eval
+from ltns.compiler import ltns_transpile
 from ltns.models import (
     LtnsElement,
     LtnsSymbol,
@@ -47,14 +51,19 @@ class TestCompiler:
     def test_compile_keyword(self):
         """:hello"""
         keyword = LtnsKeyword('hello')
-        result = compile(keyword)
+        compiler = LtnsCompiler()
+        result = compiler.compile(keyword)
         expr = result.expr
 
         assert not result.stmts
 
-        assert expr.func.id == 'LtnsKeyword'
-        assert len(expr.args) == 1
-        assert expr.args[0].s == 'hello'
+        assert expr.id == '_keyword_hello'
+
+        prelude = compiler.prelude()
+        assert prelude[0].module == 'ltns.models'
+        assert prelude[1].targets[0].id == '_keyword_hello'
+        assert prelude[1].value.func.id == '_LtnsKeyword'
+        assert prelude[1].value.args[0].s == 'hello'
 
     def test_compile_integer(self):
         """1"""
@@ -110,11 +119,11 @@ class TestCompiler:
         assert expr.elts[1].elts[0].s == 'nested'
 
     def test_bin_op(self):
-        """<add*>1 2</add*>"""
+        """<add*>a 2</add*>"""
         bin_op = LtnsElement(
             name='add*',
             childs=[
-                LtnsInteger(1),
+                LtnsSymbol('a'),
                 LtnsInteger(2),
             ],
         )
@@ -125,7 +134,7 @@ class TestCompiler:
 
         assert isinstance(expr.op, ast.Add)
 
-        assert expr.left.n == 1
+        assert expr.left.id == 'a'
 
         assert expr.right.n == 2
 
@@ -173,11 +182,10 @@ class TestCompiler:
 
         assert not result.stmts
 
-        assert expr.test.id == 'True'
-        assert isinstance(expr.test.ctx, ast.Load)
+        assert expr.test.value is True
 
-        assert expr.body.args[0].s == 'true'
-        assert expr.orelse.args[0].s == 'false'
+        assert expr.body.id == '_keyword_true'
+        assert expr.orelse.id == '_keyword_false'
 
     def test_if_with_stmts(self):
         """
@@ -211,20 +219,19 @@ class TestCompiler:
         expr = result.expr
         stmts = result.stmts
 
-        assert stmts[0].name == '_temp_func_1'
-        assert stmts[0].body[0].test.id == 'True'
+        assert len(stmts) == 1
+        assert isinstance(stmts[0], ast.If)
+        assert stmts[0].test.value is True
 
-        assert stmts[0].body[0].body[0].value.n == 1
-        assert stmts[0].body[0].body[1].targets[0].id == '_temp_var_2'
-        assert stmts[0].body[0].body[1].value.n == 2
+        assert stmts[0].body[0].value.n == 1
+        assert stmts[0].body[1].targets[0].id == '_temp_var_1'
+        assert stmts[0].body[1].value.n == 2
 
-        assert stmts[0].body[0].orelse[0].value.n == 3
-        assert stmts[0].body[0].orelse[1].targets[0].id == '_temp_var_2'
-        assert stmts[0].body[0].orelse[1].value.n == 4
+        assert stmts[0].orelse[0].value.n == 3
+        assert stmts[0].orelse[1].targets[0].id == '_temp_var_1'
+        assert stmts[0].orelse[1].value.n == 4
 
-        assert stmts[0].body[1].value.id == '_temp_var_2'
-
-        assert expr.func.id == '_temp_func_1'
+        assert expr.id == '_temp_var_1'
 
     def test_fn_without_stmts(self):
         """<fn*>[x] x</fn*>"""
@@ -240,3 +247,793 @@ class TestCompiler:
         assert not result.stmts
         assert result.expr.args.args[0].arg == 'x'
         assert result.expr.body.id == 'x'
+
+class TestCompileIter:
+    def test_forms_are_executed_incrementally(self):
+        namespace = {'log': []}
+        codes = ltns_compile_iter(ltns_parse_iter(
+            '<def>x 1</def> <log.append>x</log.append> <def>x 2</def>'
+        ))
+
+        exec(next(codes), namespace)
+        assert namespace['x'] == 1
+        assert namespace['log'] == []
+
+        for code in codes:
+            exec(code, namespace)
+        assert namespace['x'] == 2
+        assert namespace['log'] == [1]
+
+    def test_temporary_names_are_unique(self):
+        namespace = {}
+        code = '<fn*>[x] <do>1 2</do></fn*>'
+        for code in ltns_compile_iter(ltns_parse_iter(code * 2)):
+            exec(code, namespace)
+
+        assert '_temp_func_1' in namespace
+        assert '_temp_func_2' in namespace
+
+class TestCompilerDriver:
+    def test_deep_nesting(self):
+        depth = 10000
+        tree = ltns_parse('<str>' * depth + '1' + '</str>' * depth)
+        result = compile(tree)
+
+        expr = result.expr
+        for _ in range(depth):
+            assert expr.func.id == 'str'
+            expr = expr.args[0]
+        assert expr.n == 1
+
+    def test_deep_nesting_runs(self):
+        depth = 500
+        tree = ltns_parse('<str>' * depth + '1' + '</str>' * depth)
+        namespace = {}
+        exec(ltns_compile(tree), namespace)
+
+    def test_statements_keep_evaluation_order(self):
+        tree = ltns_parse('''
+          <log.extend>[
+            <do><log.append>1</log.append> 2</do>
+            <do><log.append>3</log.append> 4</do>
+          ]</log.extend>
+        ''')
+        namespace = {'log': []}
+        exec(ltns_compile(tree), namespace)
+
+        assert namespace['log'] == [1, 3, 2, 4]
+
+    def test_error_restores_state(self):
+        compiler = LtnsCompiler()
+        tree = ltns_parse('<f><if>True <def>x</def> 1</if></f>')
+
+        with pytest.raises(ValueError):
+            compiler.compile(tree)
+
+        result = compiler.compile(ltns_parse('<def>y 1</def>'))
+        assert len(result.stmts) == 1
+
+    def test_fn_rest_args(self):
+        tree = ltns_parse('<def>f <fn*>[a & rest] rest</fn*></def>')
+        namespace = {}
+        exec(ltns_compile(tree), namespace)
+
+        assert namespace['f'](1, 2, 3) == (2, 3)
+
+class TestIfStatement:
+    def run(self, code, **namespace):
+        # without passes, which could prune the if
+        exec(ltns_compile(ltns_parse(code), optimize=0), namespace)
+        return namespace
+
+    def test_no_helper_function(self):
+        result = compile(ltns_parse(
+            '<fn*>[x] <if>x <do><log.append>x</log.append> 1</do> 2</if></fn*>'
+        ))
+
+        assert len(result.stmts) == 1
+        assert not any(
+            isinstance(node, ast.FunctionDef)
+            for node in ast.walk(result.stmts[0].body[0])
+        )
+
+    def test_if_in_function(self):
+        namespace = self.run('''
+          <def>f <fn*>[x]
+            <if>x <do><log.append>x</log.append> 1</do> 2</if>
+          </fn*></def>
+        ''', log=[])
+
+        assert namespace['f'](True) == 1
+        assert namespace['f'](False) == 2
+        assert namespace['log'] == [True]
+
+    def test_def_in_branch(self):
+        namespace = self.run('<if>True <def>x 1</def></if>')
+
+        assert namespace['x'] == 1
+
+    def test_operands_keep_evaluation_order(self):
+        namespace = self.run('''
+          <log.extend>[
+            <log.append>1</log.append>
+            <if>True <do><log.append>2</log.append> 3</do></if>
+            <log.append>4</log.append>
+          ]</log.extend>
+        ''', log=[])
+
+        assert namespace['log'] == [1, 2, 4, None, 3, None]
+
+    def test_lambda_defaults_keep_evaluation_order(self):
+        namespace = self.run('''
+          <def>result <pair>
+            <fn* k=<log.append>1</log.append>>[x] x</fn*>
+            <if>c <do><log.append>2</log.append> 3</do> 4</if>
+          </pair></def>
+        ''', log=[], c=True, pair=lambda f, n: n)
+
+        assert namespace['log'] == [1, 2]
+        assert namespace['result'] == 3
+
+    def test_callee_evaluated_first(self):
+        namespace = self.run('''
+          <def>result <(f)>
+            <if>True <do><def>f g</def> 1</do></if>
+          </(f)></def>
+        ''', f=str, g=repr)
+
+        assert namespace['result'] == '1'
+
+    def test_operands_spilled_once(self):
+        result = compile(ltns_parse(
+            '<f>1 x <if>True <do><g></g> 2</do></if></f>'
+        ).childs[0])
+
+        assert [stmt.value.id for stmt in result.stmts[:2]] == ['f', 'x']
+        assert isinstance(result.stmts[2], ast.If)
+        assert result.expr.args[0].value == 1
+
+class TestLoops:
+    def run(self, code, **namespace):
+        exec(ltns_compile(ltns_parse(code)), namespace)
+        return namespace
+
+    def test_for(self):
+        namespace = self.run('''
+          <for>[x <range>4</range>] <log.append><mul*>x x</mul*></log.append></for>
+        ''', log=[])
+
+        assert namespace['log'] == [0, 1, 4, 9]
+
+    def test_for_unpacking(self):
+        namespace = self.run('''
+          <for>[[k v] <d.items></d.items>] <log.append>k</log.append> <log.append>v</log.append></for>
+        ''', d={'a': 1, 'b': 2}, log=[])
+
+        assert namespace['log'] == ['a', 1, 'b', 2]
+
+    def test_while(self):
+        namespace = self.run('''
+          <def>n 0</def>
+          <while><n.__lt__>5</n.__lt__> <def>n <add*>n 1</add*></def></while>
+        ''')
+
+        assert namespace['n'] == 5
+
+    def test_while_test_with_stmts(self):
+        namespace = self.run('''
+          <while><if><log.__len__></log.__len__>
+                   <do><log.append>0</log.append> <(log.__len__().__lt__)>3</(log.__len__().__lt__)></do>
+                   True</if>
+            <log.append>1</log.append>
+          </while>
+        ''', log=[])
+
+        assert namespace['log'] == [1, 0, 1, 0]
+
+    def test_while_is_a_statement(self):
+        result = compile(ltns_parse('<while>x <f></f></while>').childs[0])
+
+        assert isinstance(result.stmts[0], ast.While)
+        assert result.stmts[0].test.id == 'x'
+
+    def test_loop(self):
+        namespace = self.run('''
+          <def>fact <fn*>[n] <loop>[i n acc 1]
+            <if><i.__gt__>1</i.__gt__>
+              <recur><sub*>i 1</sub*> <mul*>acc i</mul*></recur>
+              acc</if>
+          </loop></fn*></def>
+        ''')
+
+        assert namespace['fact'](10) == 3628800
+
+    def test_loop_deeper_than_recursion_limit(self):
+        namespace = self.run('''
+          <def>total <loop>[i 0 acc 0]
+            <if><i.__lt__>100000</i.__lt__>
+              <do><def>i <add*>i 1</add*></def> <recur>i <add*>acc i</add*></recur></do>
+              acc</if>
+          </loop></def>
+        ''')
+
+        assert namespace['total'] == 5000050000
+
+    def test_recur_rebinds_simultaneously(self):
+        namespace = self.run('''
+          <def>fib <loop>[a 0 b 1 n 10]
+            <if>n <recur>b <add*>a b</add*> <sub*>n 1</sub*></recur> a</if>
+          </loop></def>
+        ''')
+
+        assert namespace['fib'] == 55
+
+    def test_nested_loops(self):
+        namespace = self.run('''
+          <def>result <loop>[i 0 acc <list></list>]
+            <if><i.__lt__>3</i.__lt__>
+              <recur><add*>i 1</add*> <add*>acc [<loop>[k 0] <if><k.__lt__>i</k.__lt__> <recur><add*>k 1</add*></recur> k</if></loop>]</add*></recur>
+              acc</if>
+          </loop></def>
+        ''')
+
+        assert namespace['result'] == [0, 1, 2]
+
+    @pytest.mark.parametrize('code', [
+        '<recur>1</recur>',
+        '<loop>[i 0] <recur>1</recur> i</loop>',
+        '<loop>[i 0] <f><recur>1</recur></f></loop>',
+        '<loop>[i 0] <if><recur>1</recur> 1 2</if></loop>',
+        '<loop>[i 0] <fn*>[x] <recur>1</recur></fn*></loop>',
+        '<loop>[i 0] <recur>1 2</recur></loop>',
+    ])
+    def test_invalid_recur(self, code):
+        compiler = LtnsCompiler()
+
+        with pytest.raises(ValueError):
+            compiler.compile(ltns_parse(code))
+
+        assert not getattr(compiler, '_loops', None)
+
+class TestLet:
+    def run(self, code, **namespace):
+        exec(ltns_compile(ltns_parse(code)), namespace)
+        return namespace
+
+    def test_let(self):
+        namespace = self.run('''
+          <def>r <let>[x 2 y <mul*>x 3</mul*>] <add*>x y</add*></let></def>
+        ''')
+
+        assert namespace['r'] == 8
+        assert 'x' not in namespace
+        assert 'y' not in namespace
+
+    def test_bindings_are_locals(self):
+        namespace = self.run('''
+          <def>f <fn*>[a] <let>[b <add*>a 1</add*>] <mul*>b b</mul*></let></fn*></def>
+        ''')
+
+        code = namespace['f'].__code__
+        assert namespace['f'](2) == 9
+        assert any(name.startswith('_let_b') for name in code.co_varnames)
+        assert not code.co_names
+
+    def test_module_level_bindings_are_locals(self):
+        result = compile(ltns_parse('<let>[x 1] <f>x</f></let>').childs[0])
+        helper = result.stmts[0]
+
+        assert isinstance(helper, ast.FunctionDef)
+        assert helper.body[0].targets[0].id.startswith('_let_x')
+        assert result.expr.func.id == helper.name
+
+    def test_shadowing(self):
+        namespace = self.run('''
+          <def>f <fn*>[x] <do>
+            <def>inner <let>[x <add*>x 1</add*>] <let>[x <mul*>x 10</mul*>] x</let></let></def>
+            [inner x]
+          </do></fn*></def>
+        ''')
+
+        assert namespace['f'](1) == [20, 1]
+
+    def test_parameters_shadow_bindings(self):
+        namespace = self.run('''
+          <def>f <let>[x 1] <fn*>[x] <add*>x 10</add*></fn*></let></def>
+        ''')
+
+        assert namespace['f'](5) == 15
+
+    def test_for_target_shadows_bindings(self):
+        namespace = self.run('''
+          <let>[x 0] <for>[x [1 2]] <log.append>x</log.append></for> <log.append>x</log.append></let>
+        ''', log=[])
+
+        assert namespace['log'] == [1, 2, 0]
+
+    def test_closure(self):
+        namespace = self.run('''
+          <def>counter <let>[n 0]
+            <fn*>[step] <do><def>n <add*>n step</add*></def> n</do></fn*>
+          </let></def>
+        ''')
+
+        assert namespace['counter'](1) == 1
+        assert namespace['counter'](2) == 3
+
+    def test_closure_in_function(self):
+        namespace = self.run('''
+          <def>make <fn*>[start] <let>[n start]
+            <fn*>[step] <do><def>n <add*>n step</add*></def> n</do></fn*>
+          </let></fn*></def>
+          <def>a <make>10</make></def>
+          <def>b <make>20</make></def>
+        ''')
+
+        assert namespace['a'](1) == 11
+        assert namespace['b'](1) == 21
+        assert namespace['a'](1) == 12
+
+    def test_def_in_module_level_let(self):
+        namespace = self.run('''
+          <def>total 1</def>
+          <let>[x 2]
+            <def>total <add*>total x</add*></def>
+            <def>x 3</def>
+            <def>other x</def>
+          </let>
+        ''')
+
+        assert namespace['total'] == 3
+        assert namespace['other'] == 3
+        assert 'x' not in namespace
+
+    def test_def_in_function_stays_local(self):
+        namespace = self.run('''
+          <def>x 1</def>
+          <def>f <fn*>[y] <do><def>x y</def> x</do></fn*></def>
+        ''')
+
+        assert namespace['f'](2) == 2
+        assert namespace['x'] == 1
+
+    def test_let_in_loop_tail(self):
+        namespace = self.run('''
+          <def>r <loop>[i 0 acc 0]
+            <let>[k <add*>i 1</add*>]
+              <if><i.__lt__>3</i.__lt__> <recur>k <add*>acc k</add*></recur> acc</if>
+            </let>
+          </loop></def>
+        ''')
+
+        assert namespace['r'] == 6
+
+    @pytest.mark.parametrize('code', [
+        '<let>[x] x</let>',
+        '<let>[1 2] 1</let>',
+    ])
+    def test_invalid_bindings(self, code):
+        with pytest.raises(ValueError):
+            compile(ltns_parse(code))
+
+class TestConstantPool:
+    def test_keyword_needs_no_namespace(self):
+        namespace = {}
+        exec(ltns_compile(ltns_parse('<def>k :a</def>')), namespace)
+
+        assert namespace['k'] == LtnsKeyword('a')
+        assert type(namespace['k']) is LtnsKeyword
+
+    def test_keyword_built_once(self):
+        namespace = {}
+        exec(ltns_compile(ltns_parse('''
+          <def>f <fn*>[x] :a</fn*></def>
+        ''')), namespace)
+
+        assert namespace['f'](1) is namespace['f'](2)
+
+    def test_keyword_pooled_once(self):
+        compiler = LtnsCompiler()
+        compiler.compile(ltns_parse('[:a :b :a]'))
+
+        prelude = compiler.prelude()
+        assert [stmt.targets[0].id for stmt in prelude[1:]] == [
+            '_keyword_a', '_keyword_b',
+        ]
+        assert compiler.prelude() == []
+
+    def test_keywords_across_forms(self):
+        namespace = {}
+        codes = ltns_compile_iter(ltns_parse_iter(
+            '<def>a :x</def> <def>b :x</def> <def>c :y</def>'
+        ))
+        for code in codes:
+            exec(code, namespace)
+
+        assert namespace['a'] is namespace['b']
+        assert namespace['c'] == LtnsKeyword('y')
+
+    def test_for_over_constants(self):
+        compiler = LtnsCompiler()
+        result = compiler.compile(ltns_parse(
+            '<for>[x [1 "a" :b]] <f>x</f></for>'
+        ).childs[0])
+
+        assert result.stmts[0].iter.id in compiler.temporaries
+        assert isinstance(compiler.prelude()[-1].value, ast.Tuple)
+
+        namespace = {'log': []}
+        exec(ltns_compile(ltns_parse(
+            '<for>[x [1 "a" :b]] <log.append>x</log.append></for>'
+        )), namespace)
+        assert namespace['log'] == [1, 'a', LtnsKeyword('b')]
+
+    def test_for_over_mutable_items(self):
+        result = compile(ltns_parse('<for>[x [1 [2]]] <f>x</f></for>').childs[0])
+
+        assert isinstance(result.stmts[0].iter, ast.List)
+
+    def test_list_literals_are_fresh(self):
+        namespace = {}
+        exec(ltns_compile(ltns_parse('''
+          <def>f <fn*>[x] [1 2]</fn*></def>
+        ''')), namespace)
+
+        assert namespace['f'](0) == [1, 2]
+        assert namespace['f'](0) is not namespace['f'](0)
+
+    def test_modules_in_one_namespace(self):
+        namespace = {}
+        exec(ltns_compile(ltns_parse('<def>f <fn*>[x] :a</fn*></def>')), namespace)
+        exec(ltns_compile(ltns_parse('<def>g <fn*>[x] :b</fn*></def>')), namespace)
+        exec(ltns_compile(ltns_parse(
+            '<def>h <fn*>[x] <for>[y [1 2]] <x.append>y</x.append></for></fn*></def>'
+        )), namespace)
+        exec(ltns_compile(ltns_parse(
+            '<for>[y [3 4]] <log.append>y</log.append></for>'
+        )), {**namespace, 'log': []})
+
+        assert namespace['f'](0) == 'a'
+        assert namespace['g'](0) == 'b'
+        log = []
+        namespace['h'](log)
+        assert log == [1, 2]
+
+    def test_evals_in_one_namespace(self):
+        namespace = {}
+        ltns_eval(ltns_parse('<def>f <fn*>[x] :a</fn*></def>'), namespace,
+                  interpret=False)
+        ltns_eval(ltns_parse('<def>g <fn*>[x] :b</fn*></def>'), namespace,
+                  interpret=False)
+
+        assert namespace['f'](0) == 'a'
+
+    @pytest.mark.parametrize('keyword', ['_1', 'a-b', 'é', 'for'])
+    def test_keyword_names(self, keyword):
+        namespace = {}
+        exec(ltns_compile(ltns_parse(f'<def>k :{keyword}</def>')), namespace)
+
+        assert namespace['k'] == LtnsKeyword(keyword)
+
+    def test_user_names_are_not_constants(self):
+        namespace = {'_keyword_9': 9, 'log': []}
+        exec(ltns_compile(ltns_parse(
+            '<for>[x [1 _keyword_9]] <log.append>x</log.append></for>'
+        )), namespace)
+
+        assert namespace['log'] == [1, 9]
+
+    def test_deterministic(self):
+        code = '<def>f <fn*>[x] <for>[y [:a 1]] <x.append>y</x.append></for></fn*></def>'
+
+        assert ltns_transpile(ltns_parse(code)) == ltns_transpile(ltns_parse(code))
+
+class TestTranspile:
+    def test_transpile(self):
+        source = ltns_transpile(ltns_parse('''
+          <def>f <fn*>[x] <if>x <do><def>y <mul*>x 2</mul*></def> [y :a]</do> :b</if></fn*></def>
+        '''))
+
+        assert 'from ltns_runtime import LtnsKeyword as _LtnsKeyword' in source
+
+        from ltns import runtime
+        namespace = {}
+        exec(source.replace('ltns_runtime', 'ltns.runtime'), namespace)
+
+        assert namespace['f'](3) == [6, 'a']
+        assert type(namespace['f'](3)[1]) is runtime.LtnsKeyword
+        assert namespace['f'](0) == LtnsKeyword('b')
+
+    def test_runtime_module(self):
+        source = ltns_transpile(ltns_parse(':a'), runtime='ltns.models')
+
+        assert 'from ltns.models import LtnsKeyword' in source
+
+    def test_mangled_names(self):
+        code = '''
+          <def>my-var 10</def>
+          <def>my-f <fn* kw=1>[a-b] <add*>a-b kw</add*></fn*></def>
+          <let>[x-y 3 add-1 <fn*>[x] <add*>x 1</add*></fn*>]
+            <def>z <my-f kw=my-var><add-1>x-y</add-1></my-f></def>
+          </let>
+          <log.append>[my-var z <dict class="a" data-id=1></dict>]</log.append>
+        '''
+        source = ltns_transpile(ltns_parse(code))
+        namespace = {'log': []}
+        exec(source, namespace)
+
+        compiled = {'log': []}
+        exec(ltns_compile(ltns_parse(code)), compiled)
+
+        assert namespace['log'] == compiled['log'] == [
+            [10, 14, {'class': 'a', 'data-id': 1}],
+        ]
+        assert namespace[mangle('my-var')] == 10
+
+    @pytest.mark.parametrize('name', ['k-w', 'class'])
+    def test_keyword_parameter_names(self, name):
+        with pytest.raises(ValueError):
+            compile(ltns_parse(f'<fn* {name}=1>[x] x</fn*>'))
+
+    @pytest.mark.parametrize('name, mangled', [
+        ('x', 'x'),
+        ('os.path', 'os.path'),
+        ('my-var', '_ltns_my_x2d_var'),
+        ('class', '_ltns_class'),
+        ('a.b-c', 'a._ltns_b_x2d_c'),
+    ])
+    def test_mangle(self, name, mangled):
+        assert mangle(name) == mangled
+
+class TestCallee:
+    def test_name(self):
+        expr = callee('print')
+
+        assert isinstance(expr, ast.Name)
+        assert expr.id == 'print'
+
+    def test_dotted_name(self):
+        expr = callee('os.path.join')
+
+        assert ast.dump(expr) == ast.dump(ast.parse('os.path.join', mode='eval').body)
+
+    def test_expression(self):
+        expr = callee('(print)')
+
+        assert isinstance(expr, ast.Name)
+        assert expr.id == 'print'
+
+    def test_fresh_copies(self):
+        assert callee('os.path.join') is not callee('os.path.join')
+        assert callee('(print)') is not callee('(print)')
+
+    def test_cached(self):
+        _resolve_callee.cache_clear()
+        for _ in range(3):
+            callee('self.emit')
+
+        info = _resolve_callee.cache_info()
+        assert info.misses == 1
+        assert info.hits == 2
+
+def compile_expr(code):
+    result = compile(ltns_parse(code).childs[0])
+    assert not result.stmts
+    return result.expr
+
+class TestFolding:
+    @pytest.mark.parametrize('code, value', [
+        ('<add*>1 2</add*>', 3),
+        ('<mul*><mul*>60 60</mul*> 24</mul*>', 86400),
+        ('<sub*>1.5 <div*>1 4</div*></sub*>', 1.25),
+        ('<pow>2 10</pow>', 1024),
+        ('<lshift>1 16</lshift>', 65536),
+        ('<bitor><bitand>12 10</bitand> 1</bitor>', 9),
+        ('<mul*>2 3j</mul*>', 6j),
+    ])
+    def test_fold(self, code, value):
+        expr = compile_expr(code)
+
+        assert isinstance(expr, ast.Constant)
+        assert expr.value == value
+        assert type(expr.value) is type(value)
+
+    def test_partial(self):
+        expr = compile_expr('<add*>x <mul*>2 3</mul*></add*>')
+
+        assert isinstance(expr, ast.BinOp)
+        assert expr.left.id == 'x'
+        assert expr.right.value == 6
+
+    @pytest.mark.parametrize('code, error', [
+        ('<div*>1 0</div*>', ZeroDivisionError),
+        ('<mod>1 0</mod>', ZeroDivisionError),
+        ('<lshift>1 -1</lshift>', ValueError),
+        ('<pow>10.0 1000</pow>', OverflowError),
+    ])
+    def test_errors_at_runtime(self, code, error):
+        expr = compile_expr(code)
+
+        assert isinstance(expr, ast.BinOp)
+
+        with pytest.raises(error):
+            exec(ltns_compile(ltns_parse(code)))
+
+    @pytest.mark.parametrize('code', [
+        '<pow>2 100000</pow>',
+        '<lshift>1 100000</lshift>',
+        '<mul*><pow>2 100</pow> <pow>2 100</pow></mul*>',
+        '<pow>1j 100000</pow>',
+    ])
+    def test_large_results_not_folded(self, code):
+        expr = compile_expr(code)
+
+        assert isinstance(expr, ast.BinOp)
+
+LOCATED = '''<def>f <fn*>[x]
+  <if>x
+    <do><def>y 1</def>
+        [y :k]</do>
+    <div*>1 0</div*></if></fn*></def>
+
+<f>False</f>
+'''
+
+class TestLocations:
+    def build(self, code):
+        from ltns.compiler import _build_module
+
+        return _build_module(LtnsCompiler(), ltns_parse(code))
+
+    def test_nodes_have_source_lines(self):
+        tree = self.build(LOCATED)
+
+        fdef = next(n for n in ast.walk(tree) if isinstance(n, ast.FunctionDef))
+        assert (fdef.lineno, fdef.col_offset) == (1, 7)
+
+        if_stmt = fdef.body[0]
+        assert (if_stmt.lineno, if_stmt.col_offset) == (2, 2)
+        assert if_stmt.body[0].lineno == 3
+        assert if_stmt.body[-1].lineno == 4
+        assert if_stmt.orelse[0].value.lineno == 5
+
+        call = tree.body[-1]
+        assert (call.lineno, call.col_offset, call.end_col_offset) == (7, 0, 2)
+
+    def test_statements_point_at_their_value(self):
+        tree = self.build('<def>x\n  <print>1</print></def>')
+
+        assign = next(n for n in tree.body if isinstance(n, ast.Assign))
+        assert (assign.lineno, assign.col_offset) == (2, 2)
+
+    def test_traceback(self):
+        code = ltns_compile(ltns_parse(LOCATED), 'located.ltns')
+
+        with pytest.raises(ZeroDivisionError) as info:
+            exec(code, {})
+
+        frames = [
+            (entry.frame.code.raw.co_filename, entry.lineno + 1)
+            for entry in info.traceback
+        ]
+        assert frames[-2:] == [('located.ltns', 7), ('located.ltns', 5)]
+
+    def test_models_built_in_code(self):
+        tree = LtnsElement('do', childs=[LtnsElement('print', childs=[LtnsInteger(1)])])
+
+        code = ltns_compile(tree)
+
+        assert code.co_firstlineno == 1
+
+def run_async(code, name, *args, **namespace):
+    import asyncio
+
+    namespace['asyncio'] = asyncio
+    exec(ltns_compile(ltns_parse(code)), namespace)
+    return asyncio.run(namespace[name](*args))
+
+async def arange(n):
+    for i in range(n):
+        yield i
+
+class TestAsync:
+    def test_async_fn(self):
+        code = '''<def>f <async-fn*>[x]
+            <await><asyncio.sleep>0</asyncio.sleep></await>
+            <mul*>x 2</mul*></async-fn*></def>'''
+
+        tree = compile(ltns_parse(code))
+        assert isinstance(tree.stmts[0], ast.AsyncFunctionDef)
+        assert run_async(code, 'f', 21) == 42
+
+    def test_async_fn_without_statements(self):
+        code = '<def>f <async-fn*>[x] x</async-fn*></def>'
+
+        assert isinstance(compile(ltns_parse(code)).stmts[0], ast.AsyncFunctionDef)
+        assert run_async(code, 'f', 1) == 1
+
+    def test_await_in_expressions(self):
+        code = '''<def>f <async-fn*>[x]
+            <if><await><g>x</g></await>
+                <add*>x <await><g>1</g></await></add*>
+                <do><def>y <await><g>x</g></await></def> y</do></if></async-fn*></def>'''
+
+        async def g(x):
+            return x
+
+        assert run_async(code, 'f', 2, g=g) == 3
+        assert run_async(code, 'f', 0, g=g) == 0
+
+    def test_concurrent(self):
+        code = '''<def>handler <async-fn*>[& _]
+            <await><asyncio.sleep>0.1</asyncio.sleep></await></async-fn*></def>
+            <def>main <async-fn*>[& _]
+            <await><asyncio.gather>
+            <handler></handler> <handler></handler> <handler></handler> <handler></handler>
+            </asyncio.gather></await></async-fn*></def>'''
+        import time
+
+        start = time.perf_counter()
+        run_async(code, 'main')
+
+        assert time.perf_counter() - start < 0.3
+
+    def test_async_for(self):
+        code = '''<def>f <async-fn*>[n]
+            <def>out <list></list></def>
+            <async-for>[k <arange>n</arange>] <out.append>k</out.append></async-for>
+            out</async-fn*></def>'''
+
+        assert run_async(code, 'f', 3, arange=arange) == [0, 1, 2]
+
+    def test_async_with(self):
+        from contextlib import asynccontextmanager
+
+        events = []
+
+        @asynccontextmanager
+        async def resource(name):
+            events.append(('enter', name))
+            yield name
+            events.append(('exit', name))
+
+        code = '''<def>f <async-fn*>[& _]
+            <async-with>[a <resource>"a"</resource> b <resource><add*>a "b"</add*></resource>]
+              <events.append>b</events.append>
+              b</async-with></async-fn*></def>'''
+
+        assert run_async(code, 'f', resource=resource, events=events) == 'ab'
+        assert events == [
+            ('enter', 'a'), ('enter', 'ab'), 'ab', ('exit', 'ab'), ('exit', 'a'),
+        ]
+
+    def test_with(self, tmp_path):
+        path = tmp_path / 'f.txt'
+        path.write_text('text')
+        code = '<def>read <fn*>[p] <with>[f <open>p</open>] <f.read></f.read></with></fn*></def>'
+
+        namespace = {}
+        exec(ltns_compile(ltns_parse(code)), namespace)
+
+        assert namespace['read'](str(path)) == 'text'
+
+    def test_with_suppressed_exception(self):
+        from contextlib import suppress
+
+        code = '<def>x <with>[_ <suppress>ZeroDivisionError</suppress>] <div*>1 0</div*></with></def>'
+        namespace = {'suppress': suppress}
+        exec(ltns_compile(ltns_parse(code)), namespace)
+
+        assert namespace['x'] is None
+
+    @pytest.mark.parametrize('code', [
+        '<await>x</await>',
+        '<def>f <fn*>[& _] <await>x</await></fn*></def>',
+        '<def>f <async-fn*>[& _] <def>g <fn*>[& _] <await>x</await></fn*></def></async-fn*></def>',
+        '<let>[x 1] <await>x</await></let>',
+        '<async-for>[x y] x</async-for>',
+        '<async-with>[x y] x</async-with>',
+    ])
+    def test_outside_async_fn(self, code):
+        with pytest.raises(ValueError):
+            ltns_compile(ltns_parse(code))
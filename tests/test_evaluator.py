@@ -0,0 +1,107 @@
+import pytest
+
+from ltns import evaluator
+from ltns.compiler import ltns_eval, ltns_parse, mangle
+from ltns.models import LtnsKeyword
+
+
+def fail_compile(*args, **kwargs):
+    raise AssertionError('tree should be interpreted')
+
+def both(code, namespace=None):
+    """
+    Return the values of ``code`` interpreted and compiled
+    """
+    tree = ltns_parse(code)
+    return (
+        ltns_eval(tree, dict(namespace or {}), interpret=True),
+        ltns_eval(tree, dict(namespace or {}), interpret=False),
+    )
+
+class TestEvaluator:
+    @pytest.mark.parametrize('code', [
+        '42',
+        '1.5',
+        '2j',
+        '"text"',
+        'None',
+        '[1 "a" [True]]',
+        '<add*>1 <mul*>2 3</mul*></add*>',
+        '<pow>2 100</pow>',
+        '<if>0 1 2</if>',
+        '<if>[0] 1</if>',
+        '<if>0 1</if>',
+        '<do>1 2 3</do>',
+        '<len>[1 2 3]</len>',
+        '<sorted key=abs>[-3 1 -2]</sorted>',
+        '<str.join>"-" ["a" "b"]</str.join>',
+        '<add*>x <len>y</len></add*>',
+        '<add*>x my-var</add*>',
+        '<my-f>1</my-f>',
+        '<dict class="a" data-id=1 x=x></dict>',
+    ])
+    def test_same_value_as_compiled(self, code):
+        interpreted, compiled = both(
+            code,
+            {'x': 1, 'y': 'abc', mangle('my-var'): 2, mangle('my-f'): abs},
+        )
+
+        assert interpreted == compiled
+        assert type(interpreted) is type(compiled)
+
+    def test_keyword(self):
+        interpreted, compiled = both(':name')
+
+        assert interpreted == compiled == 'name'
+        assert type(interpreted) is type(compiled) is LtnsKeyword
+
+    @pytest.mark.parametrize('code, error', [
+        ('<div*>1 0</div*>', ZeroDivisionError),
+        ('missing', NameError),
+        ('<missing>1</missing>', NameError),
+        ('<int>"x"</int>', ValueError),
+    ])
+    def test_same_errors_as_compiled(self, code, error):
+        for interpret in (True, False):
+            with pytest.raises(error):
+                ltns_eval(ltns_parse(code), interpret=interpret)
+
+    def test_namespace_builtins(self):
+        namespace = {'__builtins__': {'len': lambda x: 'mine'}}
+
+        assert both('<len>[1]</len>', namespace) == ('mine', 'mine')
+
+    def test_interprets_small_trees(self, monkeypatch):
+        monkeypatch.setattr('ltns.compiler._compile_module', fail_compile)
+
+        assert ltns_eval(ltns_parse('<add*>1 2</add*>')) == 3
+
+    @pytest.mark.parametrize('code', [
+        '<do><def>x 2</def> <mul*>x x</mul*></do>',
+        '<if>1 2 3 4</if>',
+        '<add*>1 2 3</add*>',
+        '<if test=1>2</if>',
+        '<lambda:0></lambda:0>',
+    ])
+    def test_unsupported_trees_are_compiled(self, code):
+        assert not evaluator.interpretable(ltns_parse(code))
+
+    def test_compiled_value(self):
+        assert ltns_eval(ltns_parse('<do><def>x 2</def> <mul*>x x</mul*></do>')) == 4
+
+    def test_large_trees_are_interpreted(self, monkeypatch):
+        tree = ltns_parse('<add*>1 2</add*>' * 1000)
+        monkeypatch.setattr('ltns.compiler._compile_module', fail_compile)
+
+        assert ltns_eval(tree) == 3
+
+    def test_deep_trees_are_compiled(self):
+        depth = evaluator.MAX_INTERPRETED_DEPTH
+        tree = ltns_parse('<add*>1 ' * depth + '1' + '</add*>' * depth)
+
+        assert not evaluator.interpretable(tree)
+        assert ltns_eval(tree) == depth + 1
+
+    def test_interpret_unsupported_tree(self):
+        with pytest.raises(ValueError):
+            ltns_eval(ltns_parse('<def>x 1</def>'), interpret=True)
@@ -0,0 +1,127 @@
+import importlib
+import importlib.util
+import os
+import sys
+
+import pytest
+
+import ltns
+import ltns.compiler
+from ltns import importer, passes
+from ltns.models import LtnsKeyword
+
+
+@pytest.fixture
+def import_path(tmp_path, monkeypatch):
+    monkeypatch.syspath_prepend(str(tmp_path))
+    importer.install()
+    yield tmp_path
+    importer.uninstall()
+
+    for name in list(sys.modules):
+        if name.startswith('ltns_example'):
+            del sys.modules[name]
+
+def fail_parse(code):
+    raise AssertionError('module should be loaded from bytecode')
+
+class TestImporter:
+    def test_import_module(self, import_path):
+        (import_path / 'ltns_example.ltns').write_text(
+            '<def>answer <mul*>6 7</mul*> kind :number</def>'
+        )
+
+        module = importlib.import_module('ltns_example')
+
+        assert module.answer == 42
+        assert module.kind == LtnsKeyword('number')
+        assert module.__file__ == str(import_path / 'ltns_example.ltns')
+
+    def test_import_package(self, import_path):
+        package = import_path / 'ltns_example_package'
+        package.mkdir()
+        (package / '__init__.ltns').write_text('<def>name "package"</def>')
+        (package / 'sub.ltns').write_text('<def>name "sub"</def>')
+
+        module = importlib.import_module('ltns_example_package.sub')
+
+        assert module.name == 'sub'
+        assert sys.modules['ltns_example_package'].name == 'package'
+
+    def test_bytecode_is_reused(self, import_path, monkeypatch):
+        path = import_path / 'ltns_example_cached.ltns'
+        path.write_text('<def>x 1</def>')
+        monkeypatch.setattr(sys, 'dont_write_bytecode', False)
+
+        assert importlib.import_module('ltns_example_cached').x == 1
+        assert os.path.exists(importer.cache_from_source(str(path)))
+
+        del sys.modules['ltns_example_cached']
+        monkeypatch.setattr(ltns.compiler, 'ltns_parse', fail_parse)
+
+        assert importlib.import_module('ltns_example_cached').x == 1
+
+    def test_version_change_recompiles(self, import_path, monkeypatch):
+        path = import_path / 'ltns_example_versioned.ltns'
+        path.write_text('<def>x 1</def>')
+        monkeypatch.setattr(sys, 'dont_write_bytecode', False)
+        importlib.import_module('ltns_example_versioned')
+
+        del sys.modules['ltns_example_versioned']
+        monkeypatch.setattr(importer, 'CODE_VERSION', ltns.CODE_VERSION + 1)
+        parsed = []
+        parse = ltns.compiler.ltns_parse
+        def record_parse(code):
+            parsed.append(code)
+            return parse(code)
+        monkeypatch.setattr(ltns.compiler, 'ltns_parse', record_parse)
+
+        assert importlib.import_module('ltns_example_versioned').x == 1
+        assert parsed
+        assert os.path.exists(importer.cache_from_source(str(path)))
+
+    def test_bytecode_apart_from_python(self, import_path):
+        path = str(import_path / 'ltns_example.ltns')
+
+        assert importer.cache_from_source(path) != (
+            importlib.util.cache_from_source(path)
+        )
+
+    def test_bytecode_per_pipeline(self):
+        path = os.path.join('foo', 'bar.ltns')
+        paths = {
+            importer.cache_from_source(path, optimize)
+            for optimize in (None, passes.DEFAULT_LEVEL, 0, 2)
+        }
+
+        assert len(paths) == 3
+        assert importer.cache_from_source(path, 0).endswith('.opt-none.pyc')
+        assert importer.cache_from_source(
+            path, passes.Pipeline(enable=['inline_calls']),
+        ) == importer.cache_from_source(path, 2)
+
+    def test_missing_module(self, import_path):
+        with pytest.raises(ImportError):
+            importlib.import_module('ltns_example_missing')
+
+    def test_python_modules_share_the_finder(self, import_path):
+        (import_path / 'ltns_example_python.py').write_text('x = 1\n')
+        (import_path / 'ltns_example_mixed.ltns').write_text('<def>x 2</def>')
+
+        assert importlib.import_module('ltns_example_python').x == 1
+        assert importlib.import_module('ltns_example_mixed').x == 2
+
+        finder = sys.path_importer_cache[str(import_path)]
+        assert isinstance(finder, importer.LtnsFileFinder)
+        assert not [f for f in sys.meta_path if f.__module__ == importer.__name__]
+
+    def test_uninstall(self, import_path):
+        (import_path / 'ltns_example_gone.ltns').write_text('<def>x 1</def>')
+        importer.uninstall()
+
+        assert importer.path_hook not in sys.path_hooks
+        with pytest.raises(ImportError):
+            importlib.import_module('ltns_example_gone')
+        assert not isinstance(
+            sys.path_importer_cache.get(str(import_path)), importer.LtnsFileFinder
+        )
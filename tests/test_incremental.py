@@ -0,0 +1,99 @@
+import random
+
+import pytest
+
+from ltns.compiler import ltns_parse
+from ltns.incremental import apply_edit, reparse
+from ltns.models import LtnsElement
+
+
+code = '''<def>x 1</def>
+<print a=[1 2] b="s">x "two
+lines" <add*>1 2</add*></print> y
+<!-- comment --> [3 <f c=:k>4</f>]
+<if>True <do>5</do> 6</if>'''
+
+def dump(model):
+    position = (
+        type(model).__name__,
+        getattr(model, 'span', None),
+        getattr(model, 'lineno', None),
+        getattr(model, 'colno', None),
+    )
+    if isinstance(model, LtnsElement):
+        return position + (
+            dump(model.name),
+            [(dump(k), dump(v)) for k, v in model.attributes.items()],
+            [dump(child) for child in model.childs],
+        )
+    if isinstance(model, list):
+        return position + ([dump(e) for e in model],)
+    return position + (model,)
+
+def edit(tree, code, offset, removed, inserted):
+    new_code = apply_edit(code, offset, removed, inserted)
+    return reparse(tree, code, offset, removed, inserted), new_code
+
+class TestReparse:
+    def test_untouched_forms_are_reused(self):
+        tree = ltns_parse(code)
+        forms = list(tree.childs)
+
+        offset = code.index('<add*>1') + len('<add*>')
+        new_tree, new_code = edit(tree, code, offset, 1, '10')
+
+        assert dump(new_tree) == dump(ltns_parse(new_code))
+        assert new_tree.childs[0] is forms[0]
+        assert new_tree.childs[1] is not forms[1]
+        assert new_tree.childs[2:] == forms[2:]
+        assert all(a is b for a, b in zip(new_tree.childs[2:], forms[2:]))
+
+    def test_inserting_lines_shifts_positions(self):
+        tree = ltns_parse(code)
+        new_tree, new_code = edit(tree, code, 0, 0, '<f>0</f>\n\n  ')
+
+        assert dump(new_tree) == dump(ltns_parse(new_code))
+
+    def test_edit_merging_forms(self):
+        tree = ltns_parse(code)
+        offset = code.index('y') + 1
+        new_tree, new_code = edit(tree, code, offset, 0, 'z')
+
+        assert dump(new_tree) == dump(ltns_parse(new_code))
+        assert new_tree.childs[2] == 'yz'
+
+    def test_opening_a_comment(self):
+        tree = ltns_parse(code)
+        offset = code.index('y')
+        new_tree, new_code = edit(tree, code, offset, 0, '<!--')
+
+        assert dump(new_tree) == dump(ltns_parse(new_code))
+        assert len(new_tree.childs) == len(tree.childs) - 1
+
+    def test_tree_without_forms(self):
+        new_tree, new_code = edit(LtnsElement('do'), ' ', 0, 0, '<f>1</f>')
+
+        assert dump(new_tree) == dump(ltns_parse(new_code))
+
+    def test_random_edits(self):
+        rng = random.Random(0)
+        snippets = [' ', '\n', '1', 'x', '<f>2</f>', '"s"', '[3]', '']
+        tree, current = ltns_parse(code), code
+
+        for _ in range(300):
+            offset = rng.randrange(len(current) + 1)
+            removed = rng.randrange(min(4, len(current) - offset) + 1)
+            inserted = rng.choice(snippets)
+            new_code = apply_edit(current, offset, removed, inserted)
+
+            try:
+                expected = dump(ltns_parse(new_code))
+            except Exception:
+                with pytest.raises(Exception):
+                    reparse(tree, current, offset, removed, inserted)
+                continue
+
+            tree = reparse(tree, current, offset, removed, inserted)
+            current = new_code
+
+            assert dump(tree) == expected
@@ -0,0 +1,162 @@
+import random
+
+import pytest
+from rply.errors import LexingError
+
+from ltns.lexer import classify, get_lexer
+from ltns.models import (
+    LtnsKeyword,
+    LtnsSymbol,
+    LtnsInteger,
+    LtnsFloat,
+    LtnsComplex,
+)
+
+
+corpus = [
+    '',
+    '   \n\t ',
+    '<print>"Hello World!"</print>',
+    '''
+<if>
+  True
+  <do>
+    <print end="">"This is: "</print>
+    <print>"True!"</print>
+  </do>
+  <do>
+    <print end="">"This is: "</print>
+    <print>"False!"</print>
+  </do>
+</if>
+''',
+    '<def>x 1 y 0x1f z -2.5e3 w 3+4j v :key</def>',
+    '<f a=1 b="two" c=[1 2 [3]]/>',
+    '<fn*>[x & rest] <add*>x 1</add*></fn*>',
+    '"multi\nline\nstring" after\n  <a/>',
+    'r"raw" r rx r"" ""',
+    '<!-- comment --> <a/>\n<!-- another\ncomment -->\n<b/>',
+    '<!-- unterminated comment-->x',
+    '<!-- a --> <a/> <!-- b -->',
+    '<!-- never closed <a/>',
+    'a<b>c</b>d=e[f]g',
+    '<print>"유니코드" 한글</print>　x',
+    '\r\n<a>\r\n</a>',
+]
+
+errors = [
+    '<a>{</a>',
+    '<a>/</a>',
+    '\n  "unterminated',
+    '<a/>\n  <b/> }',
+]
+
+def tokens(kind, code):
+    return [
+        (
+            token.gettokentype(),
+            token.getstr(),
+            token.getsourcepos().idx,
+            token.getsourcepos().lineno,
+            token.getsourcepos().colno,
+        )
+        for token in get_lexer(kind).lex(code)
+    ]
+
+def lexing_error(kind, code):
+    with pytest.raises(LexingError) as info:
+        tokens(kind, code)
+
+    pos = info.value.getsourcepos()
+    return pos.idx, pos.lineno, pos.colno
+
+class TestScanner:
+    @pytest.mark.parametrize('code', corpus)
+    def test_same_tokens_as_rply(self, code):
+        assert tokens('scanner', code) == tokens('rply', code)
+
+    def test_same_tokens_as_rply_on_random_input(self):
+        alphabet = '<>/[]="r -!:\n\t a1.x'
+        rng = random.Random(0)
+
+        for _ in range(500):
+            code = ''.join(rng.choice(alphabet) for _ in range(rng.randrange(30)))
+
+            try:
+                expected = tokens('rply', code)
+            except LexingError:
+                assert lexing_error('scanner', code) == lexing_error('rply', code)
+            else:
+                assert tokens('scanner', code) == expected
+
+    @pytest.mark.parametrize('code', corpus)
+    def test_chunks(self, code):
+        expected = tokens('scanner', code)
+        rng = random.Random(code)
+
+        for _ in range(20):
+            cuts = sorted(rng.randrange(len(code) + 1) for _ in range(3))
+            chunks = [
+                code[a:b] for a, b in zip([0] + cuts, cuts + [len(code)])
+            ]
+            lexed = [
+                (
+                    token.name,
+                    token.value,
+                    token.idx,
+                    token.lineno,
+                    token.colno,
+                )
+                for token in get_lexer('scanner').lex_chunks(chunks)
+            ]
+
+            assert lexed == expected
+
+    @pytest.mark.parametrize('code', corpus + [
+        '<f>"long\nstring" <!-- long\ncomment --> long-identifier</f>',
+        'r"raw" r <!-- unclosed r"s"',
+    ])
+    def test_one_character_chunks(self, code):
+        lexed = [
+            (token.name, token.value, token.idx, token.lineno, token.colno)
+            for token in get_lexer('scanner').lex_chunks(iter(code))
+        ]
+
+        assert lexed == tokens('scanner', code)
+
+    @pytest.mark.parametrize('code', errors)
+    def test_same_errors_as_rply(self, code):
+        assert lexing_error('scanner', code) == lexing_error('rply', code)
+
+    def test_identifiers_are_classified(self):
+        models = [
+            token.model
+            for token in get_lexer('scanner').lex('<f>1 x :k</f>')
+            if token.gettokentype() == 'IDENTIFIER'
+        ]
+
+        assert [type(model) for model in models] == [
+            LtnsSymbol, LtnsInteger, LtnsSymbol, LtnsKeyword, LtnsSymbol,
+        ]
+
+class TestClassify:
+    @pytest.mark.parametrize('s, model_type, value', [
+        ('1', LtnsInteger, 1),
+        ('-1_000', LtnsInteger, -1000),
+        ('0x1f', LtnsInteger, 31),
+        ('0b101', LtnsInteger, 5),
+        ('1.5', LtnsFloat, 1.5),
+        ('.5e1', LtnsFloat, 5.0),
+        ('inf', LtnsFloat, float('inf')),
+        ('3+4j', LtnsComplex, 3+4j),
+        ('j', LtnsComplex, 1j),
+        (':key', LtnsKeyword, 'key'),
+        ('info', LtnsSymbol, 'info'),
+        ('-', LtnsSymbol, '-'),
+        ('os.path.join', LtnsSymbol, 'os.path.join'),
+    ])
+    def test_classify(self, s, model_type, value):
+        model = classify(s)
+
+        assert type(model) is model_type
+        assert model == value
@@ -0,0 +1,123 @@
+import io
+
+import pytest
+from rply.parser import LRParser
+
+from ltns.compiler import ltns_parse, ltns_parse_iter
+from ltns.models import LtnsElement, LtnsList
+
+
+documents = {
+    'childs': lambda n: '<f>' + ' '.join(str(i) for i in range(n)) + '</f>',
+    'list': lambda n: '[' + ' '.join(str(i) for i in range(n)) + ']',
+    'attributes': lambda n: (
+        '<f ' + ' '.join(f'a{i}={i}' for i in range(n)) + '/>'
+    ),
+}
+
+def stack_depth(code, monkeypatch):
+    """
+    Return the deepest parser stack reached while parsing ``code``
+    """
+    depths = []
+    reduce = LRParser._reduce_production
+
+    def recording_reduce(self, t, symstack, *args):
+        depths.append(len(symstack))
+        return reduce(self, t, symstack, *args)
+
+    with monkeypatch.context() as m:
+        m.setattr(LRParser, '_reduce_production', recording_reduce)
+        ltns_parse(code)
+
+    return max(depths)
+
+class TestParser:
+    def test_list_contents_order(self):
+        tree = ltns_parse('<f>1 <g></g> "s" [2 3]</f> x')
+
+        assert tree.name == 'do'
+        assert len(tree.childs) == 2
+
+        f = tree.childs[0]
+        assert f.name == 'f'
+        assert f.childs[0] == 1
+        assert isinstance(f.childs[1], LtnsElement)
+        assert f.childs[2] == 's'
+        assert isinstance(f.childs[3], LtnsList)
+        assert f.childs[3] == [2, 3]
+
+    def test_attributes_order(self):
+        element = ltns_parse('<f b=1 a=2 b=3 c=[4]/>').childs[0]
+
+        assert list(element.attributes) == ['b', 'a', 'c']
+        assert element.attributes['b'] == 3
+        assert element.attributes['c'] == [4]
+
+    def test_deep_nesting(self):
+        depth = 10000
+        tree = ltns_parse('<f>' * depth + '1' + '</f>' * depth)
+
+        for _ in range(depth + 1):
+            assert len(tree.childs) == 1
+            tree = tree.childs[0]
+
+        assert tree == 1
+
+    @pytest.mark.parametrize('document', documents.values(), ids=documents)
+    def test_long_sibling_list_keeps_a_shallow_stack(self, document, monkeypatch):
+        # right recursive rules would stack every sibling before reducing
+        # them, and copy the list built so far at each reduction
+        small = stack_depth(document(10), monkeypatch)
+
+        assert stack_depth(document(10000), monkeypatch) == small
+
+class TestParseIter:
+    code = '<f a=<g>1</g>>[2 [3]]</f> x "s" <h b=[4]/> <!-- c --> [5]'
+
+    def test_same_forms_as_parse(self):
+        forms = list(ltns_parse_iter(self.code))
+        childs = ltns_parse(self.code).childs
+
+        assert len(forms) == len(childs) == 5
+        assert forms[0].name == 'f'
+        assert forms[0].attributes['a'].childs == [1]
+        assert forms[0].childs == [[2, [3]]]
+        assert forms[1:3] == childs[1:3] == ['x', 's']
+        assert forms[3].name == childs[3].name == 'h'
+        assert forms[3].attributes['b'] == [4]
+        assert forms[4] == [5]
+
+    def test_file_object(self):
+        forms = list(ltns_parse_iter(io.StringIO(self.code)))
+
+        assert len(forms) == 5
+
+    def test_chunks(self):
+        chunks = [self.code[i:i + 3] for i in range(0, len(self.code), 3)]
+        forms = list(ltns_parse_iter(chunks))
+
+        assert len(forms) == 5
+        assert forms[0].attributes['a'].childs == [1]
+
+    def test_forms_are_yielded_early(self):
+        read = []
+
+        def chunks():
+            for chunk in ['<f>1</f> <g>', '2</g>', ' <h>3</h>']:
+                read.append(chunk)
+                yield chunk
+
+        forms = ltns_parse_iter(chunks())
+
+        assert next(forms).name == 'f'
+        assert len(read) == 1
+        assert next(forms).name == 'g'
+        assert len(read) == 2
+
+    def test_unclosed_form(self):
+        forms = ltns_parse_iter('<f>1</f> <g>2')
+
+        assert next(forms).name == 'f'
+        with pytest.raises(ValueError):
+            next(forms)
@@ -0,0 +1,244 @@
+import ast
+import contextlib
+import traceback
+
+import pytest
+
+from ltns import passes
+from ltns.arena import LtnsArena
+from ltns.compiler import (
+    LtnsCompiler,
+    ltns_compile,
+    ltns_eval,
+    ltns_parse,
+    ltns_transpile,
+)
+from ltns.passes import Pipeline
+from ltns.stats import Stats
+
+from .test_arena import dump
+
+
+def run(code, optimize=None, namespace=None):
+    namespace = dict(namespace or {})
+    exec(ltns_compile(ltns_parse(code), optimize=optimize), namespace)
+    return namespace
+
+def nodes(code, node_type, optimize=None):
+    tree = ast.parse(ltns_transpile(ltns_parse(code), optimize=optimize))
+    return [node for node in ast.walk(tree) if isinstance(node, node_type)]
+
+class TestPipeline:
+    def test_levels(self):
+        names = [[p.name for p in Pipeline(level).passes] for level in range(3)]
+
+        assert names == [
+            [],
+            ['prune_if', 'dead_expressions'],
+            ['prune_if', 'inline_calls', 'dead_expressions'],
+        ]
+        assert passes.get_pipeline().level == passes.DEFAULT_LEVEL
+
+    def test_switches(self):
+        pipeline = Pipeline(0, enable=['inline_calls'])
+        assert [p.name for p in pipeline.passes] == ['inline_calls']
+
+        pipeline = Pipeline(2, disable=['prune_if'])
+        assert [p.name for p in pipeline.passes] == [
+            'inline_calls', 'dead_expressions',
+        ]
+
+    @pytest.mark.parametrize('kwargs', [
+        dict(level=-1),
+        dict(level=passes.MAX_LEVEL + 1),
+        dict(enable=['unrolling']),
+        dict(disable=['unrolling']),
+    ])
+    def test_invalid(self, kwargs):
+        with pytest.raises(ValueError):
+            Pipeline(**kwargs)
+
+    def test_passes_are_timed(self):
+        with Stats() as recorded:
+            ltns_compile(ltns_parse('<f>1</f>'), optimize=2)
+
+        for p in passes.passes():
+            assert recorded.calls['pass ' + p.name] == 1
+
+    def test_level_zero_runs_no_pass(self):
+        with Stats() as recorded:
+            ltns_compile(ltns_parse('<f>1</f>'), optimize=0)
+
+        assert not [name for name in recorded.calls if name.startswith('pass ')]
+
+class TestPruneIf:
+    @pytest.mark.parametrize('code, value', [
+        ('<if>True 1 2</if>', 1),
+        ('<if>False 1 2</if>', 2),
+        ('<if>None 1</if>', None),
+        ('<if>0 1 2</if>', 2),
+        ('<if>0.5 1 2</if>', 1),
+        ('<if>"" 1 2</if>', 2),
+        ('<if>:k 1 2</if>', 1),
+        ('<add*>1 <if>1 <if>0 2 3</if></if></add*>', 4),
+    ])
+    def test_value(self, code, value):
+        assert not nodes(code, (ast.IfExp, ast.If))
+        assert ltns_eval(ltns_parse(code), interpret=False) == value
+        assert ltns_eval(ltns_parse(code), interpret=False, optimize=0) == value
+
+    def test_other_tests_are_kept(self):
+        assert nodes('<if>x 1 2</if>', ast.IfExp)
+        assert nodes('<if>[x] 1 2</if>', ast.IfExp)
+        assert nodes('<if>True 1 2</if>', ast.IfExp, optimize=0)
+
+    def test_tree_is_not_modified(self):
+        tree = ltns_parse('<def>x [<if>True 1</if> <f>2</f>]</def> <g>3</g>')
+        before = dump(tree)
+        g = tree.childs[1]
+
+        pruned = passes.prune_if(tree, LtnsCompiler())
+
+        assert dump(tree) == before
+        assert pruned.childs[1] is g
+
+        items = tree.childs[0].childs[1]
+        pruned_items = pruned.childs[0].childs[1]
+        assert pruned_items == [items[0].childs[1], items[1]]
+        assert pruned_items[0] is items[0].childs[1]
+        assert pruned_items.lineno == items.lineno
+
+    def test_arena(self):
+        tree = LtnsArena.from_tree(ltns_parse('<def>x <if>0 1 2</if></def>')).root
+        namespace = {}
+
+        exec(ltns_compile(tree), namespace)
+
+        assert namespace['x'] == 2
+
+    def test_recur_in_branch(self):
+        namespace = run('''
+            <def>total <loop>[i 0 acc 0]
+              <if>True
+                <if><sub*>i 3</sub*> <recur><add*>i 1</add*> <add*>acc i</add*></recur> acc</if>
+              </if>
+            </loop></def>
+        ''')
+
+        assert namespace['total'] == 3
+
+    def test_location(self):
+        code = ltns_compile(ltns_parse('<if>True\n  <div*>1 0</div*></if>'))
+
+        with pytest.raises(ZeroDivisionError) as info:
+            exec(code, {})
+
+        assert traceback.extract_tb(info.value.__traceback__)[-1].lineno == 2
+
+class TestDeadExpressions:
+    def test_do(self):
+        code = '<def>f <fn*>[x] <do><f>x</f> 1 :k x</do></fn*></def>'
+
+        assert not [
+            stmt for stmt in nodes(code, ast.Expr)
+            if isinstance(stmt.value, ast.Constant)
+        ]
+        assert nodes(code, ast.Call)
+        # with the value of the def at module level
+        assert len(nodes(code, ast.Expr, optimize=0)) == 4
+
+    def test_side_effects_are_kept(self):
+        namespace = run(
+            '<do><log.append>1</log.append> x 2</do>', namespace={'log': [], 'x': 0},
+        )
+        assert namespace['log'] == [1]
+
+        # names may be undefined
+        with pytest.raises(NameError):
+            run('<do>undefined 2</do>')
+
+    def test_lambda_defaults_are_kept(self):
+        namespace = run(
+            '<do><fn* k=<log.append>1</log.append>>[x] x</fn*> 2</do>',
+            namespace={'log': []},
+        )
+
+        assert namespace['log'] == [1]
+
+    def test_empty_bodies(self):
+        module = passes.eliminate_dead_expressions(
+            ast.parse('if x:\n    1\n2\n'), LtnsCompiler(),
+        )
+
+        assert ast.unparse(module) == 'if x:\n    pass'
+
+    def test_if_statement(self):
+        source = ltns_transpile(ltns_parse('<do><if>x <def>y 1</def></if> 2</do>'))
+
+        assert not [
+            line for line in source.splitlines() if line.startswith('_temp_var_')
+        ]
+
+class TestInlineCalls:
+    def test_let(self):
+        code = '<let>[a 1 b <add*>a 1</add*>] <def>x <mul*>a b</mul*></def> b</let>'
+
+        assert nodes(code, ast.FunctionDef, optimize=1)
+        assert not nodes(code, ast.FunctionDef, optimize=2)
+
+        namespace = run(code, optimize=2)
+        assert namespace['x'] == 2
+        # the bindings are released like the locals of the function
+        assert not [
+            value for name, value in namespace.items()
+            if name.startswith('_let_') and value is not None
+        ]
+
+    def test_value(self):
+        tree = ltns_parse('<let>[a 20] <add*>a 22</add*></let>')
+
+        assert ltns_eval(tree, interpret=False, optimize=2) == 42
+
+    @pytest.mark.parametrize('code', [
+        '<let>[a 1] <def>f <fn*>[x] <add*>a x</add*></fn*></def></let>',
+        '<let>[a 1] <while>a <def>a 0</def></while></let>',
+        '<let>[a 1] <with>[f <cm></cm>] a</with></let>',
+    ])
+    def test_not_inlined(self, code):
+        assert nodes(code, ast.FunctionDef, optimize=2)
+
+    def test_locals_stay_local(self):
+        namespace = run(
+            '<def>f 5</def> <let>[x 1] <with>[f <cm></cm>] x</with></let>'
+            ' <log.append>f</log.append>',
+            optimize=2,
+            namespace={'log': [], 'cm': contextlib.nullcontext},
+        )
+
+        assert namespace['log'] == [5]
+
+    def test_closure(self):
+        namespace = run(
+            '<let>[a 1] <def>f <fn*>[x] <add*>a x</add*></fn*></def></let>',
+            optimize=2,
+        )
+
+        assert namespace['f'](1) == 2
+
+    def test_lambda(self):
+        code = '<def>x <(lambda:y+1)></(lambda:y+1)></def>'
+
+        assert nodes(code, ast.Lambda, optimize=1)
+        assert not nodes(code, ast.Lambda, optimize=2)
+        assert run(code, optimize=2, namespace={'y': 1})['x'] == 2
+
+    @pytest.mark.parametrize('source, inlined', [
+        ('x = (lambda a, b: a * b + y)(6, 7)', 'x = 6 * 7 + y'),
+        ('x = (lambda a: a)(y)', 'x = (lambda a: a)(y)'),
+        ('x = (lambda a: lambda: a)(1)', 'x = (lambda a: lambda: a)(1)'),
+        ('x = (lambda *a: a)(1)', 'x = (lambda *a: a)(1)'),
+    ])
+    def test_lambda_with_arguments(self, source, inlined):
+        module = passes.inline_calls(ast.parse(source), LtnsCompiler())
+
+        assert ast.unparse(module) == inlined
@@ -0,0 +1,85 @@
+import pytest
+
+from ltns import serialize
+from ltns.arena import ArenaElement, LtnsArena
+from ltns.compiler import ltns_compile, ltns_parse
+from ltns.models import LtnsElement, LtnsInteger
+
+from .test_arena import code, compile, dump
+
+
+class TestSerialize:
+    def test_round_trip(self):
+        tree = ltns_parse(code)
+
+        assert dump(serialize.loads(serialize.dumps(tree))) == dump(tree)
+
+    def test_lazy(self):
+        tree = ltns_parse(code)
+        root = serialize.loads(serialize.dumps(tree), lazy=True)
+
+        assert isinstance(root, ArenaElement)
+        assert dump(root) == dump(tree)
+        assert compile(root) == compile(tree)
+
+    def test_arena(self):
+        arena = LtnsArena.from_tree(ltns_parse(code))
+
+        assert serialize.dumps(arena) == serialize.dumps(ltns_parse(code))
+
+    @pytest.mark.parametrize('value', [
+        0, 1, -1, 127, 128, -129, 2 ** 64, -(2 ** 100), 1.5, -0.0, 2j, 1 - 3.5j,
+    ])
+    def test_constants(self, value):
+        tree = ltns_parse(f'<f>{value!r}</f>'.replace('(', '').replace(')', ''))
+        child = serialize.loads(serialize.dumps(tree)).childs[0].childs[0]
+
+        assert child == value
+        assert type(child) is type(tree.childs[0].childs[0])
+
+    def test_unicode(self):
+        tree = ltns_parse('<f>"café \U0001f600" λ</f>')
+
+        assert dump(serialize.loads(serialize.dumps(tree))) == dump(tree)
+
+    def test_wide_columns(self):
+        source = ' '.join(f'"s{i}"' for i in range(70000))
+        tree = LtnsElement('do', childs=[
+            ltns_parse(f'<f>{source}</f>').childs[0],
+            LtnsInteger(1).locate(None, None, 100000, 3),
+        ])
+
+        loaded = serialize.loads(serialize.dumps(tree))
+
+        assert loaded.childs[0].childs[-1] == 's69999'
+        assert loaded.childs[1].lineno == 100000
+
+    def test_compact(self):
+        tree = ltns_parse(code * 50)
+        arena = LtnsArena.from_tree(tree)
+
+        # one byte per array and node, but two for the first nodes under
+        # each node
+        assert len(serialize.dumps(tree)) < 9 * len(arena)
+
+    def test_load_mapped_file(self, tmp_path):
+        path = tmp_path / 'tree.ltnst'
+        tree = ltns_parse(code)
+        serialize.dump(tree, str(path))
+
+        for lazy in (False, True):
+            loaded = serialize.load(str(path), lazy=lazy)
+            assert dump(loaded) == dump(tree)
+
+        namespace = {'f': list}
+        exec(ltns_compile(serialize.load(str(path), lazy=True)), namespace)
+        assert namespace['x'] == 3.5
+
+    @pytest.mark.parametrize('data', [
+        b'',
+        b'not a tree',
+        serialize.MAGIC + bytes([serialize.VERSION + 1]),
+    ])
+    def test_invalid(self, data):
+        with pytest.raises(ValueError):
+            serialize.loads(data)
@@ -0,0 +1,82 @@
+import traceback
+
+import pytest
+
+from ltns.session import Session
+
+
+class TestSession:
+    def test_namespace_is_kept(self):
+        session = Session()
+
+        session.eval('<def>x 20</def>')
+        assert session.eval('<add*>x 22</add*>') == 42
+        assert session.namespace['x'] == 20
+
+    def test_temporary_names_are_unique(self):
+        session = Session()
+        session.eval('<def>f <fn*>[x] <do><def>y x</def> y</do></fn*></def>')
+        session.eval('<def>g <fn*>[x] <do><def>y 2</def> y</do></fn*></def>')
+
+        assert session.eval('<f>1</f>') == 1
+        assert session.eval('<g>1</g>') == 2
+
+    def test_pooled_names_do_not_collide(self):
+        session = Session()
+        session.eval('<def>f <fn*>[x] :a</fn*></def>')
+        session.eval('<def>g <fn*>[x] :b</fn*></def>')
+
+        assert session.eval('[<f>1</f> <g>1</g>]', interpret=False) == ['a', 'b']
+
+    def test_keywords_are_pooled_once(self):
+        session = Session()
+        session.eval('<def>k :name</def>')
+
+        code = session.compile('<def>m :name</def>')
+        exec(code, session.namespace)
+
+        assert '_LtnsKeyword' not in code.co_names
+        assert session.namespace['m'] == 'name'
+
+    def test_redefinition(self):
+        session = Session()
+        session.eval('<def>f <fn*>[x] <mul*>x 2</mul*></fn*></def>')
+        session.eval('<def>g <fn*>[x] <add*><f>x</f> 1</add*></fn*></def>')
+        assert session.eval('<g>1</g>') == 3
+
+        session.eval('<def>f <fn*>[x] <mul*>x 10</mul*></fn*></def>')
+        assert session.eval('<g>1</g>') == 11
+
+    def test_errors_do_not_break_the_session(self):
+        session = Session()
+
+        with pytest.raises(ValueError):
+            session.eval('<recur>:a</recur>')
+        with pytest.raises(ZeroDivisionError):
+            session.eval('<do><def>x :a</def> <div*>1 0</div*></do>')
+
+        assert session.eval('<do><def>x :a</def> x</do>') == 'a'
+
+    def test_traceback_shows_source(self):
+        session = Session()
+        session.eval('<def>f <fn*>[x]\n  <div*>x 0</div*></fn*></def>')
+
+        with pytest.raises(ZeroDivisionError) as info:
+            session.eval('<f>1</f>', interpret=False)
+
+        text = ''.join(traceback.format_tb(info.value.__traceback__))
+        assert '<session-1>", line 2' in text
+        assert '<div*>x 0</div*>' in text
+        assert '<session-2>", line 1' in text
+
+    def test_interpret(self):
+        session = Session({'x': 2})
+
+        assert session.eval('<mul*>x 21</mul*>', interpret=True) == 42
+
+    def test_model_tree(self):
+        from ltns.compiler import ltns_parse
+
+        session = Session()
+
+        assert session.eval(ltns_parse('<do><def>x 1</def> x</do>')) == 1
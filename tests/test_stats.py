@@ -0,0 +1,71 @@
+import pickle
+
+from ltns import stats
+from ltns.compiler import LtnsCompiler, ltns_compile, ltns_parse
+from ltns.lexer import get_lexer
+from ltns.stats import Stats
+
+
+CODE = '<def>f <fn*>[x] <if>x <do><def>y 1</def> [y :k]</do> 2</if></fn*></def>'
+
+
+class TestStats:
+    def test_disabled(self):
+        assert stats.current() is None
+
+        ltns_compile(ltns_parse(CODE))
+
+        assert LtnsCompiler._stats is None
+
+    def test_phases(self):
+        with Stats() as recorded:
+            assert stats.current() is recorded
+            ltns_compile(ltns_parse(CODE))
+
+        assert stats.current() is None
+        phases = set(stats.PHASES) - {'interpret'}
+        phases |= {'pass prune_if', 'pass dead_expressions'}
+        assert set(recorded.calls) == phases
+        assert all(recorded.calls[name] == 1 for name in phases)
+        assert all(recorded.times[name] >= 0 for name in phases)
+
+    def test_counters(self):
+        with Stats() as recorded:
+            ltns_compile(ltns_parse(CODE))
+
+        counters = recorded.counters
+        assert counters['tokens lexed'] == len(list(get_lexer().lex(CODE)))
+        # def, f, fn*, [x], x, if, x, do, def, y, 1, [y :k], y, :k and 2
+        assert counters['nodes parsed'] == 15
+        assert counters['special form def'] == 2
+        assert counters['special form if'] == 1
+        assert counters['compiled LtnsKeyword'] == 1
+        assert counters['temp functions'] == 1
+
+    def test_nested(self):
+        with Stats() as outer:
+            with Stats() as inner:
+                ltns_parse(CODE)
+            assert stats.current() is outer
+            ltns_parse(CODE)
+
+        assert inner.calls['parse'] == 1
+        assert outer.calls['parse'] == 1
+
+    def test_merge(self):
+        with Stats() as recorded:
+            ltns_compile(ltns_parse(CODE))
+
+        copy = pickle.loads(pickle.dumps(recorded))
+        copy.merge(recorded)
+
+        assert copy.calls['compile'] == 2
+        assert copy.counters['tokens lexed'] == 2 * recorded.counters['tokens lexed']
+
+    def test_report(self):
+        with Stats() as recorded:
+            ltns_compile(ltns_parse(CODE))
+
+        report = recorded.report()
+        assert 'fix_missing_locations' in report
+        assert 'special form fn*' in report